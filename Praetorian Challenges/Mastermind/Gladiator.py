@@ -1,8 +1,16 @@
-import sys
 import time
+import numpy as np
 from Util import *
-from random import sample
+from random import sample, randrange
 from weaponDeduction import weaponDeduction
+from positionDeduction import positionDeduction
+from guessSearch import search_guesses, parallel_supported, get_scoring_pool, mergeTimeout
+from openingBook import get_opening_book
+from autotune import get_rates, budget_cutoffs
+from candidateFilter import CandidateFilter, StreamedPool, filterBlockSize
+from permutationSpace import PermutationSpace
+from scheduler import TurnScheduler
+from partitionMemo import PartitionMemo
 
 ## Max amount of time to spend updating knowledge (removing impossible answers)
 updateTimeout = 4
@@ -15,6 +23,13 @@ guessTimeout = 9
 ##guessTimeout = 10000
 ##updateTimeout = 10000
 
+## Shares of the time left that the phases of a turn get from the TurnScheduler (see scheduler.py)
+## countShare of the update time counts the possible combinations exactly, weaponSampleShare of the turn samples candidates for the weapon solver
+## and positionSampleShare of the turn samples answers for the position solver, the searches for a guess get the rest of the turn
+countShare = 0.25
+weaponSampleShare = 0.25
+positionSampleShare = 0.5
+
 ## Generate a list of combinations/permutations when search space is smaller cutoff
 ## Increase to potentially decrease worst-case number of guesses while increasing compute time
 ## Decrease if program is unable to update possible combinations/permutations in the time limit
@@ -23,45 +38,110 @@ approximateCutoffSize = 4000000
 ## Switch to an approximation of Kunth's Mastermind algorithm when search space is smaller than cutoff
 ## Increase to potentially decrease worst-case number of guesses while increasing compute time
 ## Decrease if program is unable to compute an optimal guess in the time limit
-optimalCutoffSize = 2000
+## Guesses are scored with the vectorized response tables in Util, which is why this can be much larger than the O(N^2) pure Python loop allowed
+optimalCutoffSize = 10000
+
+## Replace approximateCutoffSize and optimalCutoffSize with cutoffs measured on this machine (see autotune.py)
+## The micro-benchmark runs once per level and takes well under a second, optimalCutoffSize is scaled to the guess time left in every turn
+autotuneCutoffs = True
+
+## Count the possible combinations exactly while the search space is too large to list (see cardinalitySolver.py)
+## The exact count replaces the upper bound C(unknown weapons, correct weapons left), so the combinations are listed after far fewer guesses,
+## and guesses are scored against uniformly random possible combinations instead of random subsets of the unknown weapons
+exactWeaponSolver = True
+
+## Random combinations of the unknown weapons drawn at once while the weapon solver samples candidates, and the most it keeps
+## Combinations are drawn as random colex ranks (see Util.sample_combinations()), counted combinations are listed instead of sampled if there are at most maxWeaponSolverSamples
+weaponSolverSampleBlock = 4096
+maxWeaponSolverSamples = 2 ** 18
+
+## Score used to rank guesses, a name in Util.scorers ('minimax', 'expected' or 'entropy') or a scorer function
+## 'minimax' minimizes the worst-case number of possible answers left (Kunth), 'expected' the average number left and 'entropy' maximizes the information of the response
+guessScorer = 'minimax'
+
+## Number of answers the position solver samples to choose a guess from when the combination is known but there are too many permutations to list
+positionSolverSamples = 50
+
+## Max number of partition histograms of guesses kept between rounds (see partitionMemo.py), 0 to score every guess every round
+## Every round of a level restarts from the same state, so guesses scored against the same pool of possible answers in an earlier round are not scored again
+partitionMemoSize = 2 ** 16
+
+## File the partition histograms are saved to after every round and loaded from by the next Gladiator, None to keep them in memory only
+partitionMemoFile = None
+
+## Number of worker processes used to search for guesses
+## Guesses are searched in this process if numWorkers is 1 or if multiprocessing.shared_memory is unavailable (Python < 3.8)
+numWorkers = 1
 
 class Gladiator:
-    def __init__(self, numWeapons, numOpponents):
+    def __init__(self, numWeapons, numOpponents, useOpeningBook=True):
         self.numWeapons = numWeapons
         self.numOpponents = numOpponents
         self.numCombinations = calculate_number_combinations(numWeapons, numOpponents)
         self.numPermutations = calculate_number_permutations(numWeapons, numOpponents)
 
-        self.startTime = time.time()
         self.guessState = 0
-        
+
+        ## Hands out the time of every turn and keeps the best guess found so far
+        self.scheduler = TurnScheduler(updateTimeout, guessTimeout)
+
         self.previousGuesses = list()
         self.previousResponses = list()
-        self.possibleCombinations = list()
-        self.possiblePermutations = list()
+        self.possibleCombinations = empty_combinations(numWeapons)
+        ## possiblePermutations starts as a lazy PermutationSpace and becomes an array of the permutations left after the first permutation update
+        self.possiblePermutations = np.zeros((0, numOpponents), dtype=np.uint8)
 
-        ## Set to true if last update was not finished in time
-        ## Stays true until all impossible guesses have been removed
-        self.unfinishedUpdate = False
-        self.unfinishedIndex = 0
+        ## Filters that remove impossible combinations/permutations, None until the combinations/permutations are generated
+        ## A filter that runs out of time keeps its place and continues from where it left off the next update
+        self.combinationFilter = None
+        self.permutationFilter = None
 
         self.weaponSolver = weaponDeduction(numWeapons, numOpponents)
 
-        if self.numCombinations < approximateCutoffSize:
+        ## Solves the position of every weapon once the combination is known, None until guessState 3
+        self.positionSolver = None
+
+        ## Worker processes shared by every Gladiator, None if guesses are searched in this process
+        self.scoringPool = None
+        if numWorkers > 1 and parallel_supported():
+            self.scoringPool = get_scoring_pool(numWorkers)
+
+        ## Cutoffs between guess states, computed from throughputs measured on this machine if autotuneCutoffs is set
+        self.approximateCutoffSize, self.optimalCutoffSize = approximateCutoffSize, optimalCutoffSize
+        self.cutoffRates = None
+        if autotuneCutoffs:
+            self.cutoffRates = get_rates(numWeapons, numOpponents)
+            self._tune_cutoffs(guessTimeout - updateTimeout)
+
+        ## Partition histograms of scored guesses, kept by reset() so later rounds of the level reuse them, None if disabled
+        ## Only searches in this process use it, ScoringPool workers score every guess
+        self.partitionMemo = None
+        if partitionMemoSize > 0:
+            self.partitionMemo = PartitionMemo(partitionMemoSize, partitionMemoFile)
+
+        ## Precomputed guesses for the first few responses of a round, None if every guess is searched
+        self.openingBook = None
+        if useOpeningBook:
+            self.openingBook = get_opening_book()
+
+        if self.numCombinations < self.approximateCutoffSize:
             ## Number of combinations is small enough that we can generate it in a reasonable amount of time and that we can store in memory
             self.possibleCombinations = generate_combinations(numWeapons, numOpponents)
+            self.combinationFilter = self._new_filter(self.possibleCombinations, False)
             self.guessState = 1
-        if self.numCombinations < optimalCutoffSize:
+        if self.numCombinations < self.optimalCutoffSize:
             ## Number of combinations is small enough that we can use a near-optimal deterministic strategy for selecting the next guess
             self.guessState = 2
-        if self.numCombinations == 1 and self.numPermutations > approximateCutoffSize:
-            ## Unimplemented, would require number of opponents > 10
-            self.guessState = 3 
-        if self.numPermutations < approximateCutoffSize:
+        if self.numCombinations == 1 and self.numPermutations > self.approximateCutoffSize:
+            ## Only one combination but too many permutations to list, would require number of opponents > 10
+            self.guessState = 3
+            self._start_position_solver()
+        if self.numPermutations < self.approximateCutoffSize:
             ## Number of permutations is small enough that we can generate it in a reasonable amount of time and that we can store in memory
-            self.possiblePermutations = generate_grouped_permutations(self.possibleCombinations, numOpponents)
+            self.possiblePermutations = PermutationSpace(self.possibleCombinations, numOpponents)
+            self.permutationFilter = self._new_filter(self.possiblePermutations, True)
             self.guessState = 4
-        if self.numPermutations < optimalCutoffSize:
+        if self.numPermutations < self.optimalCutoffSize:
             ## Number of permutations is small enough that we can use a near-optimal deterministic strategy for selecting the next guess
             self.guessState = 5
 
@@ -86,324 +166,388 @@ class Gladiator:
         self.previousGuesses.append(tuple(range(numOpponents)))
 
     ## Update internal knowledge given response
-    ## Update will set unfinishedUpdate to true if it runs out of time and continue from when it left off the next update
+    ## An update that runs out of time leaves the rest of the work in its CandidateFilter, which continues from where it left off the next update
     ## Update will call the appropriate update and guess function based on guessState
+    ## The guess function is skipped if the opening book has a guess for the responses so far
     def update(self, weaponsCorrect, positionsCorrect):
-        self.startTime = time.time()
+        self.scheduler.start_turn()
         previousGuess = self.previousGuesses[-1]
         self.previousResponses.append((weaponsCorrect, positionsCorrect))
 
-        if self.unfinishedUpdate:
-            assert self.guessState != 0
-            for index in range(self.unfinishedIndex, len(self.previousGuesses)):
-                if time.time() - self.startTime > updateTimeout:
-                    self.unfinishedUpdate = True
-                    self.unfinishedIndex = index
-                    break
-                
-                guess = self.previousGuesses[index]
-                response = self.previousResponses[index]
-                self._updateStrategy[self.guessState](guess, response[0], response[1])
+        self._updateStrategy[self.guessState](previousGuess, weaponsCorrect, positionsCorrect)
 
-            self.unfinishedUpdate = False
-            self.unfinishedIndex = 0
+        bookGuess = None
+        if self.openingBook is not None:
+            bookGuess = self.openingBook.lookup(self.numWeapons, self.numOpponents, self.previousResponses)
 
-        self._updateStrategy[self.guessState](previousGuess, weaponsCorrect, positionsCorrect)
-        self._guessStrategy[self.guessState]()
+        if bookGuess is not None:
+            self.previousGuesses.append(bookGuess)
+        else:
+            self._guessStrategy[self.guessState]()
 
     ## Update the WeaponSolver
     ## The benefit of the WeaponSolver is that is very quick. Assumed to always finish before the updateTimeout in our use cases
     ## Calculate the new number of possible combinations. Update guessState and generate all possible combinations
-    ## Because the WeaponSolver does not eliminate all impossible combinations, we have to run combination_update() over the possible combinations with all of the previous guesses
+    ## Because the WeaponSolver does not eliminate all impossible combinations, the new combinations are filtered with all of the previous guesses
+    ## In exact mode the count runs for countShare of the update time, listing the combinations it counted takes about as long again
     def weapon_solver_update(self, previousGuess, weaponsCorrect, positionsCorrect):
         self.weaponSolver.learn(previousGuess, weaponsCorrect)
-        numPossibleCombinations = calculate_number_combinations(len(self.weaponSolver.unknownWeapons), self.numOpponents - len(self.weaponSolver.correctWeapons))
 
-        if numPossibleCombinations < approximateCutoffSize:
-            self.possibleCombinations = generate_combinations_from_set(self.weaponSolver.correctWeapons, self.weaponSolver.unknownWeapons, self.numOpponents)
+        numPossibleCombinations = None
+        if exactWeaponSolver:
+            timeSlice = self.scheduler.slice('count', countShare, 'update')
+            numPossibleCombinations = self.weaponSolver.count_models(timeSlice.deadline)
+            self.scheduler.finish(timeSlice)
+        if numPossibleCombinations is None:
+            numPossibleCombinations = calculate_number_combinations(count_bits(self.weaponSolver.unknownWeapons), self.numOpponents - count_bits(self.weaponSolver.correctWeapons))
+
+        self._tune_cutoffs()
+        if numPossibleCombinations < self.approximateCutoffSize:
+            if self.weaponSolver.modelSolver is not None:
+                pool = pack_combinations(self.weaponSolver.modelSolver.models(), self.numWeapons)
+                ## The counting tables are not needed once the combinations are listed
+                self.weaponSolver.modelSolver = None
+            else:
+                ## Stream the combinations into the filter one block at a time, most of them are removed before the rest are generated
+                correctSet = set(mask_to_combination(self.weaponSolver.correctWeapons))
+                unknownSet = set(mask_to_combination(self.weaponSolver.unknownWeapons))
+                blocks = generate_combinations_from_set(correctSet, unknownSet, self.numOpponents, filterBlockSize)
+                pool = StreamedPool((pack_combinations(codes, self.numWeapons) for codes in blocks), numPossibleCombinations, empty_combinations(self.numWeapons))
+            self.combinationFilter = self._new_filter(pool, False)
             self.guessState = 1
-            
-            for index, (guess, response) in enumerate(zip(self.previousGuesses, self.previousResponses)):
-                if time.time() - self.startTime > updateTimeout:
-                    self.unfinishedUpdate = True
-                    self.unfinishedIndex = index
-                    return
+            self._filter_combinations()
+
+    ## Update the PositionSolver
+    ## The weapons are known so only the number of correct positions carries information
+    def position_solver_update(self, previousGuess, weaponsCorrect, positionsCorrect):
+        self.positionSolver.learn(previousGuess, positionsCorrect)
 
-                self.combination_update(guess, response[0], response[1])
+    ## Start solving the positions of the only possible combination with every previous guess
+    def _start_position_solver(self):
+        combination = unpack_combinations(self.possibleCombinations, self.numOpponents)[0].tolist()
+        self.positionSolver = positionDeduction(self.numWeapons, self.numOpponents, combination)
 
-            self.unfinishedUpdate = False
-            self.unfinishedIndex = 0
+        for guess, response in zip(self.previousGuesses, self.previousResponses):
+            self.positionSolver.learn(guess, response[1])
 
-    ## Placeholder function
-    ## Unimplemented
-    def position_solver_update(self, previousGuess, weaponsCorrect, positionsCorrect):
-        print("position_solver_update: unimplemented")
-        sys.exit()
+    ## Compute the cutoffs from the measured throughputs and guessBudget seconds to guess, by default the time left in this turn
+    ## Filters resume in later updates, so approximateCutoffSize keeps the whole update budget of a turn
+    def _tune_cutoffs(self, guessBudget=None):
+        if self.cutoffRates is None:
+            return
+
+        if guessBudget is None:
+            guessBudget = self.scheduler.end_time() - max(time.time(), self.scheduler.end_time('update'))
+        numWorkers = self.scoringPool.numWorkers if self.scoringPool is not None else 1
+        self.approximateCutoffSize, self.optimalCutoffSize = budget_cutoffs(self.cutoffRates, self.scheduler.updateTime, guessBudget, numWorkers)
+
+    ## Return a CandidateFilter over pool that already has every previous guess and response as a constraint
+    def _new_filter(self, pool, withPositions):
+        candidateFilter = CandidateFilter(pool, self.numWeapons, withPositions)
+        for guess, response in zip(self.previousGuesses, self.previousResponses):
+            candidateFilter.add_constraint(guess, response[0], response[1])
+
+        return candidateFilter
 
     ## Update the set of possible combinations
     ## Remove combinations that would not produce the same response from the server if they were assumed to be the correct answer
-    ## Update guessState and generate permutations if the appropriate conditions have been met
-    ## Because combination_update() does not eliminate all impossible permutations, we have to run permutation_update() over the possible permutations with all of the previous guesses
-    def combination_update(self, guess, weaponsCorrect, positionCorrect):
-        possibleCombinations = list()
-            
-        for combination in self.possibleCombinations:
-            if weaponsCorrect == count_correct_weapons(guess, combination):
-                possibleCombinations.append(combination)
-
-        self.possibleCombinations = possibleCombinations
-
-        if len(self.possibleCombinations) < optimalCutoffSize:
+    def combination_update(self, guess, weaponsCorrect, positionsCorrect):
+        self.combinationFilter.add_constraint(guess, weaponsCorrect, positionsCorrect)
+        self._filter_combinations()
+
+    ## Run the combination filter until it is complete or the update time runs out
+    ## Update guessState and generate permutations or start the PositionSolver if the appropriate conditions have been met
+    ## possibleCombinations only holds the combinations the filter has checked, the size of an unfinished filter is an upper bound on the real number
+    ## guessState moves by that bound and only moves to 3 or 4, which need every possible combination, once the filter is complete
+    ## Because combination_update() does not eliminate all impossible permutations, the new permutations are filtered with all of the previous guesses
+    def _filter_combinations(self):
+        timeSlice = self.scheduler.slice('filterCombinations', end='update')
+        complete = self.combinationFilter.run(timeSlice.deadline)
+        self.scheduler.finish(timeSlice)
+        self.possibleCombinations = self.combinationFilter.candidates()
+        numCombinations = self.combinationFilter.size()
+        self._tune_cutoffs()
+
+        if numCombinations < self.optimalCutoffSize:
             self.guessState = 2
-        if len(self.possibleCombinations) == 1:
+        if not complete:
+            return
+        if numCombinations == 1:
             self.guessState = 3
-        if len(self.possibleCombinations) * calculate_number_permutations(self.numOpponents, self.numOpponents) < approximateCutoffSize:
+        if numCombinations * calculate_number_permutations(self.numOpponents, self.numOpponents) < self.approximateCutoffSize:
             self.guessState = 4
-            self.possiblePermutations = generate_grouped_permutations(self.possibleCombinations, self.numOpponents)
-            
-            for index, (guess, response) in enumerate(zip(self.previousGuesses, self.previousResponses)):
-                if time.time() - self.startTime > updateTimeout:
-                    self.unfinishedUpdate = True
-                    self.unfinishedIndex = index
-                    return
-
-                self.permutation_update(guess, response[0], response[1])
-
-            self.unfinishedUpdate = False
-            self.unfinishedIndex = 0
+            permutations = PermutationSpace(self.possibleCombinations, self.numOpponents)
+            self.permutationFilter = self._new_filter(permutations, True)
+            self._filter_permutations()
+        if self.guessState == 3:
+            self._start_position_solver()
 
     ## Update the set of possible permutations
     ## Remove permutations that would not produce the same response from the server if they were assumed to be the correct answer
-    ## Update guessState and if the appropriate conditions have been met
     def permutation_update(self, guess, weaponsCorrect, positionsCorrect):
-        possiblePermutations = list()
-
-        for subSet in self.possiblePermutations:
-            for permutation in subSet:
-                break
-            if weaponsCorrect == count_correct_weapons(guess, permutation):
-                newSubSet = set()
-                for permutation in subSet:
-                    if positionsCorrect == count_correct_positions(permutation, guess):
-                        newSubSet.add(permutation)
-
-                if len(newSubSet) != 0:
-                    possiblePermutations.append(newSubSet)
-
-        self.possiblePermutations = possiblePermutations
+        self.permutationFilter.add_constraint(guess, weaponsCorrect, positionsCorrect)
+        self._filter_permutations()
+
+    ## Run the permutation filter until it is complete or the update time runs out
+    ## Update guessState if the appropriate conditions have been met
+    ## possiblePermutations only holds the permutations the filter has checked, the size of an unfinished filter is an upper bound on the real number
+    def _filter_permutations(self):
+        timeSlice = self.scheduler.slice('filterPermutations', end='update')
+        self.permutationFilter.run(timeSlice.deadline)
+        self.scheduler.finish(timeSlice)
+        self.possiblePermutations = self.permutationFilter.candidates()
+        self._tune_cutoffs()
+
+        if self.permutationFilter.size() < self.optimalCutoffSize:
+            self.guessState = 5
 
-        numPermutations = 0
-        for subSet in self.possiblePermutations:
-            numPermutations += len(subSet)
+    ## Search for the best guess with search_guesses(), sharded across the ScoringPool if there is one, until the end of the turn
+    ## The best guess found is offered to the scheduler, a random search ends early at its first block without a better guess if untilStale is set
+    ## Return (bestScore, bestGuess, numScored)
+    def _search_guesses(self, kind, guessPool, candidates, withPositions, arguments=None, untilStale=False):
+        timeSlice = self.scheduler.slice('search')
+
+        if self.scoringPool is None:
+            result = search_guesses(kind, guessPool, candidates, self.numWeapons, withPositions, timeSlice.deadline, arguments, guessScorer, self.partitionMemo, self.scheduler.cancelled, untilStale)
+        else:
+            result = self.scoringPool.best_guess(kind, guessPool, candidates, self.numWeapons, withPositions, timeSlice.deadline - mergeTimeout, arguments, guessScorer, self.scheduler.cancelled, untilStale)
+
+        self.scheduler.finish(timeSlice)
+        self.scheduler.offer(result[1], result[0])
+        return result
+
+    ## Return the best guess of the turn from the scheduler
+    ## If the search ran out of time this is the cheap guess the strategy offered before searching, a random guess only if there was none
+    def _best_guess(self, strategy):
+        bestGuess = self.scheduler.best_guess()
+        if self.scheduler.bestScore == float('inf'):
+            print("RAN OUT OF TIME: GUESSING BEST GUESS SO FAR " + strategy)
+
+        if bestGuess is None:
+            bestGuess = sample(range(self.numWeapons), self.numOpponents)
 
-        if numPermutations < optimalCutoffSize:
-            self.guessState = 5
+        return bestGuess
 
     ## Make a guess using information from the WeaponsSolver
-    ## Use 1/4 of guess time to generate as many random samples of combinations from WeaponsSolver knowledge
+    ## Use weaponSampleShare of the turn to generate as many random samples of combinations from WeaponsSolver knowledge
     ## Use remaining time to run an approximation of Kunth's Mastermind Algorithm and select the best guess
+    ## A sampled combination is offered to the scheduler before the search, so running out of time still guesses a possible combination
+    ## If the possible combinations were counted and there are few enough of them they are listed instead of sampled,
+    ## and if they can all be scored against each other the guess is the best of them and the turn ends with that search
     def weapon_solver_guess(self):
-        bestGuess = None
-        minMax = self.numCombinations
-        emptyResponseCounter = [0] * (self.numOpponents + 1)
-        
-        correctSet = self.weaponSolver.correctWeapons
-        unknownSet = self.weaponSolver.unknownWeapons
-
-        timeRemaining = guessTimeout - (time.time() - self.startTime)
+        correctList = list(mask_to_combination(self.weaponSolver.correctWeapons))
+        unknownList = list(mask_to_combination(self.weaponSolver.unknownWeapons))
+
         randomSubset = set()
-        sampleSize = self.numOpponents - len(correctSet)
-        stopTime = guessTimeout - (0.75*timeRemaining)
-        
-        while time.time() - self.startTime < stopTime:
-            for _ in range(25):
-                temp = sample(unknownSet, sampleSize)
-                temp.sort()
-                randomSubset.add(tuple(temp))
-        
-        while time.time() - self.startTime < guessTimeout:
-            responseCounter = list(emptyResponseCounter)
-            randomGuess = sample(unknownSet, sampleSize)
-            for combination in randomSubset:
-                responseCounter[count_correct_weapons(randomGuess,combination)] += 1
-                
-            currentMax = max(responseCounter)
-            if currentMax < minMax:
-                bestGuess = randomGuess + list(correctSet)
-                minMax = currentMax
-
-        if bestGuess == None:
-            print("RAN OUT OF TIME: RANDOMLY GUESSING weapon_solver_guess")
-            bestGuess = sample(range(self.numWeapons), self.numOpponents)
-        
+        sampleSize = self.numOpponents - len(correctList)
+        modelSolver = self.weaponSolver.modelSolver
+        correctMask = self.weaponSolver.correctWeapons
+
+        models = None
+        if modelSolver is not None and modelSolver.numModels <= maxWeaponSolverSamples:
+            models = modelSolver.models()
+            if len(models) <= self.optimalCutoffSize:
+                self.scheduler.offer(models[0].tolist())
+                self._search_guesses('range', models, models, False, (0, len(models)))
+
+                bestGuess = self._best_guess('weapon_solver_guess')
+                bestGuess = sample(bestGuess, len(bestGuess))
+                self.previousGuesses.append(tuple(bestGuess))
+                return
+
+        timeSlice = self.scheduler.slice('sample', weaponSampleShare)
+
+        ## Sample possible combinations if they were counted, otherwise any combination of the unknown weapons
+        ## Combinations of the unknown weapons are drawn in blocks as indices into unknownList and deduplicated at the end
+        numUnknownCombinations = calculate_number_combinations(len(unknownList), sampleSize)
+        blocks = list()
+        numSampled = 0
+        while models is None and not timeSlice.expired():
+            if modelSolver is not None:
+                if len(randomSubset) >= maxWeaponSolverSamples:
+                    break
+                for combination in modelSolver.sample(25):
+                    randomSubset.add(tuple(weapon for weapon in combination if not correctMask >> weapon & 1))
+                continue
+
+            if numSampled >= min(maxWeaponSolverSamples, numUnknownCombinations):
+                break
+            blocks.append(sample_combinations(len(unknownList), sampleSize, weaponSolverSampleBlock))
+            numSampled += len(blocks[-1])
+        self.scheduler.finish(timeSlice)
+
+        weaponPool = np.array(unknownList, dtype=np.uint8)
+        if models is not None:
+            ## Every possible combination without the weapons known to be correct
+            isCorrect = np.zeros(self.numWeapons, dtype=bool)
+            isCorrect[correctList] = True
+            candidates = models[~isCorrect[models]].reshape(len(models), sampleSize)
+        elif modelSolver is not None:
+            candidates = encode_codes(randomSubset, sampleSize)
+        elif blocks:
+            candidates = weaponPool[np.unique(np.concatenate(blocks), axis=0)]
+        else:
+            candidates = np.zeros((0, sampleSize), dtype=np.uint8)
+
+        if len(candidates):
+            self.scheduler.offer(candidates[0].tolist() + correctList)
+        else:
+            self.scheduler.offer(correctList + sample(unknownList, sampleSize))
+        ## Every possible combination is a candidate if they were listed, so a block of guesses that scores no better ends the search
+        self._search_guesses('weapons', weaponPool, candidates, False, (sampleSize, correctList), models is not None)
+
+        bestGuess = self._best_guess('weapon_solver_guess')
         bestGuess = sample(bestGuess, len(bestGuess))
         self.previousGuesses.append(tuple(bestGuess))
 
+    ## Return numSamples random rows of possibleCombinations (without replacement)
+    def _sample_combinations(self, numSamples):
+        return self.possibleCombinations[sample(range(len(self.possibleCombinations)), numSamples)]
+
+    ## Offer a random possible combination to the scheduler as the guess to fall back to
+    def _offer_possible_combination(self):
+        if len(self.possibleCombinations):
+            self.scheduler.offer(unpack_combinations(self._sample_combinations(1), self.numOpponents)[0].tolist())
+
     ## Select a random subset of combinations from the list of possible combinations
     ## Run a variation of Kunth's Mastermind Algorithm over the subset and select the best guess
+    ## Random guesses are scored in blocks until every possible combination has been tried or we run out of time
+    ## Only one guess per class of equivalent combinations is considered, if there are few enough classes every one of them is scored against the whole list
     def combination_approx_guess(self):
-        bestGuess = None
-        minMax = self.numCombinations
-        emptyResponseCounter = [0] * (self.numOpponents + 1)
-
-        randomSubset = sample(self.possibleCombinations, min(len(self.possibleCombinations), 3000))
-        while time.time() - self.startTime < guessTimeout:
-            responseCounter = list(emptyResponseCounter)
-            randomGuess = sample(self.possibleCombinations, 1)[0]
-            for combination in randomSubset:
-                responseCounter[count_correct_weapons(randomGuess, combination)] += 1
-
-            currentMax = max(responseCounter)
-            if currentMax < minMax:
-                bestGuess = randomGuess
-                minMax = currentMax
-
-        if bestGuess == None:
-            print("RAN OUT OF TIME: RANDOMLY GUESSING combination_approx_guess")
-            bestGuess = sample(range(self.numWeapons), self.numOpponents)
-        
+        self._offer_possible_combination()
+        classes = weapon_classes(self.numWeapons, self.previousGuesses, False)
+        representatives = self.possibleCombinations[representative_combinations(self.possibleCombinations, classes, self.numWeapons)]
+
+        if len(representatives) * len(self.possibleCombinations) <= self.optimalCutoffSize ** 2:
+            candidates = unpack_combinations(self.possibleCombinations, self.numOpponents)
+            self._search_guesses('range', representatives, candidates, False, (0, len(representatives)))
+        else:
+            candidates = unpack_combinations(self._sample_combinations(min(len(self.possibleCombinations), 3000)), self.numOpponents)
+            self._search_guesses('rows', representatives, candidates, False)
+
+        bestGuess = self._best_guess('combination_approx_guess')
         bestGuess = sample(bestGuess, len(bestGuess))
         self.previousGuesses.append(tuple(bestGuess))
 
     ## Run a variation of Kunth's Mastermind Algorithm over the list of combinations and select the best guess
+    ## One combination from every class of equivalent combinations is scored against the whole list, one block of guesses at a time
     def combination_optimal_guess(self):
-        bestGuess = None
-        minMax = self.numCombinations
-        emptyResponseCounter = [0] * (self.numOpponents + 1)
-            
-        for combination1 in self.possibleCombinations:
-            responseCounter = list(emptyResponseCounter)
-            if time.time() - self.startTime > guessTimeout:
-                print("Did not finish combination guess calculation")
-                break
-            for combination2 in self.possibleCombinations:
-                responseCounter[count_correct_weapons(combination1, combination2)] += 1
-
-            currentMax = max(responseCounter)
-            if currentMax < minMax:
-                bestGuess = combination1
-                minMax = currentMax
+        self._offer_possible_combination()
+        candidates = unpack_combinations(self.possibleCombinations, self.numOpponents)
+        classes = weapon_classes(self.numWeapons, self.previousGuesses, False)
+        guesses = candidates[representative_combinations(self.possibleCombinations, classes, self.numWeapons)]
+        bestScore, bestGuess, numScored = self._search_guesses('range', guesses, candidates, False, (0, len(guesses)))
 
-            bestGuess = sample(bestGuess, len(bestGuess))
-
-        if bestGuess == None:
-            print("RAN OUT OF TIME: RANDOMLY GUESSING combination_optimal_guess")
-            bestGuess = sample(range(self.numWeapons), self.numOpponents)
+        if numScored < len(guesses):
+            print("Did not finish combination guess calculation")
 
+        bestGuess = self._best_guess('combination_optimal_guess')
         bestGuess = sample(bestGuess, len(bestGuess))
         self.previousGuesses.append(tuple(bestGuess))
 
-    ## Placeholder function
-    ## Unimplemented
+    ## Guess the answer if the PositionSolver knows it
+    ## Otherwise use positionSampleShare of the turn to sample answers consistent with every guess and run Kunth's Mastermind Algorithm over the sample
     def position_solver_guess(self):
-        print("position_solver_guess: unimplemented")
-        sys.exit()
+        answer = self.positionSolver.answer()
+
+        if answer is not None:
+            self.scheduler.offer(answer, 0)
+        else:
+            ## The right weapons in a random order until an answer is sampled
+            self.scheduler.offer(sample(mask_to_combination(self.positionSolver.correctWeapons), self.numOpponents))
+
+            timeSlice = self.scheduler.slice('sample', positionSampleShare)
+            solutions = self.positionSolver.solutions(positionSolverSamples, timeSlice.deadline)
+            self.scheduler.finish(timeSlice)
+
+            if len(solutions) > 1:
+                self.scheduler.offer(solutions[0], float('inf'))
+                candidates = np.array(solutions, dtype=np.uint8)
+                self._search_guesses('range', candidates, candidates, True, (0, len(candidates)))
+            elif solutions:
+                self.scheduler.offer(solutions[0], 0)
+
+        self.previousGuesses.append(tuple(self._best_guess('position_solver_guess')))
+
+    ## Offer a random possible permutation to the scheduler as the guess to fall back to
+    def _offer_possible_permutation(self):
+        if len(self.possiblePermutations):
+            index = randrange(len(self.possiblePermutations))
+            permutation = self.possiblePermutations[index:index + 1]
+            if not isinstance(permutation, np.ndarray):
+                permutation = permutation.codes()
+            self.scheduler.offer(permutation[0].tolist())
 
     ## Select a random subset of permutations from the list of possible permutations
     ## Run an approximation of Kunth's Mastermind Algorithm over the subset and select the best guess
+    ## Only one guess per class of equivalent permutations is considered, if there are few enough classes every one of them is scored against the whole list
     def permutation_approx_guess(self):
-        bestGuess = None
-        minMax = self.numPermutations
-        emptyResponseCounter = dict()
-
-        for i in range(self.numOpponents + 1):
-            for j in range(i + 1):
-                emptyResponseCounter[(i,j)] = 0
-
-        comboSplit = min(len(self.possiblePermutations), 50)
-        permSplit = int(round(2500 / comboSplit))
-        randCombos = sample(self.possiblePermutations, comboSplit)
-        randPermutations = list()
-        for permSet in randCombos:
-            randPermutations.append(sample(permSet, min(len(permSet), permSplit)))
-
-        while (time.time() - self.startTime) < guessTimeout:
-            permutation1 = sample(sample(self.possiblePermutations, 1)[0], 1)[0]
-            responseCounter = emptyResponseCounter.copy()
-            for comboSet in randPermutations:
-                for elem in comboSet:
-                    break
-                weaponsCorrect = count_correct_weapons(elem, permutation1)
-                for permutation2 in comboSet:
-                    responseCounter[(weaponsCorrect, count_correct_positions(permutation1, permutation2))] += 1
-
-            currentMax = max(responseCounter.values())
-            if currentMax < minMax:
-                bestGuess = permutation1
-                minMax = currentMax    
-                        
-        if bestGuess == None:
-            print("RAN OUT OF TIME: RANDOMLY GUESSING permutation_approx_guess")
-            bestGuess = sample(range(self.numWeapons), self.numOpponents)
-            bestGuess = sample(bestGuess, len(bestGuess))
+        self._offer_possible_permutation()
+        permutations = self.possiblePermutations
+        classes = weapon_classes(self.numWeapons, self.previousGuesses, True)
+        representatives = permutations[representative_permutations(permutations, classes)]
 
-        self.previousGuesses.append(tuple(bestGuess))
+        if len(representatives) * len(permutations) <= self.optimalCutoffSize ** 2:
+            self._search_guesses('range', representatives, permutations, True, (0, len(representatives)))
+        else:
+            candidates = permutations[sample(range(len(permutations)), min(len(permutations), 2500))]
+            self._search_guesses('rows', representatives, candidates, True)
+
+        self.previousGuesses.append(tuple(self._best_guess('permutation_approx_guess')))
 
     ## Run an approximation of Kunth's Mastermind Algorithm over the list of permutations and select the best guess
+    ## One permutation from every class of equivalent permutations is scored against the whole list, one block of guesses at a time
     def permutation_optimal_guess(self):
-        bestGuess = None
-        minMax = self.numPermutations
-        emptyResponseCounter = dict()
-
-        for i in range(self.numOpponents + 1):
-            for j in range(i + 1):
-                emptyResponseCounter[(i,j)] = 0
-        
-        for permutationSubset1 in self.possiblePermutations:
-            for permutation1 in permutationSubset1:
-                if (time.time() - self.startTime) > guessTimeout:
-                    print("Did not finish permutation guess calculation")
-                    break
-                responseCounter = emptyResponseCounter.copy()
-                for permutationSubset2 in self.possiblePermutations:
-                    for permutation2 in permutationSubset2:
-                        break
-                    weaponsCorrect = count_correct_weapons(permutation1, permutation2)
-                    for permutation2 in permutationSubset2:
-                        responseCounter[(weaponsCorrect, count_correct_positions(permutation1, permutation2))] += 1
-                
-                currentMax = max(responseCounter.values())
-                if currentMax < minMax:
-                    bestGuess = permutation1
-                    minMax = currentMax
-
-        if bestGuess == None:
-            print("RAN OUT OF TIME: RANDOMLY GUESSING permutation_optimal_guess")
-            bestGuess = sample(range(self.numWeapons), self.numOpponents)
-            bestGuess = sample(bestGuess, len(bestGuess))
-            
-        self.previousGuesses.append(bestGuess)
+        self._offer_possible_permutation()
+        candidates = self.possiblePermutations
+        classes = weapon_classes(self.numWeapons, self.previousGuesses, True)
+        guesses = candidates[representative_permutations(candidates, classes)]
+        bestScore, bestGuess, numScored = self._search_guesses('range', guesses, candidates, True, (0, len(guesses)))
+
+        if numScored < len(guesses):
+            print("Did not finish permutation guess calculation")
+
+        self.previousGuesses.append(tuple(self._best_guess('permutation_optimal_guess')))
 
     ## Return the next "best" guess to make
     def get_next_guess(self):
         return self.previousGuesses[-1]
 
     ## Reset Gladiator object to initial state with the same parameters (numWeapons, numOpponents)
+    ## The partition memo is kept (and saved if it has a file) for the next round
     def reset(self):
-        self.startTime = time.time()
         self.guessState = 0
-        
+
         self.previousGuesses = list()
         self.previousResponses = list()
-        self.possibleCombinations = list()
-        self.possiblePermutations = list()
+        self.possibleCombinations = empty_combinations(self.numWeapons)
+        self.possiblePermutations = np.zeros((0, self.numOpponents), dtype=np.uint8)
 
-        self.unfinishedUpdate = False
-        self.unfinishedIndex = 0
+        self.combinationFilter = None
+        self.permutationFilter = None
 
         self.weaponSolver.reset()
+        self.positionSolver = None
 
-        if self.numCombinations < approximateCutoffSize:
+        if self.partitionMemo is not None:
+            self.partitionMemo.save()
+
+        self._tune_cutoffs(self.scheduler.turnTime - self.scheduler.updateTime)
+
+        if self.numCombinations < self.approximateCutoffSize:
             self.possibleCombinations = generate_combinations(self.numWeapons, self.numOpponents)
+            self.combinationFilter = self._new_filter(self.possibleCombinations, False)
             self.guessState = 1
-        if self.numCombinations < optimalCutoffSize:
+        if self.numCombinations < self.optimalCutoffSize:
             self.guessState = 2
-        if self.numCombinations == 1 and self.numPermutations > approximateCutoffSize:
-            self.guessState = 3 ## Unimplemented
-        if self.numPermutations < approximateCutoffSize:
-            self.possiblePermutations = generate_grouped_permutations(self.possibleCombinations, self.numOpponents)
+        if self.numCombinations == 1 and self.numPermutations > self.approximateCutoffSize:
+            self.guessState = 3
+            self._start_position_solver()
+        if self.numPermutations < self.approximateCutoffSize:
+            self.possiblePermutations = PermutationSpace(self.possibleCombinations, self.numOpponents)
+            self.permutationFilter = self._new_filter(self.possiblePermutations, True)
             self.guessState = 4
-        if self.numPermutations < optimalCutoffSize:
+        if self.numPermutations < self.optimalCutoffSize:
             self.guessState = 5
 
         self.previousGuesses.append(tuple(range(self.numOpponents)))
@@ -1,3 +1,8 @@
+import numpy as np
+from math import factorial
+from random import sample, getrandbits
+from itertools import chain, permutations as permutations_of
+
 ## Return the number of weapons guessed correctly
 def count_correct_weapons(answer, guess):
     return len(set(answer).intersection(set(guess)))
@@ -19,9 +24,9 @@ def calculate_number_combinations(n, c):
         
     ans = calculate_number_permutations(n, c)
     for i in range(c, 0, -1):
-        ans /= i
+        ans //= i
     
-    return int(ans)
+    return ans
 
 ## Calculate n! / (n - c)!
 ## Return the number of permutations
@@ -35,84 +40,93 @@ def calculate_number_permutations(n, c):
     
     return int(ans)
 
-## Generates a set of all combinations
-## Return a set of tuples
+## Generates all combinations
+## Return an (N, number_of_words(n)) uint64 array of combination bitmasks (see pack_combinations())
 def generate_combinations(n, c):
     if calculate_number_combinations(n, c) == 0:
-        return set()
-    
-    combinations = set()
-    weaponSet = set(range(n))
-    combination = list(range(c))
+        return empty_combinations(n)
 
-    index = c - 1
-    maxVal = n - 1
-    combinations.add(tuple(combination))
+    return pack_combinations(_combination_indices(n, c), n)
 
-    ## Increment combinations like a base n counter
-    while _increment_combination(combination, index, maxVal):
-        combinations.add(tuple(combination))
+## Generates all combinations of range(n) in lexicographic order
+## Each column is built from the previous one like a base n counter: every row is repeated once for each value that can follow its last value
+## Return an (N, c) uint8 array
+def _combination_indices(n, c):
+    combinations = np.arange(n - c + 1, dtype=np.uint8).reshape(-1, 1)
 
-    return combinations
+    for column in range(1, c):
+        maxVal = n - c + column
+        lastValues = combinations[:, -1].astype(np.int64)
+        counts = maxVal - lastValues
 
-## Recursive part of generate_combinations()
-## Return False if combination[0] == maxValue == (n - c). Value is passed backed up to generate_combinations()
-## Return True otherwise
-def _increment_combination(combination, index, maxVal):
-    if combination[index] == maxVal:
-        if index == 0  or _increment_combination(combination, index - 1, maxVal - 1) == 0:
-            return False
-        else:
-            combination[index] = combination[index - 1] + 1
-    else:
-        combination[index] += 1
+        rows = np.repeat(np.arange(len(combinations)), counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        nextValues = lastValues[rows] + 1 + offsets
+        combinations = np.hstack((combinations[rows], nextValues.astype(np.uint8).reshape(-1, 1)))
+
+    return combinations
 
-    return True
+## Number of combinations generate_combinations_from_set() yields at once
+combinationChunkSize = 2 ** 16
 
 ## Generate all combinations of length _c that include all weapons from includeSet and a subset of remainderSet
-def generate_combinations_from_set(includeSet, remainderSet, _c):
-    n = len(remainderSet)
-    c = _c - len(includeSet)
-    
-    if c == 0:
-        return set([tuple(includeSet)])
-    if calculate_number_combinations(n, c) == 0:
-        return set()
-    
-    indices = list(range(c))
-    remainderList = list(remainderSet)
-    combination = remainder[:c] + list(includeSet)
-    combinations = set()
+## Combinations are yielded in lexicographic order of their remainderSet weapons, in (N, _c) uint8 arrays of sorted weapons with at most chunkSize rows
+## Only one chunk is held at a time, so a pool can be filtered (see CandidateFilter) without ever being listed whole
+def generate_combinations_from_set(includeSet, remainderSet, _c, chunkSize=combinationChunkSize):
+    includeList = sorted(includeSet)
+    remainderList = np.array(sorted(remainderSet), dtype=np.uint8)
+    c = _c - len(includeList)
 
-    index = c - 1
-    maxVal = n - 1
-    combinations.append(tuple(combination))
+    if c < 0 or c > len(remainderList):
+        return
 
-    ## Increment indicies and translate index to value of remainderList[index]
-    while _increment_combination_from_set(combination, remainderList, indices, index, maxVal):
-        combinations.append(tuple(combination))
+    block = list()
+    blockSize = 0
+    for indices in _combination_index_chunks(len(remainderList), c, chunkSize):
+        if blockSize + len(indices) > chunkSize:
+            yield _combinations_from_indices(block, remainderList, includeList)
+            block = list()
+            blockSize = 0
 
-    return combinations
+        block.append(indices)
+        blockSize += len(indices)
+
+    yield _combinations_from_indices(block, remainderList, includeList)
 
-def _increment_combination_from_set(combination, remainderList, indices, index, maxVal):
-    indices[index] += 1
-    if indices[index] > maxVal:
-        if index == 0:
-            return 0
-        if _increment_combination_from_set(combination, remainderList, indices, index - 1, maxVal - 1) == 0:
-            return 0
-        indices[index] = indices[index - 1] + 1
+## Generate every combination of c indices of range(n) in lexicographic order, in (N, c) uint8 arrays with at most chunkSize rows
+## The combinations that start with the same first index are split off until they fit in a chunk
+def _combination_index_chunks(n, c, chunkSize, offset=0):
+    if c == 0:
+        yield np.zeros((1, 0), dtype=np.uint8)
+        return
+
+    if calculate_number_combinations(n, c) <= chunkSize:
+        yield _combination_indices(n, c) + np.uint8(offset)
+        return
 
-    combination[index] = remainderList[indices[index]]
-    return 1
+    for first in range(n - c + 1):
+        for chunk in _combination_index_chunks(n - first - 1, c - 1, chunkSize, offset + first + 1):
+            yield np.hstack((np.full((len(chunk), 1), offset + first, dtype=np.uint8), chunk))
+
+## Return the combinations of a list of index chunks as one (N, c) uint8 array of sorted weapons
+def _combinations_from_indices(chunks, remainderList, includeList):
+    indices = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+    combinations = np.hstack((remainderList[indices], np.tile(np.array(includeList, dtype=np.uint8), (len(indices), 1))))
+    combinations.sort(axis=1)
+
+    return combinations
 
 ## Generates a list of all permutations grouped by combinations
+## combinations is an iterable of weapon tuples or a packed array of combination bitmasks
 ## Return a list of sets of tuples
 def generate_grouped_permutations(combinations, c):
     groupedPermutations = list()
 
     permutation = [0] * c
     newIndex = c - 1
+
+    if isinstance(combinations, np.ndarray):
+        combinations = unpack_combinations(combinations, c).tolist()
     
     for combination in combinations:
         weaponSet = set(combination)
@@ -126,6 +140,139 @@ def generate_grouped_permutations(combinations, c):
 
     return groupedPermutations
 
+## Generates every permutation of every combination
+## Permutations of the same combination are consecutive and in the lexicographic order of the positions they take the weapons from
+## codes is an (N, c) array of weapon codes (see unpack_combinations())
+## Return an (N * c!, c) uint8 array
+def permute_combinations(codes):
+    c = codes.shape[1]
+    orders = np.array(list(permutations_of(range(c))), dtype=np.intp).reshape(-1, c)
+    return np.ascontiguousarray(codes[:, orders].reshape(-1, c), dtype=np.uint8)
+
+## Lehmer codes
+## The rank of an ordering of range(c) is its index in lexicographic order (the order of permute_combinations() and itertools.permutations())
+## Digit i of the rank in the factorial number system is the number of later values smaller than value i
+
+## Return the (M, c) orderings of range(c) with the given lexicographic ranks
+def unrank_permutations(ranks, c):
+    ranks = np.asarray(ranks, dtype=np.int64)
+    rows = np.arange(len(ranks))
+    available = np.tile(np.arange(c, dtype=np.intp), (len(ranks), 1))
+    orders = np.empty((len(ranks), c), dtype=np.intp)
+
+    for i in range(c):
+        digits, ranks = np.divmod(ranks, factorial(c - 1 - i))
+        orders[:, i] = available[rows, digits]
+
+        ## Remove the chosen value, every value after it shifts one column to the left
+        columns = np.arange(c - 1 - i)
+        available = np.take_along_axis(available, columns + (columns >= digits.reshape(-1, 1)), axis=1)
+
+    return orders
+
+## Return the lexicographic ranks of (M, c) orderings of range(c) as an int64 array
+def rank_permutations(orders):
+    orders = np.asarray(orders)
+    c = orders.shape[1]
+    ranks = np.zeros(len(orders), dtype=np.int64)
+
+    for i in range(c - 1):
+        digits = (orders[:, i + 1:] < orders[:, i:i + 1]).sum(axis=1)
+        ranks += digits * factorial(c - 1 - i)
+
+    return ranks
+
+## Combinatorial number system
+## The colex rank of a combination c_1 < c_2 < ... < c_k of range(n) is C(c_1, 1) + C(c_2, 2) + ... + C(c_k, k)
+## Ranks are a bijection between the combinations and range(C(n, k)), so a uniformly random integer is a uniformly random combination
+## and a set of combinations can be deduplicated and stored as integers
+
+## Binomial coefficients already tabulated by (n, c)
+_binomialTables = dict()
+
+## Return the (n + 1, c + 1) int64 table of C(x, i), or None if C(n, c) does not fit in an int64
+def binomial_table(n, c):
+    if (n, c) not in _binomialTables:
+        table = None
+        if calculate_number_combinations(n, c) < 2 ** 63:
+            table = np.zeros((n + 1, c + 1), dtype=np.int64)
+            for x in range(n + 1):
+                for i in range(1, min(x, c) + 1):
+                    table[x, i] = calculate_number_combinations(x, i)
+        _binomialTables[(n, c)] = table
+
+    return _binomialTables[(n, c)]
+
+## Return the colex rank of a combination (any iterable of distinct weapons) as a python int
+def rank_combination(combination):
+    return sum(calculate_number_combinations(weapon, i + 1) for i, weapon in enumerate(sorted(combination)))
+
+## Return the combination of c weapons with a colex rank as a sorted tuple
+def unrank_combination(rank, c):
+    combination = list()
+    for i in range(c, 0, -1):
+        ## The largest weapon w with C(w, i) <= rank, found by doubling then bisecting
+        high = i
+        while calculate_number_combinations(high, i) <= rank:
+            high *= 2
+        low = i - 1
+        while high - low > 1:
+            middle = (low + high) // 2
+            if calculate_number_combinations(middle, i) <= rank:
+                low = middle
+            else:
+                high = middle
+
+        combination.append(low)
+        rank -= calculate_number_combinations(low, i)
+
+    return tuple(reversed(combination))
+
+## Return the colex ranks of an (N, c) array of sorted weapon codes of range(n) as an int64 array
+## C(n, c) must fit in an int64
+def rank_combinations(codes, n):
+    codes = np.asarray(codes)
+    table = binomial_table(n, codes.shape[1])
+    ranks = np.zeros(len(codes), dtype=np.int64)
+    for i in range(codes.shape[1]):
+        ranks += table[codes[:, i], i + 1]
+
+    return ranks
+
+## Return the combinations of c weapons of range(n) with the given colex ranks as an (N, c) uint8 array of sorted weapons
+## C(n, c) must fit in an int64
+def unrank_combinations(ranks, n, c):
+    ranks = np.array(ranks, dtype=np.int64)
+    table = binomial_table(n, c)
+    codes = np.empty((len(ranks), c), dtype=np.uint8)
+    for i in range(c, 0, -1):
+        weapons = np.searchsorted(table[:, i], ranks, side='right') - 1
+        codes[:, i - 1] = weapons
+        ranks -= table[weapons, i]
+
+    return codes
+
+## Return numSamples uniformly random combinations of c weapons of range(n) as an (N, c) uint8 array of sorted weapons
+## Samples are distinct unranked integers when C(n, c) fits in an int64, every combination is returned if there are at most numSamples
+## Larger spaces are sampled independently, where a repeated combination is astronomically unlikely
+## Every sample comes from Python's random module (the NumPy generator is seeded from it), so reseeding random is enough to give forked processes their own samples
+def sample_combinations(n, c, numSamples):
+    numCombinations = calculate_number_combinations(n, c)
+    if c == 0:
+        return np.zeros((min(1, numSamples), 0), dtype=np.uint8)
+    if numCombinations <= numSamples:
+        return _combination_indices(n, c)
+    if numCombinations < 2 ** 63:
+        return unrank_combinations(sample(range(numCombinations), numSamples), n, c)
+
+    rng = np.random.default_rng(getrandbits(64))
+    return np.sort(np.argsort(rng.random((numSamples, n)), axis=1)[:, :c], axis=1).astype(np.uint8)
+
+## Return an (N, c) uint8 array of every permutation in a list of sets of permutations (see generate_grouped_permutations())
+def flatten_permutations(groupedPermutations, c):
+    weapons = chain.from_iterable(chain.from_iterable(groupedPermutations))
+    return np.fromiter(weapons, dtype=np.uint8).reshape(-1, c)
+
 ## UNUSED
 #### Generates a list of all permutations
 #### Return an empty list if the number of permutations is greater than 10 million
@@ -162,3 +309,246 @@ def _recursive_permute(permutations, permutation, weaponSet, index):
             weaponSet.remove(weapon)
             _recursive_permute(permutations, permutation, weaponSet, newIndex)
             weaponSet.add(weapon)
+
+## ----------------------------------------------------------------------------------------------
+## Bitmask combinations
+##
+## A combination is stored as a bitmask where bit w is set if weapon w is in the combination
+## A single combination is a python int, a pool of combinations is an (N, number_of_words(n)) uint64 array with weapon w in bit (w % 64) of word (w // 64)
+## The number of weapons two combinations share is then the popcount of their AND
+
+## Return the number of set bits in a python int bitmask
+def count_bits(mask):
+    return bin(mask).count('1')
+
+## Return the python int bitmask of a collection of weapons
+def combination_to_mask(combination):
+    mask = 0
+    for weapon in combination:
+        mask |= 1 << weapon
+
+    return mask
+
+## Return a sorted tuple of the weapons in a python int bitmask
+def mask_to_combination(mask):
+    combination = list()
+    weapon = 0
+    while mask:
+        if mask & 1:
+            combination.append(weapon)
+        mask >>= 1
+        weapon += 1
+
+    return tuple(combination)
+
+## Return the number of uint64 words needed to store a combination of n weapons
+def number_of_words(n):
+    return max(1, (n + 63) // 64)
+
+## Return an empty pool of combination bitmasks
+def empty_combinations(n):
+    return np.zeros((0, number_of_words(n)), dtype=np.uint64)
+
+## Return the number of set bits in every element of a uint64 array
+if hasattr(np, 'bitwise_count'):
+    def popcount(array):
+        return np.bitwise_count(array)
+else:
+    _byteCounts = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(array):
+        array = np.ascontiguousarray(array)
+        return _byteCounts[array.view(np.uint8)].reshape(array.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+## Return an (N, number_of_words(n)) uint64 array of bitmasks given an (N, c) array of weapons
+def pack_combinations(codes, n):
+    masks = np.zeros((len(codes), number_of_words(n)), dtype=np.uint64)
+    weapons = codes.astype(np.uint64)
+    words = weapons // np.uint64(64)
+    bits = np.left_shift(np.uint64(1), weapons % np.uint64(64))
+
+    for word in range(masks.shape[1]):
+        masks[:, word] = np.bitwise_or.reduce(np.where(words == word, bits, np.uint64(0)), axis=1)
+
+    return masks
+
+## Return the packed bitmask (a single row of pack_combinations()) of a collection of weapons
+def pack_combination(combination, n):
+    return pack_combinations(np.array([list(combination)], dtype=np.uint8), n)[0]
+
+## Return an (N, n) uint8 array where row i has a 1 in column w if weapon w is in masks[i]
+def unpack_membership(masks, n):
+    bytesView = np.ascontiguousarray(masks.astype('<u8')).view(np.uint8)
+    return np.unpackbits(bytesView, axis=1, bitorder='little')[:, :n]
+
+## Return an (N, c) uint8 array of the sorted weapons in each bitmask
+## Unpacked in blocks so the intermediate bit array stays small for large pools
+def unpack_combinations(masks, c):
+    codes = np.zeros((len(masks), c), dtype=np.uint8)
+    blockSize = 2 ** 16
+
+    for start in range(0, len(masks), blockSize):
+        block = masks[start:start + blockSize]
+        _, weapons = np.nonzero(unpack_membership(block, block.shape[1] * 64))
+        codes[start:start + len(block)] = weapons.reshape(-1, c)
+
+    return codes
+
+## Return the number of weapons every combination in masks shares with guessMask (a packed bitmask)
+def count_correct_weapons_packed(masks, guessMask):
+    return popcount(masks & guessMask).sum(axis=1, dtype=np.int64)
+
+## ----------------------------------------------------------------------------------------------
+## Vectorized scoring
+##
+## A response (weaponsCorrect, positionsCorrect) is encoded as the single integer weaponsCorrect * (c + 1) + positionsCorrect
+## so a whole guess-by-candidate response table can be partitioned with one np.bincount
+
+## Max number of cells in a response table computed at once
+## Larger blocks amortize numpy overhead, smaller blocks check the deadline more often and use less memory
+scoringBlockSize = 2 ** 22
+
+## Return the number of possible encoded responses for c opponents
+def number_of_responses(c):
+    return (c + 1) ** 2
+
+## Return an (N, c) uint8 array with one combination/permutation per row
+def encode_codes(codes, c):
+    return np.array(list(codes), dtype=np.uint8).reshape(-1, c)
+
+## Return an (N, n) float32 array where row i has a 1 in column w if weapon w is in codes[i]
+## float32 lets the weapon overlap of two pools be computed with a single (exact) matrix product
+def encode_membership(codes, n):
+    membership = np.zeros((len(codes), n), dtype=np.float32)
+    rows = np.repeat(np.arange(len(codes)), codes.shape[1])
+    membership[rows, codes.ravel()] = 1
+    return membership
+
+## Return a (len(guesses), len(candidates)) array of count_correct_weapons() for every pair
+def weapon_response_table(guessMembership, candidateMembership):
+    return np.rint(guessMembership @ candidateMembership.T).astype(np.uint16)
+
+## Return a (len(guesses), len(candidates)) array of count_correct_positions() for every pair
+def position_response_table(guesses, candidates):
+    table = np.zeros((len(guesses), len(candidates)), dtype=np.uint16)
+    for position in range(guesses.shape[1]):
+        table += guesses[:, position, None] == candidates[None, :, position]
+
+    return table
+
+## Return a (len(guesses), len(candidates)) array of encoded responses for every pair
+## Only weapons are scored if candidates are combinations (positionsCorrect is always encoded as 0)
+def response_table(guesses, candidates, guessMembership, candidateMembership, withPositions=True):
+    c = guesses.shape[1]
+    table = weapon_response_table(guessMembership, candidateMembership) * (c + 1)
+    if withPositions:
+        table += position_response_table(guesses, candidates)
+
+    return table
+
+## Return a (len(responses), numResponses) array with the number of candidates producing each response for every guess (row)
+def partition_sizes(responses, numResponses):
+    numRows = responses.shape[0]
+    offsets = np.arange(numRows, dtype=np.int64)[:, None] * numResponses
+    counts = np.bincount((responses + offsets).ravel(), minlength=numRows * numResponses)
+
+    return counts.reshape(numRows, numResponses)
+
+## Return the number of guesses to score per block so that each response table has about scoringBlockSize cells
+def scoring_chunk_size(numCandidates):
+    return max(1, scoringBlockSize // max(1, numCandidates))
+
+## Guess scorers
+## A scorer maps the partition histogram of a block of guesses (see partition_sizes()) to one score per guess, the guess with the lowest score is the best
+## Every scorer works on the same histogram, so switching scorers does not change the cost of scoring a guess
+## A scorer can also be any other module level function with the same signature (it has to be picklable to be used by a ScoringPool)
+
+## Worst-case number of candidates left after the guess (Kunth's minimax score)
+def minimax_scores(histogram):
+    return histogram.max(axis=1)
+
+## Expected number of candidates left after the guess if every candidate is equally likely to be the answer
+def expected_size_scores(histogram):
+    sizes = histogram.astype(np.float64)
+    return (sizes * sizes).sum(axis=1) / np.maximum(sizes.sum(axis=1), 1)
+
+## Shannon entropy (in bits) of the response to the guess, negated so the most informative guess has the lowest score
+def entropy_scores(histogram):
+    probabilities = histogram / np.maximum(histogram.sum(axis=1, keepdims=True), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(probabilities > 0, probabilities * np.log2(probabilities), 0.0)
+
+    return terms.sum(axis=1)
+
+## Scorers by name
+scorers = {'minimax': minimax_scores, 'expected': expected_size_scores, 'entropy': entropy_scores}
+
+## Return the scorer function for a name in scorers or a scorer function
+def get_scorer(scorer):
+    if callable(scorer):
+        return scorer
+
+    if scorer not in scorers:
+        raise ValueError("Unknown scorer: " + str(scorer))
+
+    return scorers[scorer]
+
+## Return the score of every guess against the candidate pool, lower is better
+def guess_scores(guesses, candidates, guessMembership, candidateMembership, withPositions=True, scorer='minimax'):
+    responses = response_table(guesses, candidates, guessMembership, candidateMembership, withPositions)
+    return get_scorer(scorer)(partition_sizes(responses, number_of_responses(guesses.shape[1])))
+
+## Return the worst-case partition size (Kunth's minimax score) of every guess against the candidate pool
+def worst_case_sizes(guesses, candidates, guessMembership, candidateMembership, withPositions=True):
+    return guess_scores(guesses, candidates, guessMembership, candidateMembership, withPositions, minimax_scores)
+
+## ----------------------------------------------------------------------------------------------
+## Guess symmetry
+##
+## Weapons that the previous guesses cannot tell apart are interchangeable: relabeling them maps every possible answer to another possible answer
+## Guesses that only differ by such a relabeling split the candidates into partitions of the same sizes, so only one guess per class needs to be scored
+
+## Return an array mapping every weapon to its equivalence class given the previous guesses
+## withPositions=False: weapons are equivalent if they appear in exactly the same previous guesses (combination scoring)
+## withPositions=True: weapons are equivalent if they appear at the same positions of the same previous guesses (permutation scoring)
+def weapon_classes(n, previousGuesses, withPositions):
+    if len(previousGuesses) == 0:
+        return np.zeros(n, dtype=np.intp)
+
+    signatures = np.full((n, len(previousGuesses)), -1, dtype=np.int16)
+    for column, guess in enumerate(previousGuesses):
+        for position, weapon in enumerate(guess):
+            signatures[weapon, column] = position if withPositions else 0
+
+    _, classes = np.unique(signatures, axis=0, return_inverse=True)
+    return classes.reshape(-1)
+
+## Return the sorted indices of the first occurrence of every distinct row of a 2D integer array
+def _first_unique_rows(rows):
+    numValues = int(rows.max()) + 1 if rows.size else 1
+
+    if numValues ** rows.shape[1] < 2 ** 63:
+        ## Pack every row into a single int64 key, much faster than np.unique(axis=0)
+        keys = np.zeros(len(rows), dtype=np.int64)
+        for column in range(rows.shape[1]):
+            keys = keys * numValues + rows[:, column]
+        _, index = np.unique(keys, return_index=True)
+    else:
+        _, index = np.unique(rows, axis=0, return_index=True)
+
+    return np.sort(index)
+
+## Return the indices of one representative of every class of equivalent combinations in a packed pool
+## Two combinations are equivalent if they hold the same number of weapons from every weapon class
+def representative_combinations(masks, classes, n):
+    counts = list()
+    for weaponClass in range(int(classes.max()) + 1):
+        classMask = pack_combination(np.flatnonzero(classes == weaponClass), n)
+        counts.append(count_correct_weapons_packed(masks, classMask))
+
+    return _first_unique_rows(np.stack(counts, axis=1))
+
+## Return the indices of one representative of every class of equivalent permutations in an (N, c) array
+## Two permutations are equivalent if they hold weapons of the same class at every position
+def representative_permutations(codes, classes):
+    return _first_unique_rows(classes[codes])
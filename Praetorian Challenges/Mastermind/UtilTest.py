@@ -1,5 +1,9 @@
 from Util import *
 import sys
+from random import sample
+from random import randint
+from random import seed
+from itertools import permutations as permutations_of
 
 debugger_combination = None
 debugger_permutation = None
@@ -41,49 +45,210 @@ def test_generate_grouped_permutations():
 
 ## Test function generate_combinations_from_set()
 ## Verify by checking if number of elements in the generated combination set match the expected number calculated.
-## Verify that all combinations include the includeSet
+## Verify that all combinations include the includeSet, are unique and sorted, and that no chunk is larger than chunkSize
 ## Save output of generate_combinations_from_set() to debugger_combination for quick analysis in shell
-def test_generate_combinations_from_set():
+def test_generate_combinations_from_set(chunkSize=7):
     global debugger_combination
 
-    includeSet = set([])
-    remainderSet = set(range(10))
-    for c in range(1, 10):
-        print("starting c = " + str(c))
-        debugger_combination = generate_combinations_from_set(includeSet, remainderSet, c)
-        if len(debugger_combination) != calculate_number_combinations(len(remainderSet), c - len(includeSet)):
-            print("test_generate_combinations_from_set() failed " + str(includeSet))
+    cases = [(set(), set(range(10)), c) for c in range(1, 10)]
+    cases += [(set([0, 1]), set(range(2, 10)), c) for c in range(3, 10)]
+    cases += [(set([5, 9]), set(range(5)) | set([6, 7, 8]), c) for c in range(3, 10)]
+    ## Edge cases: only the includeSet fits, no remainderSet and more weapons than there are
+    cases += [(set([0, 1]), set(range(2, 10)), 2), (set(range(10)), set(), 10), (set(), set(range(5)), 6)]
+
+    for includeSet, remainderSet, c in cases:
+        print("starting " + str(sorted(includeSet)) + " c = " + str(c))
+        chunks = list(generate_combinations_from_set(includeSet, remainderSet, c, chunkSize))
+        debugger_combination = np.concatenate(chunks) if chunks else np.zeros((0, c), dtype=np.uint8)
+
+        if len(debugger_combination) != max(calculate_number_combinations(len(remainderSet), c - len(includeSet)), int(c == len(includeSet))):
+            print("test_generate_combinations_from_set() failed " + str(includeSet) + ' ' + str(c))
+            sys.exit()
+        if any(len(chunk) > chunkSize for chunk in chunks):
+            print("test_generate_combinations_from_set() chunk too large " + str(includeSet) + ' ' + str(c))
             sys.exit()
 
-    includeSet = set([0, 1])
-    remainderSet = set(range(2, 10))
-    for c in range(3, 10):
-        print("starting c = " + str(c))
-        debugger_combination = generate_combinations_from_set(includeSet, remainderSet, c)
-        if len(debugger_combination) != calculate_number_combinations(len(remainderSet), c - len(includeSet)):
-            print("test_generate_combinations_from_set() failed " + str(includeSet))
+        combinations = [tuple(combination) for combination in debugger_combination.tolist()]
+        if len(set(combinations)) != len(combinations):
+            print("test_generate_combinations_from_set() duplicate combination " + str(includeSet) + ' ' + str(c))
             sys.exit()
-        for combination in debugger_combination:
-            if len(set(combination).intersection(set(includeSet))) != 2:
+        for combination in combinations:
+            if not includeSet.issubset(combination) or not set(combination).issubset(includeSet | remainderSet) or list(combination) != sorted(combination):
                 print("test_generate_combinations_from_set() failed " + str(includeSet) + str(combination))
                 sys.exit()
 
-    includeSet = set([0, 1])
-    remainderSet = set(range(2, 10))
-    c = 2
-    print("starting edge case 1")
-    debugger_combination = generate_combinations_from_set(includeSet, remainderSet, c)
-    if len(debugger_combination) != 1:
-        print("test_generate_combinations_from_set() failed " + str(c))
+    print("test_generate_combinations_from_set() passed")
+
+## Test the combinatorial number system for a range of (n, c)
+## Verify that the colex ranks of every combination are exactly range(C(n, c)), that ranking and unranking agree with each other and with the scalar versions,
+## and that sampled combinations are valid, sorted and distinct
+def test_combination_ranks():
+    for n in range(1, 13):
+        print("starting n = " + str(n))
+        for c in range(1, n + 1):
+            codes = unpack_combinations(generate_combinations(n, c), c)
+            ranks = rank_combinations(codes, n)
+            if sorted(ranks.tolist()) != list(range(calculate_number_combinations(n, c))):
+                print("rank_combinations() failed " + str(n) + ' ' + str(c))
+                sys.exit()
+            if not np.array_equal(unrank_combinations(ranks, n, c), codes):
+                print("unrank_combinations() failed " + str(n) + ' ' + str(c))
+                sys.exit()
+            for combination, rank in zip(codes.tolist(), ranks.tolist()):
+                if rank_combination(combination) != rank or unrank_combination(rank, c) != tuple(combination):
+                    print("rank_combination() failed " + str(combination))
+                    sys.exit()
+
+            samples = sample_combinations(n, c, 20)
+            if len(samples) != min(20, len(codes)) or len(np.unique(samples, axis=0)) != len(samples) or (np.diff(samples.astype(int), axis=1) <= 0).any():
+                print("sample_combinations() failed " + str(n) + ' ' + str(c))
+                sys.exit()
+
+    ## Spaces too large for int64 ranks
+    combination = tuple(range(0, 200, 2))
+    if unrank_combination(rank_combination(combination), len(combination)) != combination:
+        print("unrank_combination() failed on a large space")
+        sys.exit()
+    samples = sample_combinations(200, 100, 50)
+    if samples.shape != (50, 100) or (np.diff(samples.astype(int), axis=1) <= 0).any():
+        print("sample_combinations() failed on a large space")
         sys.exit()
 
-    includeSet = set(range(10))
-    remainderSet = set([])
-    c = 10
-    print("starting edge case 2")
-    debugger_combination = generate_combinations_from_set(includeSet, remainderSet, c)
-    if len(debugger_combination) != 1:
-        print("test_generate_combinations_from_set() failed " + str(c))
+    ## Large spaces have to follow Python's random seed, ScoringPool reseeds only random in its workers
+    samples = list()
+    for workerSeed in (1, 1, 2):
+        seed(workerSeed)
+        samples.append(sample_combinations(200, 100, 4))
+    if not (samples[0] == samples[1]).all() or (samples[0] == samples[2]).all():
+        print("sample_combinations() does not follow the seed of random on a large space")
         sys.exit()
 
-    print("test_generate_combinations_from_set() passed")
+    print("test_combination_ranks() passed")
+
+## Test function response_table() and worst_case_sizes() for a range of (n, c)
+## Verify by comparing every pair against count_correct_weapons() and count_correct_positions()
+def test_response_table():
+    for n in range(2, 9):
+        print("starting n = " + str(n))
+        for c in range(1, min(n, 5)):
+            permutations = [tuple(p) for group in generate_grouped_permutations(generate_combinations(n, c), c) for p in group]
+            codes = encode_codes(permutations, c)
+            membership = encode_membership(codes, n)
+            table = response_table(codes, codes, membership, membership)
+            worstCase = worst_case_sizes(codes, codes, membership, membership)
+
+            for i, guess in enumerate(permutations):
+                responseCounter = [0] * number_of_responses(c)
+                for j, answer in enumerate(permutations):
+                    response = count_correct_weapons(guess, answer) * (c + 1) + count_correct_positions(guess, answer)
+                    responseCounter[response] += 1
+                    if table[i, j] != response:
+                        print("response_table() failed " + str(guess) + ' ' + str(answer))
+                        sys.exit()
+                if worstCase[i] != max(responseCounter):
+                    print("worst_case_sizes() failed " + str(guess))
+                    sys.exit()
+
+    print("test_response_table() passed")
+
+## Test the bitmask combination helpers for a range of (n, c)
+## Verify that generate_combinations() returns unique bitmasks with c weapons each, that packing round-trips
+## and that count_correct_weapons_packed() matches count_correct_weapons()
+def test_bitmask_combinations():
+    for n in [1, 5, 10, 63, 64, 65, 130]:
+        print("starting n = " + str(n))
+        for c in [1, 2, 3, n]:
+            if c > n or calculate_number_combinations(n, c) > 100000:
+                continue
+
+            masks = generate_combinations(n, c)
+            codes = unpack_combinations(masks, c)
+            if len(np.unique(masks, axis=0)) != calculate_number_combinations(n, c):
+                print("generate_combinations() failed " + str(n) + ' ' + str(c))
+                sys.exit()
+            if not np.array_equal(pack_combinations(codes, n), masks):
+                print("pack_combinations() failed " + str(n) + ' ' + str(c))
+                sys.exit()
+
+            guess = tuple(range(n - c, n))
+            overlap = count_correct_weapons_packed(masks, pack_combination(guess, n))
+            for combination, numCorrect in zip(codes.tolist(), overlap):
+                if numCorrect != count_correct_weapons(guess, combination) or mask_to_combination(combination_to_mask(combination)) != tuple(combination):
+                    print("test_bitmask_combinations() failed " + str(guess) + ' ' + str(combination))
+                    sys.exit()
+
+    print("test_bitmask_combinations() passed")
+
+## Test function weapon_classes(), representative_permutations() and representative_combinations() for random histories
+## Verify that every guess scores the same as the other guesses of its class, so the representatives always contain an optimal guess
+def test_representative_guesses():
+    for n in range(4, 9):
+        print("starting n = " + str(n))
+        for c in range(2, min(n, 4)):
+            permutations = list(permutations_of(range(n), c))
+            answer = permutations[0]
+            history = [tuple(sample(range(n), c)) for _ in range(randint(0, 2))]
+            pool = [p for p in permutations if all(count_correct_weapons(p, g) == count_correct_weapons(answer, g) and count_correct_positions(p, g) == count_correct_positions(answer, g) for g in history)]
+
+            codes = encode_codes(pool, c)
+            membership = encode_membership(codes, n)
+            worstCase = worst_case_sizes(codes, codes, membership, membership)
+            labels = weapon_classes(n, history, True)[codes]
+            for i in representative_permutations(codes, weapon_classes(n, history, True)):
+                if (worstCase[(labels == labels[i]).all(axis=1)] != worstCase[i]).any():
+                    print("representative_permutations() failed " + str(history))
+                    sys.exit()
+
+            combinations = encode_codes(sorted(set(tuple(sorted(p)) for p in pool)), c)
+            membership = encode_membership(combinations, n)
+            worstCase = worst_case_sizes(combinations, combinations, membership, membership, withPositions=False)
+            representatives = representative_combinations(pack_combinations(combinations, n), weapon_classes(n, history, False), n)
+            if worstCase[representatives].min() != worstCase.min():
+                print("representative_combinations() failed " + str(history))
+                sys.exit()
+
+    print("test_representative_guesses() passed")
+
+## Test functions unrank_permutations() and rank_permutations() for c up to 7
+## Verify that ranks follow the order of itertools.permutations() and that rank_permutations() inverts unrank_permutations()
+def test_lehmer_codes():
+    for c in range(1, 8):
+        ranks = np.arange(calculate_number_permutations(c, c))
+        orders = unrank_permutations(ranks, c)
+        if orders.tolist() != [list(order) for order in permutations_of(range(c))]:
+            print("unrank_permutations() failed " + str(c))
+            sys.exit()
+        if not np.array_equal(rank_permutations(orders), ranks):
+            print("rank_permutations() failed " + str(c))
+            sys.exit()
+
+    print("test_lehmer_codes() passed")
+
+## Test the guess scorers for a range of (n, c)
+## Verify every scorer against the partition sizes counted with count_correct_weapons() and count_correct_positions()
+def test_guess_scorers():
+    for n in range(2, 8):
+        print("starting n = " + str(n))
+        for c in range(1, min(n, 4)):
+            permutations = list(permutations_of(range(n), c))
+            codes = encode_codes(permutations, c)
+            membership = encode_membership(codes, n)
+            scores = {name: guess_scores(codes, codes, membership, membership, True, name) for name in scorers}
+
+            for i, guess in enumerate(permutations):
+                responseCounter = [0] * number_of_responses(c)
+                for answer in permutations:
+                    responseCounter[count_correct_weapons(guess, answer) * (c + 1) + count_correct_positions(guess, answer)] += 1
+
+                sizes = [size for size in responseCounter if size]
+                expected = {
+                    'minimax': max(sizes),
+                    'expected': sum(size * size for size in sizes) / len(permutations),
+                    'entropy': sum(size / len(permutations) * np.log2(size / len(permutations)) for size in sizes),
+                }
+                for name in scorers:
+                    if abs(scores[name][i] - expected[name]) > 1e-9:
+                        print("guess_scores() failed " + name + ' ' + str(guess))
+                        sys.exit()
+
+    print("test_guess_scorers() passed")
@@ -0,0 +1,92 @@
+import time
+from random import sample
+from Util import *
+from candidateFilter import CandidateFilter
+from permutationSpace import PermutationSpace
+
+## Picks Gladiator's cutoffs from the speed of this machine instead of constants tuned by hand
+##
+## A short micro-benchmark measures how many response table cells can be scored per second and how many candidates can be filtered per second
+## optimalCutoffSize is the largest pool whose every guess can be scored against every candidate in the guess time
+## approximateCutoffSize is the largest pool that can be filtered with every previous guess in the update time
+## The throughputs are measured once per level, the cutoffs are computed from them for the time budget of every turn
+
+## Seconds spent measuring each throughput
+calibrationTime = 0.1
+
+## Number of candidates filtered per measurement
+calibrationPoolSize = 2 ** 17
+
+## Fraction of a time budget the cutoffs plan to use, the rest covers everything the micro-benchmark does not measure
+safetyFactor = 0.5
+
+## Number of previous guesses a newly generated pool is assumed to be filtered with in its first update
+replayedGuesses = 4
+
+## Bounds on the tuned cutoffs
+## approximateCutoffSize is capped at the hand-tuned cutoff to bound the memory of the generated pools and of the int64 indices built over them
+minOptimalCutoffSize = 100
+maxApproximateCutoffSize = 4000000
+
+## Return the number of response table cells per second that guess_scores() scores for permutations of c weapons out of n
+def scoring_rate(n, c):
+    candidates = encode_codes([sample(range(n), c) for _ in range(4096)], c)
+    membership = encode_membership(candidates, n)
+    guesses = candidates[:scoring_chunk_size(len(candidates))]
+    guessMembership = membership[:len(guesses)]
+
+    numCells = 0
+    start = time.perf_counter()
+    while numCells == 0 or time.perf_counter() - start < calibrationTime:
+        guess_scores(guesses, candidates, guessMembership, membership, True)
+        numCells += len(guesses) * len(candidates)
+
+    return numCells / (time.perf_counter() - start)
+
+## Return the number of candidates per second that a CandidateFilter checks against one guess
+## Measured on a lazy PermutationSpace of random combinations, the slowest pool a filter runs over
+def filtering_rate(n, c):
+    numCombinations = -(-calibrationPoolSize // factorial(c))
+    combinations = sample_combinations(n, c, numCombinations)
+    space = PermutationSpace(combinations, c)[:calibrationPoolSize]
+    guess = sample(range(n), c)
+
+    numChecked = 0
+    start = time.perf_counter()
+    while numChecked == 0 or time.perf_counter() - start < calibrationTime:
+        candidateFilter = CandidateFilter(space, n, True)
+        candidateFilter.add_constraint(guess, count_correct_weapons(guess, combinations[0].tolist()), 0)
+        candidateFilter.run(float('inf'))
+        numChecked += len(space)
+
+    return numChecked / (time.perf_counter() - start)
+
+## Return (approximateCutoffSize, optimalCutoffSize) for the throughputs (scoringRate, filteringRate) and the seconds left to update and to guess
+## numWorkers is the number of processes the guess search is sharded across
+def budget_cutoffs(rates, updateBudget, guessBudget, numWorkers=1):
+    scoringRate, filteringRate = rates
+
+    optimalCutoffSize = int((scoringRate * numWorkers * max(0.0, guessBudget) * safetyFactor) ** 0.5)
+    optimalCutoffSize = min(maxApproximateCutoffSize, max(minOptimalCutoffSize, optimalCutoffSize))
+    approximateCutoffSize = int(filteringRate * max(0.0, updateBudget) * safetyFactor / replayedGuesses)
+    approximateCutoffSize = min(maxApproximateCutoffSize, max(optimalCutoffSize, approximateCutoffSize))
+
+    return approximateCutoffSize, optimalCutoffSize
+
+## Return (approximateCutoffSize, optimalCutoffSize) for a level on this machine, measuring the throughputs again
+def tune_cutoffs(n, c, updateTimeout, guessTimeout, numWorkers=1):
+    return budget_cutoffs((scoring_rate(n, c), filtering_rate(n, c)), updateTimeout, guessTimeout - updateTimeout, numWorkers)
+
+## Throughputs (scoringRate, filteringRate) already measured in this process by (n, c)
+_rates = dict()
+
+## Return (scoringRate, filteringRate) for permutations of c weapons out of n, only running the micro-benchmark the first time a level is seen
+def get_rates(n, c):
+    if (n, c) not in _rates:
+        _rates[(n, c)] = (scoring_rate(n, c), filtering_rate(n, c))
+
+    return _rates[(n, c)]
+
+## Return (approximateCutoffSize, optimalCutoffSize) for the whole time budget of a turn from the throughputs measured by get_rates()
+def get_cutoffs(n, c, updateTimeout, guessTimeout, numWorkers=1):
+    return budget_cutoffs(get_rates(n, c), updateTimeout, guessTimeout - updateTimeout, numWorkers)
@@ -0,0 +1,33 @@
+import sys
+import time
+import autotune
+from autotune import *
+
+## Test tune_cutoffs(), get_cutoffs() and budget_cutoffs() for a few levels
+## Verify that the cutoffs respect their bounds, grow with the time budget and that the throughputs are only measured once per level
+def test_autotune():
+    for n, c in [(6, 3), (20, 4), (24, 12)]:
+        approximateCutoffSize, optimalCutoffSize = tune_cutoffs(n, c, 4, 9)
+        if not minOptimalCutoffSize <= optimalCutoffSize <= approximateCutoffSize <= maxApproximateCutoffSize:
+            print("tune_cutoffs() out of bounds " + str(n) + ' ' + str(c))
+            sys.exit()
+
+        ## Give the slow run a hundred times less time so measurement noise can not flip the order
+        slowApproximate, slowOptimal = tune_cutoffs(n, c, 0.04, 0.09)
+        if slowApproximate > approximateCutoffSize or slowOptimal > optimalCutoffSize:
+            print("tune_cutoffs() did not shrink with the time budget " + str(n) + ' ' + str(c))
+            sys.exit()
+
+    cutoffs = get_cutoffs(10, 5, 4, 9)
+    start = time.time()
+    if get_cutoffs(10, 5, 4, 9) != cutoffs or time.time() - start > autotune.calibrationTime:
+        print("get_cutoffs() did not reuse the measured cutoffs")
+        sys.exit()
+
+    ## The guess time left late in a turn only shrinks optimalCutoffSize
+    lateCutoffs = budget_cutoffs(get_rates(10, 5), 4, 0.05)
+    if lateCutoffs[0] != cutoffs[0] or lateCutoffs[1] > cutoffs[1]:
+        print("budget_cutoffs() did not scale to the guess time left")
+        sys.exit()
+
+    print("test_autotune() passed")
@@ -0,0 +1,257 @@
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+import Gladiator as gladiatorModule
+from Util import *
+from Gladiator import Gladiator
+
+## Offline benchmark of Gladiator against a simulated server
+##
+## Every (numWeapons, numOpponents) cell plays numRounds rounds with one Gladiator, the same way Mastermind.py plays a level
+## The output is JSON so runs on different commits can be compared with --compare
+
+## Levels played when no grid is given
+defaultGrid = [(6, 3), (8, 4), (10, 5), (12, 4), (9, 6), (20, 4)]
+
+## The server gives up on a turn after this many seconds
+turnTimeout = 10
+
+## Simulated Mastermind server for one level
+## Responses have the same shape as the real API (see Mastermind.py)
+class SimulatedServer:
+    def __init__(self, numWeapons, numOpponents, numGuesses, numRounds, rng=None):
+        self.numWeapons = numWeapons
+        self.numOpponents = numOpponents
+        self.numGuesses = numGuesses
+        self.numRounds = numRounds
+        self.rng = random.Random() if rng is None else rng
+
+        self.roundsLeft = numRounds
+        self.guessesLeft = numGuesses
+        self.answer = None
+        self.new_round()
+
+    ## Level parameters as returned by GET /level/{num}/
+    def level(self):
+        return {'numWeapons': self.numWeapons, 'numGladiators': self.numOpponents, 'numGuesses': self.numGuesses, 'numRounds': self.numRounds}
+
+    ## Pick a new random answer
+    def new_round(self):
+        self.answer = tuple(self.rng.sample(range(self.numWeapons), self.numOpponents))
+        self.guessesLeft = self.numGuesses
+
+    ## Score a guess as POST /level/{num}/ would
+    def guess(self, guess):
+        if len(guess) != self.numOpponents or len(set(guess)) != self.numOpponents or min(guess) < 0 or max(guess) >= self.numWeapons:
+            return {'error': 'Invalid guess: ' + str(list(guess))}
+
+        self.guessesLeft -= 1
+        response = [count_correct_weapons(self.answer, guess), count_correct_positions(self.answer, guess)]
+
+        if response[1] == self.numOpponents:
+            self.roundsLeft -= 1
+            if self.roundsLeft == 0:
+                return {'message': 'Onto the next level'}
+            self.new_round()
+            return {'roundsLeft': self.roundsLeft}
+
+        if self.guessesLeft == 0:
+            return {'error': 'Too many guesses. Try again!'}
+
+        return {'response': response}
+
+## Replace every update and guess strategy of a Gladiator with a wrapper that adds its run time to strategyTime[name]
+def instrument(gladiator, strategyTime):
+    def timed(strategy):
+        name = strategy.__name__
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                return strategy(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                entry = strategyTime.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+                entry['calls'] += 1
+                entry['total'] += elapsed
+                entry['max'] = max(entry['max'], elapsed)
+        return wrapper
+
+    gladiator._updateStrategy = [timed(strategy) for strategy in gladiator._updateStrategy]
+    gladiator._guessStrategy = [timed(strategy) for strategy in gladiator._guessStrategy]
+
+## Return the p-th percentile of a list of values, None if it is empty
+def percentile(values, p):
+    if not values:
+        return None
+
+    return float(np.percentile(values, p))
+
+## Play numRounds rounds of one level against a SimulatedServer
+## Peak memory is measured with tracemalloc over the Gladiator construction and the first round only, so the other rounds are timed without its overhead
+## Return the results of the level as a dict
+def benchmark_level(numWeapons, numOpponents, numRounds, numGuesses=None, seed=0, useOpeningBook=False):
+    if numGuesses is None:
+        numGuesses = max(10, numWeapons)
+
+    server = SimulatedServer(numWeapons, numOpponents, numGuesses, numRounds, random.Random(seed))
+    random.seed(seed)
+
+    strategyTime = dict()
+    turnLatency = list()
+    guessesPerRound = list()
+    numFailures = 0
+    peakMemory = None
+
+    ## Tune the cutoffs before measuring so setupTime and peakMemory only cover the game
+    if gladiatorModule.autotuneCutoffs:
+        Gladiator(numWeapons, numOpponents, useOpeningBook)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    gladiator = Gladiator(numWeapons, numOpponents, useOpeningBook)
+    setupTime = time.perf_counter() - start
+    instrument(gladiator, strategyTime)
+
+    for roundIndex in range(numRounds):
+        numGuessesMade = 0
+        guess = gladiator.get_next_guess()
+
+        while True:
+            numGuessesMade += 1
+            r = server.guess(guess)
+
+            if 'response' not in r:
+                if 'error' in r:
+                    numFailures += 1
+                    server.new_round()
+                break
+
+            start = time.perf_counter()
+            gladiator.update(r['response'][0], r['response'][1])
+            guess = gladiator.get_next_guess()
+            turnLatency.append(time.perf_counter() - start)
+
+        guessesPerRound.append(numGuessesMade)
+        gladiator.reset()
+
+        if roundIndex == 0:
+            _, peakMemory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    return {
+        'numWeapons': numWeapons,
+        'numOpponents': numOpponents,
+        'numRounds': numRounds,
+        'numFailures': numFailures,
+        'setupTime': setupTime,
+        'approximateCutoffSize': gladiator.approximateCutoffSize,
+        'optimalCutoffSize': gladiator.optimalCutoffSize,
+        'guessesPerRound': {
+            'mean': float(np.mean(guessesPerRound)),
+            'max': max(guessesPerRound),
+            'histogram': {str(k): guessesPerRound.count(k) for k in sorted(set(guessesPerRound))},
+        },
+        'turnLatency': {
+            'p50': percentile(turnLatency, 50),
+            'p90': percentile(turnLatency, 90),
+            'p99': percentile(turnLatency, 99),
+            'max': max(turnLatency) if turnLatency else None,
+            'overTimeout': sum(1 for latency in turnLatency if latency > turnTimeout),
+        },
+        'strategyTime': strategyTime,
+        'scheduler': gladiator.scheduler.stats(),
+        'partitionMemo': gladiator.partitionMemo.stats() if gladiator.partitionMemo is not None else None,
+        'peakMemoryBytes': peakMemory,
+    }
+
+## Return the current git commit, None outside of a git checkout
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+## Run every level of the grid
+## Return the whole benchmark as a dict, including the Gladiator tuning constants it ran with
+def run_benchmark(grid=defaultGrid, numRounds=10, seed=0, useOpeningBook=False, verbose=True):
+    results = list()
+    for numWeapons, numOpponents in grid:
+        result = benchmark_level(numWeapons, numOpponents, numRounds, seed=seed, useOpeningBook=useOpeningBook)
+        results.append(result)
+
+        if verbose:
+            print('{0:>3} {1:>3}  guesses {2:5.2f} (max {3})  p90 turn {4:.3f}s  peak {5:.1f}MB  failures {6}'.format(
+                numWeapons, numOpponents, result['guessesPerRound']['mean'], result['guessesPerRound']['max'],
+                result['turnLatency']['p90'] or 0.0, (result['peakMemoryBytes'] or 0) / 2 ** 20, result['numFailures']))
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'seed': seed,
+        'useOpeningBook': useOpeningBook,
+        'parameters': {
+            'autotuneCutoffs': gladiatorModule.autotuneCutoffs,
+            'approximateCutoffSize': gladiatorModule.approximateCutoffSize,
+            'optimalCutoffSize': gladiatorModule.optimalCutoffSize,
+            'updateTimeout': gladiatorModule.updateTimeout,
+            'guessTimeout': gladiatorModule.guessTimeout,
+            'guessScorer': gladiatorModule.guessScorer if isinstance(gladiatorModule.guessScorer, str) else gladiatorModule.guessScorer.__name__,
+            'numWorkers': gladiatorModule.numWorkers,
+        },
+        'results': results,
+    }
+
+## Print the change in guesses per round, p90 turn latency and peak memory of every level two benchmarks share
+def compare(baseline, current):
+    baselineResults = {(r['numWeapons'], r['numOpponents']): r for r in baseline['results']}
+
+    print('{0:>3} {1:>3}  {2:>17}  {3:>21}  {4:>17}'.format('n', 'c', 'guesses', 'p90 turn (s)', 'peak (MB)'))
+    for result in current['results']:
+        key = (result['numWeapons'], result['numOpponents'])
+        if key not in baselineResults:
+            continue
+
+        old = baselineResults[key]
+        print('{0:>3} {1:>3}  {2:7.2f} -> {3:6.2f}  {4:9.3f} -> {5:8.3f}  {6:7.1f} -> {7:6.1f}'.format(
+            key[0], key[1],
+            old['guessesPerRound']['mean'], result['guessesPerRound']['mean'],
+            old['turnLatency']['p90'] or 0.0, result['turnLatency']['p90'] or 0.0,
+            (old['peakMemoryBytes'] or 0) / 2 ** 20, (result['peakMemoryBytes'] or 0) / 2 ** 20))
+
+## Return a grid from a string like "10:5,20:4"
+def parse_grid(text):
+    return [tuple(int(value) for value in cell.split(':')) for cell in text.split(',')]
+
+## Usage: python benchmark.py [--grid 10:5,20:4] [--rounds 10] [--seed 0] [--scorer minimax] [--opening-book] [--output results.json] [--compare baseline.json]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark Gladiator against a simulated server')
+    parser.add_argument('--grid', type=parse_grid, default=defaultGrid, help='levels as numWeapons:numOpponents pairs separated by commas')
+    parser.add_argument('--rounds', type=int, default=10, help='rounds per level')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scorer', choices=sorted(scorers), help='override Gladiator.guessScorer')
+    parser.add_argument('--opening-book', action='store_true', help='let Gladiator use the opening book')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare the results against a previous JSON file')
+    args = parser.parse_args()
+
+    if args.scorer is not None:
+        gladiatorModule.guessScorer = args.scorer
+
+    benchmark = run_benchmark(args.grid, args.rounds, args.seed, args.opening_book)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(benchmark, f, indent=2, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(json.load(f), benchmark)
@@ -0,0 +1,29 @@
+import sys
+import json
+from Util import *
+from benchmark import *
+
+## Test SimulatedServer and run_benchmark() on a small grid
+## Verify that the server answers like the real API and that every level of the benchmark is solved and survives a JSON round trip
+def test_benchmark(grid=[(6, 3), (8, 4)], numRounds=3):
+    server = SimulatedServer(6, 3, 10, 2)
+    answer = server.answer
+    wrong = tuple(weapon for weapon in range(6) if weapon not in answer)
+
+    if server.guess(wrong) != {'response': [0, 0]} or 'error' not in server.guess((0, 0, 1)):
+        print("SimulatedServer response failed")
+        sys.exit()
+    if server.guess(answer) != {'roundsLeft': 1} or server.guess(server.answer) != {'message': 'Onto the next level'}:
+        print("SimulatedServer rounds failed")
+        sys.exit()
+
+    benchmark = run_benchmark(grid, numRounds, verbose=False)
+    for result in json.loads(json.dumps(benchmark))['results']:
+        if result['numFailures'] != 0 or sum(result['guessesPerRound']['histogram'].values()) != numRounds:
+            print("run_benchmark() failed " + str(result['numWeapons']) + ' ' + str(result['numOpponents']))
+            sys.exit()
+        if result['peakMemoryBytes'] is None or not result['strategyTime']:
+            print("run_benchmark() did not measure " + str(result['numWeapons']) + ' ' + str(result['numOpponents']))
+            sys.exit()
+
+    print("test_benchmark() passed")
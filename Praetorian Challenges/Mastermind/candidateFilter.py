@@ -0,0 +1,182 @@
+import time
+import numpy as np
+from Util import *
+
+## Number of candidates checked at once
+## Work is checkpointed between blocks, so this is also the most work that can run past the deadline
+filterBlockSize = 2 ** 16
+
+## Streaming filter that removes candidates that would not produce the same responses as the server
+##
+## The pool is kept as consecutive chunks [rows, numApplied] where rows have already been checked against constraints[:numApplied]
+## run() only checks every candidate against the constraints it has not seen yet, all of them in one pass per block
+## If the deadline passes, the unchecked rest of the chunk is kept as is and run() resumes from that exact block next time
+## rows can also be a lazy PermutationSpace or a StreamedPool, only the candidates that pass are ever stored as an array
+class CandidateFilter:
+    def __init__(self, pool, numWeapons, withPositions):
+        self.numWeapons = numWeapons
+
+        ## True if rows are (N, c) permutation codes checked against both weapons and positions
+        ## False if rows are packed combination bitmasks only checked against weapons
+        self.withPositions = withPositions
+
+        ## (guess, weaponsCorrect, positionsCorrect, prepared guess)
+        self.constraints = list()
+
+        self.chunks = [[pool, 0]]
+
+    ## Add a guess and the response from the server, the candidates are checked against it by the next run()
+    def add_constraint(self, guess, weaponsCorrect, positionsCorrect):
+        if self.withPositions:
+            inGuess = np.zeros(self.numWeapons, dtype=bool)
+            inGuess[list(guess)] = True
+            prepared = (inGuess, np.array(guess, dtype=np.uint8))
+        else:
+            prepared = pack_combination(guess, self.numWeapons)
+
+        self.constraints.append((tuple(guess), weaponsCorrect, positionsCorrect, prepared))
+
+    ## Return True if every candidate has been checked against every constraint
+    def is_complete(self):
+        return all(numApplied == len(self.constraints) for _, numApplied in self.chunks)
+
+    ## Return the number of remaining candidates (an upper bound on the possible answers until the filter is complete)
+    def size(self):
+        return sum(len(rows) for rows, _ in self.chunks)
+
+    ## Return the candidates that have been checked against every constraint as a single array
+    ## Unchecked chunks are left as they are, so their lazy rows are never decoded and the rest of a stream is never read here
+    ## Until the filter is complete this is only part of the possible answers, size() bounds how many there are
+    def candidates(self):
+        arrays = list()
+        for chunk in self.chunks:
+            if chunk[1] == len(self.constraints):
+                ## Only a pool that no constraint has been added to yet is checked and still lazy, it is decoded once
+                chunk[0] = _array(chunk[0])
+                arrays.append(chunk[0])
+
+        if len(arrays) == 1:
+            return arrays[0]
+        if len(arrays) == 0:
+            return _empty(self.chunks[0][0])
+
+        return np.concatenate(arrays)
+
+    ## Return the rows of a block that pass constraints[numApplied:]
+    ## Rows that fail a constraint are dropped before the next one is checked
+    def _check(self, rows, numApplied):
+        for guess, weaponsCorrect, positionsCorrect, prepared in self.constraints[numApplied:]:
+            if len(rows) == 0:
+                break
+
+            if self.withPositions:
+                inGuess, guessCodes = prepared
+                keep = inGuess[rows].sum(axis=1) == weaponsCorrect
+                keep &= (rows == guessCodes).sum(axis=1) == positionsCorrect
+            else:
+                keep = count_correct_weapons_packed(rows, prepared) == weaponsCorrect
+
+            rows = rows[keep]
+
+        return rows
+
+    ## Check candidates against the constraints they have not seen yet until they are all checked or the deadline passes
+    ## At least one block is always checked so the filter makes progress even if the deadline has already passed
+    ## Return True if the filter is complete
+    def run(self, deadline):
+        numConstraints = len(self.constraints)
+        chunks = list()
+        checkedBlock = False
+
+        for index, (rows, numApplied) in enumerate(self.chunks):
+            if numApplied == numConstraints or len(rows) == 0:
+                chunks.append([rows, numConstraints])
+                continue
+
+            if isinstance(rows, StreamedPool):
+                while len(rows):
+                    if checkedBlock and time.time() > deadline:
+                        ## Checkpoint: the stream keeps its place
+                        chunks.append([rows, numApplied])
+                        chunks.extend(self.chunks[index + 1:])
+                        self.chunks = CandidateFilter._merge(chunks)
+                        return False
+
+                    chunks.append([self._check(rows.next_block(), numApplied), numConstraints])
+                    checkedBlock = True
+                continue
+
+            for start in range(0, len(rows), filterBlockSize):
+                if checkedBlock and time.time() > deadline:
+                    ## Checkpoint: keep the unchecked rows and every later chunk as they are
+                    chunks.append([rows[start:], numApplied])
+                    chunks.extend(self.chunks[index + 1:])
+                    self.chunks = CandidateFilter._merge(chunks)
+                    return False
+
+                chunks.append([self._check(_array(rows[start:start + filterBlockSize]), numApplied), numConstraints])
+                checkedBlock = True
+
+        self.chunks = CandidateFilter._merge(chunks)
+        return True
+
+    ## Concatenate neighboring array chunks that have been checked against the same constraints
+    @staticmethod
+    def _merge(chunks):
+        groups = list()
+        for rows, numApplied in chunks:
+            if groups and groups[-1][1] == numApplied and isinstance(rows, np.ndarray) and isinstance(groups[-1][0][-1], np.ndarray):
+                groups[-1][0].append(rows)
+            else:
+                groups.append([[rows], numApplied])
+
+        return [[rowList[0] if len(rowList) == 1 else np.concatenate(rowList), numApplied] for rowList, numApplied in groups]
+
+## Lazy pool of the rows of an iterator of arrays, such as Util.generate_combinations_from_set()
+## Rows are read one array at a time, in order, so the pool is never held whole
+class StreamedPool:
+    ## numRows is the number of rows the iterator yields, emptyRows is an array with no rows of the same width and dtype
+    def __init__(self, blocks, numRows, emptyRows):
+        self.blocks = iter(blocks)
+        self.numRows = numRows
+        self.emptyRows = emptyRows
+
+    ## Number of rows not read yet
+    def __len__(self):
+        return self.numRows
+
+    ## Return the next array of rows
+    def next_block(self):
+        block = next(self.blocks)
+        self.numRows -= len(block)
+        return block
+
+    ## Copies of a Gladiator (see mastermindClient.fork()) cannot copy a generator, so the rest of the stream is read into a list of arrays
+    ## that this pool and its copy both read from in order, the arrays are never written to so they are shared
+    def __deepcopy__(self, memo):
+        blocks = list(self.blocks)
+        self.blocks = iter(blocks)
+
+        copied = StreamedPool(blocks, self.numRows, self.emptyRows)
+        memo[id(self)] = copied
+        return copied
+
+    ## Return every row not read yet as one array
+    def codes(self):
+        blocks = [self.emptyRows] + list(self.blocks)
+        self.numRows = 0
+        return np.concatenate(blocks)
+
+## Return the rows of a chunk as an array, decoding them if the chunk is lazy
+def _array(rows):
+    if isinstance(rows, np.ndarray):
+        return rows
+
+    return rows.codes()
+
+## Return an array with no rows of the same width and dtype as the rows of a chunk
+def _empty(rows):
+    if isinstance(rows, StreamedPool):
+        return rows.emptyRows
+
+    return _array(rows[:0])
@@ -0,0 +1,106 @@
+import sys
+import candidateFilter
+from random import sample
+from Util import *
+from candidateFilter import CandidateFilter, StreamedPool
+from permutationSpace import PermutationSpace
+
+## Test CandidateFilter for a range of (n, c) with random answers
+## Verify that a filter that is interrupted after every block ends with the same candidates as filtering one guess at a time
+## Verify that the answer always survives and that a lazy PermutationSpace or StreamedPool filters to the same candidates as the full array
+def test_candidate_filter(numGuesses=4):
+    blockSize = candidateFilter.filterBlockSize
+    candidateFilter.filterBlockSize = 7
+
+    for n in range(3, 9):
+        print("starting n = " + str(n))
+        for c in range(1, min(n, 5)):
+            answer = sample(range(n), c)
+            masks = generate_combinations(n, c)
+            permutations = permute_combinations(unpack_combinations(masks, c))
+
+            guesses = [sample(range(n), c) for _ in range(numGuesses)]
+            results = list()
+
+            blocks = generate_combinations_from_set(set(), set(range(n)), c, 7)
+            stream = StreamedPool((pack_combinations(codes, n) for codes in blocks), len(masks), empty_combinations(n))
+
+            for pool, withPositions, expected in [(masks, False, masks), (permutations, True, permutations), (PermutationSpace(masks, c), True, PermutationSpace(masks, c)), (stream, False, masks)]:
+                interrupted = CandidateFilter(pool, n, withPositions)
+
+                for guess in guesses:
+                    weaponsCorrect = count_correct_weapons(answer, guess)
+                    positionsCorrect = count_correct_positions(answer, guess)
+
+                    oneShot = CandidateFilter(expected, n, withPositions)
+                    oneShot.add_constraint(guess, weaponsCorrect, positionsCorrect)
+                    oneShot.run(float('inf'))
+                    expected = oneShot.candidates()
+
+                    ## A deadline in the past checks one block per run()
+                    interrupted.add_constraint(guess, weaponsCorrect, positionsCorrect)
+                    interrupted.run(0)
+
+                while not interrupted.run(0):
+                    pass
+
+                if not interrupted.is_complete() or not np.array_equal(interrupted.candidates(), expected):
+                    print("CandidateFilter failed " + str(n) + ' ' + str(c))
+                    sys.exit()
+
+                results.append(expected)
+                if withPositions:
+                    found = (expected == np.array(answer, dtype=np.uint8)).all(axis=1).any()
+                else:
+                    found = (expected == pack_combination(answer, n)).all(axis=1).any()
+                if not found:
+                    print("CandidateFilter removed the answer " + str(n) + ' ' + str(c))
+                    sys.exit()
+
+            if not np.array_equal(results[1], results[2]):
+                print("CandidateFilter over PermutationSpace failed " + str(n) + ' ' + str(c))
+                sys.exit()
+            if not np.array_equal(results[0], results[3]):
+                print("CandidateFilter over StreamedPool failed " + str(n) + ' ' + str(c))
+                sys.exit()
+
+    candidateFilter.filterBlockSize = blockSize
+
+    print("test_candidate_filter() passed")
+
+## Verify that candidates() of an unfinished filter only returns checked rows, without decoding lazy chunks or reading the rest of a stream
+def test_unfinished_candidates():
+    blockSize = candidateFilter.filterBlockSize
+    candidateFilter.filterBlockSize = 7
+
+    n, c = 8, 3
+    answer = sample(range(n), c)
+    guess = sample(range(n), c)
+    masks = generate_combinations(n, c)
+    blocks = generate_combinations_from_set(set(), set(range(n)), c, 7)
+    stream = StreamedPool((pack_combinations(codes, n) for codes in blocks), len(masks), empty_combinations(n))
+
+    for pool, withPositions in [(PermutationSpace(masks, c), True), (stream, False)]:
+        unfinished = CandidateFilter(pool, n, withPositions)
+        unfinished.add_constraint(guess, count_correct_weapons(answer, guess), count_correct_positions(answer, guess))
+
+        if unfinished.run(0):
+            print("CandidateFilter finished in one block")
+            sys.exit()
+
+        size = unfinished.size()
+        checked = unfinished.candidates()
+        if len(checked) > 7 or unfinished.size() != size or not isinstance(unfinished.chunks[-1][0], type(pool)):
+            print("candidates() materialized unchecked rows")
+            sys.exit()
+
+        while not unfinished.run(0):
+            pass
+
+        if len(unfinished.candidates()) != unfinished.size() or len(unfinished.candidates()) < len(checked):
+            print("candidates() of a finished filter is not every candidate")
+            sys.exit()
+
+    candidateFilter.filterBlockSize = blockSize
+
+    print("test_unfinished_candidates() passed")
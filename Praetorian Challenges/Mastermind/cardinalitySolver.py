@@ -0,0 +1,240 @@
+import time
+import numpy as np
+from random import randrange, sample
+from Util import count_bits, mask_to_combination, calculate_number_combinations, generate_combinations, unpack_combinations
+
+## Exact solver for the weapons of a level
+##
+## Every weapon is a boolean variable (correct or not) and every guess is a cardinality constraint: the number of correct weapons in the guess is its response
+## The number of correct weapons in the whole level is one more constraint
+##
+## Weapons that belong to exactly the same constraints are interchangeable, so they are grouped into regions and the search branches
+## on the number of correct weapons in a region instead of on single weapons (a region of s weapons with j correct stands for C(s, j) assignments)
+## Regions are decided in a fixed order, DPLL style: the bounds of every constraint propagate to the range of counts left for the next region
+## and branches that break a bound are pruned. Subproblems are memoized by the residual count of every constraint, so every search node is a layer of a DP
+##
+## A forward pass counts the ways to reach every node and a backward pass the ways to finish from it. Together they give the exact number of
+## possible combinations, the number of them in which each weapon is correct (forced weapons are correct in all or none of them),
+## uniform random combinations and the list of every combination
+
+## Max number of search nodes kept before giving up on an exact count
+maxCountingStates = 500000
+
+## Number of search nodes between deadline checks
+deadlineCheckInterval = 1024
+
+## Return the number of ways to choose j of size weapons
+## Unlike calculate_number_combinations(), choosing no weapons is one way
+def number_of_ways(size, j):
+    if j == 0:
+        return 1
+
+    return calculate_number_combinations(size, j)
+
+class CardinalitySolver:
+    ## correctWeapons:   bitmask of weapons known to be correct
+    ## unknownWeapons:   bitmask of undetermined weapons
+    ## constraints:      list of (weaponSet, numCorrect) where weaponSet only holds unknown weapons and numCorrect only counts unknown weapons
+    ## numOpponents:     number of correct weapons in a combination
+    def __init__(self, correctWeapons, unknownWeapons, constraints, numOpponents):
+        self.correctWeapons = correctWeapons
+        self.unknownWeapons = unknownWeapons
+
+        ## The last constraint is the number of correct weapons left among the unknown weapons
+        self.constraints = [(weaponSet, numCorrect) for weaponSet, numCorrect in constraints if weaponSet or numCorrect]
+        self.constraints.append((unknownWeapons, numOpponents - count_bits(correctWeapons)))
+
+        self.regions = self._regions()
+
+        ## remaining[layer][i] is the number of weapons of constraint i in the regions from layer on
+        self.remaining = [None] * (len(self.regions) + 1)
+        self.remaining[-1] = (0,) * len(self.constraints)
+        for layer in range(len(self.regions) - 1, -1, -1):
+            regionMask, size, members = self.regions[layer]
+            self.remaining[layer] = tuple(count + size if i in members else count for i, count in enumerate(self.remaining[layer + 1]))
+
+        ## Filled by solve()
+        self.numModels = None
+        self.weaponCounts = None
+        self.forcedCorrect = 0
+        self.forcedIncorrect = 0
+        self.forward = None
+        self.backward = None
+
+    ## Group the unknown weapons by the constraints they belong to
+    ## Regions are ordered so constraints close early: the constraint with the fewest undecided regions goes next
+    ## Return a list of (regionMask, size, set of constraint indices)
+    def _regions(self):
+        groups = dict()
+        weapons = self.unknownWeapons
+        while weapons:
+            lowest = weapons & -weapons
+            weapons ^= lowest
+            key = tuple(i for i, (weaponSet, _) in enumerate(self.constraints) if weaponSet & lowest)
+            groups[key] = groups.get(key, 0) | lowest
+
+        undecided = dict(groups)
+        regions = list()
+        while undecided:
+            constraintRegions = [[key for key in undecided if i in key] for i in range(len(self.constraints))]
+            nextRegions = min((keys for keys in constraintRegions if keys), key=len)
+            for key in sorted(nextRegions, key=lambda key: -count_bits(undecided[key])):
+                regions.append((undecided[key], count_bits(undecided[key]), set(key)))
+                del undecided[key]
+
+        return regions
+
+    ## Return the range of the number of correct weapons in region 'layer' that keeps every constraint satisfiable from residuals
+    def _count_range(self, layer, residuals):
+        _, size, members = self.regions[layer]
+        remaining = self.remaining[layer]
+
+        low, high = 0, size
+        for i in members:
+            low = max(low, residuals[i] - (remaining[i] - size))
+            high = min(high, residuals[i])
+
+        return low, high
+
+    ## Return the residuals after j weapons of region 'layer' are correct
+    def _next(self, layer, residuals, j):
+        members = self.regions[layer][2]
+        return tuple(count - j if i in members else count for i, count in enumerate(residuals))
+
+    ## Count every combination that satisfies every constraint
+    ## Return True if the count finished before the deadline with at most maxStates search nodes, False otherwise
+    def solve(self, deadline=float('inf'), maxStates=maxCountingStates):
+        start = tuple(numCorrect for _, numCorrect in self.constraints)
+        if any(count < 0 or count > remaining for count, remaining in zip(start, self.remaining[0])):
+            self.forward = [dict() for _ in range(len(self.regions) + 1)]
+        else:
+            self.forward = [{start: 1}]
+            numStates = 1
+            for layer in range(len(self.regions)):
+                size = self.regions[layer][1]
+                layerStates = dict()
+                for residuals, ways in self.forward[layer].items():
+                    low, high = self._count_range(layer, residuals)
+                    for j in range(low, high + 1):
+                        nextResiduals = self._next(layer, residuals, j)
+                        layerStates[nextResiduals] = layerStates.get(nextResiduals, 0) + ways * number_of_ways(size, j)
+
+                        numStates += 1
+                        if numStates > maxStates or (numStates % deadlineCheckInterval == 0 and time.time() > deadline):
+                            self.forward = None
+                            return False
+
+                self.forward.append(layerStates)
+
+        ## Every residual is 0 after the last region
+        self.backward = [None] * (len(self.regions) + 1)
+        self.backward[-1] = {residuals: 1 for residuals in self.forward[-1]}
+        for layer in range(len(self.regions) - 1, -1, -1):
+            size = self.regions[layer][1]
+            following = self.backward[layer + 1]
+            layerStates = dict()
+            for residuals in self.forward[layer]:
+                low, high = self._count_range(layer, residuals)
+                total = sum(number_of_ways(size, j) * following.get(self._next(layer, residuals, j), 0) for j in range(low, high + 1))
+                if total:
+                    layerStates[residuals] = total
+            self.backward[layer] = layerStates
+
+        self.numModels = sum(self.backward[0].values())
+
+        ## Number of combinations in which one weapon of a region is correct: j of its size weapons are correct in C(size - 1, j - 1) of the C(size, j) ways
+        self.weaponCounts = dict()
+        for layer, (regionMask, size, members) in enumerate(self.regions):
+            count = 0
+            following = self.backward[layer + 1]
+            for residuals, ways in self.forward[layer].items():
+                if residuals not in self.backward[layer]:
+                    continue
+                low, high = self._count_range(layer, residuals)
+                for j in range(max(1, low), high + 1):
+                    count += ways * number_of_ways(size - 1, j - 1) * following.get(self._next(layer, residuals, j), 0)
+
+            for weapon in mask_to_combination(regionMask):
+                self.weaponCounts[weapon] = count
+
+            if self.numModels and count == self.numModels:
+                self.forcedCorrect |= regionMask
+            elif self.numModels and count == 0:
+                self.forcedIncorrect |= regionMask
+
+        return True
+
+    ## Return the (layer, j) choices of a uniformly random combination, choosing the count of every region in proportion to the combinations that follow it
+    def _random_counts(self):
+        residuals = tuple(numCorrect for _, numCorrect in self.constraints)
+        counts = list()
+        for layer in range(len(self.regions)):
+            size = self.regions[layer][1]
+            following = self.backward[layer + 1]
+            low, high = self._count_range(layer, residuals)
+            weights = [(j, number_of_ways(size, j) * following.get(self._next(layer, residuals, j), 0)) for j in range(low, high + 1)]
+
+            target = randrange(sum(weight for _, weight in weights))
+            for j, weight in weights:
+                if target < weight:
+                    break
+                target -= weight
+
+            counts.append(j)
+            residuals = self._next(layer, residuals, j)
+
+        return counts
+
+    ## Return numSamples uniformly random possible combinations (with replacement) as sorted tuples of weapons
+    ## solve() must have returned True
+    def sample(self, numSamples):
+        correctList = mask_to_combination(self.correctWeapons)
+        regionWeapons = [mask_to_combination(regionMask) for regionMask, _, _ in self.regions]
+
+        samples = list()
+        for _ in range(numSamples):
+            combination = list(correctList)
+            for weapons, j in zip(regionWeapons, self._random_counts()):
+                combination.extend(sample(weapons, j))
+            samples.append(tuple(sorted(combination)))
+
+        return samples
+
+    ## Return every possible combination as an (N, c) uint8 array of sorted weapons
+    ## Every sequence of region counts is expanded at once as the cartesian product of the combinations of every region
+    ## solve() must have returned True
+    def models(self):
+        correctList = mask_to_combination(self.correctWeapons)
+        regionWeapons = [np.array(mask_to_combination(regionMask), dtype=np.uint8) for regionMask, _, _ in self.regions]
+        blocks = list()
+
+        def expand(layer, residuals, block):
+            if layer == len(self.regions):
+                blocks.append(block)
+                return
+
+            size = self.regions[layer][1]
+            following = self.backward[layer + 1]
+            low, high = self._count_range(layer, residuals)
+            for j in range(low, high + 1):
+                nextResiduals = self._next(layer, residuals, j)
+                if not following.get(nextResiduals):
+                    continue
+
+                if j == 0:
+                    expand(layer + 1, nextResiduals, block)
+                    continue
+
+                choices = regionWeapons[layer][unpack_combinations(generate_combinations(size, j), j)]
+                expanded = np.hstack((np.repeat(block, len(choices), axis=0), np.tile(choices, (len(block), 1))))
+                expand(layer + 1, nextResiduals, expanded)
+
+        start = tuple(numCorrect for _, numCorrect in self.constraints)
+        if self.numModels:
+            expand(0, start, np.array([correctList], dtype=np.uint8).reshape(1, len(correctList)))
+
+        c = self.constraints[-1][1] + len(correctList)
+        if not blocks:
+            return np.zeros((0, c), dtype=np.uint8)
+
+        return np.sort(np.vstack(blocks), axis=1)
@@ -0,0 +1,81 @@
+import sys
+import itertools
+from random import sample, randint
+from Util import *
+from cardinalitySolver import CardinalitySolver
+from weaponDeduction import weaponDeduction
+
+debugger_cardinalitySolver = None
+
+## Count the combinations of random guesses with CardinalitySolver and by brute force, with some weapons already determined
+## Verify the number of combinations, the count of every weapon, the forced weapons, the listed combinations and that samples are possible combinations
+def test_cardinality_solver(numTests=300):
+    global debugger_cardinalitySolver
+
+    for _ in range(numTests):
+        numWeapons = randint(2, 12)
+        numOpponents = randint(1, numWeapons)
+        answer = sample(range(numWeapons), numOpponents)
+        guesses = [sample(range(numWeapons), numOpponents) for _ in range(randint(0, 5))]
+
+        known = sample(range(numWeapons), randint(0, numWeapons // 2))
+        correctWeapons = combination_to_mask([weapon for weapon in known if weapon in answer])
+        incorrectWeapons = combination_to_mask([weapon for weapon in known if weapon not in answer])
+        unknownWeapons = ((1 << numWeapons) - 1) & ~correctWeapons & ~incorrectWeapons
+
+        constraints = [(combination_to_mask(guess) & unknownWeapons, count_correct_weapons(answer, guess) - count_bits(combination_to_mask(guess) & correctWeapons)) for guess in guesses]
+        solver = CardinalitySolver(correctWeapons, unknownWeapons, constraints, numOpponents)
+        debugger_cardinalitySolver = solver
+
+        possible = [combination for combination in itertools.combinations(range(numWeapons), numOpponents)
+                    if combination_to_mask(combination) & (correctWeapons | incorrectWeapons) == correctWeapons
+                    and all(count_correct_weapons(combination, guess) == count_correct_weapons(answer, guess) for guess in guesses)]
+
+        if not solver.solve() or solver.numModels != len(possible):
+            print("solve() failed " + str(guesses) + ' ' + str(answer))
+            sys.exit()
+
+        for weapon in mask_to_combination(unknownWeapons):
+            count = sum(1 for combination in possible if weapon in combination)
+            forced = solver.forcedCorrect >> weapon & 1 or solver.forcedIncorrect >> weapon & 1
+            if solver.weaponCounts[weapon] != count or forced != (count in (0, len(possible))):
+                print("weaponCounts failed " + str(weapon) + ' ' + str(guesses) + ' ' + str(answer))
+                sys.exit()
+
+        if sorted(map(tuple, solver.models().tolist())) != possible:
+            print("models() failed " + str(guesses) + ' ' + str(answer))
+            sys.exit()
+        if any(combination not in possible for combination in solver.sample(20)):
+            print("sample() failed " + str(guesses) + ' ' + str(answer))
+            sys.exit()
+
+    print("test_cardinality_solver() passed")
+
+## Verify that weaponDeduction.count_models() determines every forced weapon and gives up when the search is too large
+def test_count_models(numWeapons=30, numOpponents=8, numGuesses=6):
+    answer = sample(range(numWeapons), numOpponents)
+    weaponSolver = weaponDeduction(numWeapons, numOpponents)
+    for _ in range(numGuesses):
+        guess = sample(range(numWeapons), numOpponents)
+        weaponSolver.learn(guess, count_correct_weapons(answer, guess))
+
+    numModels = weaponSolver.count_models()
+    solver = weaponSolver.modelSolver
+    if numModels is None or numModels != solver.numModels or solver.forcedCorrect & ~weaponSolver.correctWeapons or solver.forcedIncorrect & weaponSolver.unknownWeapons:
+        print("count_models() failed " + str(answer))
+        sys.exit()
+    if combination_to_mask(answer) & ~(weaponSolver.correctWeapons | weaponSolver.unknownWeapons):
+        print("count_models() removed a correct weapon " + str(answer))
+        sys.exit()
+    if weaponSolver.learn(answer, numOpponents) is not True:
+        print("count_models() broke learn() " + str(answer))
+        sys.exit()
+
+    weaponSolver.reset()
+    guess = sample(range(numWeapons), numOpponents)
+    weaponSolver.learn(guess, count_correct_weapons(answer, guess))
+    if weaponSolver.count_models(maxStates=1) is not None or weaponSolver.modelSolver is not None:
+        print("count_models() ignored maxStates")
+        sys.exit()
+
+    print("test_count_models() passed")
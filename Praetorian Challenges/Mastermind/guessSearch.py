@@ -0,0 +1,255 @@
+import sys
+import time
+import numpy as np
+import multiprocessing
+from random import sample, seed
+from Util import *
+from partitionMemo import pool_fingerprint, minMemoCandidates
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    ## multiprocessing.shared_memory requires Python 3.8, ScoringPool is unavailable without it
+    shared_memory = None
+
+## Extra time to wait for workers to return their best guess after the deadline
+mergeTimeout = 0.25
+
+## Seconds between checks of the stop function while the parent waits for workers
+stopInterval = 0.01
+
+## Search kinds
+## 'range':   Score guessPool[start:end] in order (arguments = (start, end))
+## 'rows':    Score random rows of guessPool until the deadline, or the whole pool once if it fits in one block (arguments = None)
+## 'weapons': Score random guesses made of sampleSize weapons from guessPool plus fixedWeapons until the deadline,
+##            or every such guess once if they fit in one block (arguments = (sampleSize, fixedWeapons))
+##
+## guessPool rows can be weapon codes (uint8) or combination bitmasks (uint64), candidates are always weapon codes
+
+## Return the next block of guesses as weapon codes, or None if there is nothing left to score
+def _next_block(kind, guessPool, c, chunkSize, arguments, state):
+    if kind == 'range':
+        start, end = state['start'], arguments[1]
+        if start >= end:
+            return None
+        block = guessPool[start:min(end, start + chunkSize)]
+        state['start'] += chunkSize
+    elif kind == 'rows':
+        if state['done']:
+            return None
+        if len(guessPool) <= chunkSize:
+            block = guessPool
+            state['done'] = True
+        else:
+            block = guessPool[sample(range(len(guessPool)), chunkSize)]
+    else:
+        if state['done']:
+            return None
+        sampleSize, fixedWeapons = arguments
+        if calculate_number_combinations(len(guessPool), sampleSize) <= chunkSize:
+            ## sample_combinations() returns every combination
+            state['done'] = True
+        fixed = np.tile(np.array(fixedWeapons, dtype=np.uint8), (chunkSize, 1))
+        chosen = guessPool[sample_combinations(len(guessPool), sampleSize, chunkSize)]
+        block = np.hstack((chosen, fixed[:len(chosen)]))
+
+    if block.dtype == np.uint64:
+        block = unpack_combinations(block, c)
+
+    return block
+
+## Run a variation of Kunth's Mastermind Algorithm: score blocks of guesses against every candidate until the guesses or the time run out
+## scorer is a name in Util.scorers or a scorer function, Kunth's algorithm is 'minimax'
+## Histograms are looked up in (and added to) memo, a PartitionMemo, if there is one and the pool has at least minMemoCandidates candidates
+## stop is a function checked before every block, the search ends early once it returns True (see TurnScheduler.cancelled())
+## If untilStale is set a random search ('rows' or 'weapons') also ends at the first block that does not improve the best score
+## Return (bestScore, bestGuess, numScored), bestGuess is None if no guess was scored before the deadline
+def search_guesses(kind, guessPool, candidates, n, withPositions, deadline, arguments=None, scorer='minimax', memo=None, stop=None, untilStale=False):
+    bestGuess = None
+    bestScore = float('inf')
+    numScored = 0
+
+    c = candidates.shape[1]
+    membership = encode_membership(candidates, n)
+    chunkSize = scoring_chunk_size(len(candidates))
+    state = {'start': arguments[0] if kind == 'range' else 0, 'done': False}
+
+    if len(candidates) < minMemoCandidates:
+        memo = None
+    if memo is not None:
+        fingerprint = pool_fingerprint(candidates, withPositions)
+
+    while time.time() < deadline and (stop is None or not stop()):
+        guesses = _next_block(kind, guessPool, c, chunkSize, arguments, state)
+        if guesses is None or len(guesses) == 0:
+            break
+
+        if memo is not None:
+            scores = memo.guess_scores(fingerprint, guesses, candidates, encode_membership(guesses, n), membership, withPositions, scorer)
+        else:
+            scores = guess_scores(guesses, candidates, encode_membership(guesses, n), membership, withPositions, scorer)
+        numScored += len(guesses)
+
+        index = int(np.argmin(scores))
+        if scores[index] < bestScore:
+            bestGuess = guesses[index].tolist()
+            bestScore = scores[index].item()
+        elif untilStale and kind != 'range':
+            break
+
+    return bestScore, bestGuess, numScored
+
+## ----------------------------------------------------------------------------------------------
+## Parallel search
+##
+## The guess pool and the candidates are copied once into multiprocessing.shared_memory blocks
+## Every worker attaches to the blocks without copying and runs search_guesses() over its own shard until the deadline
+## The best guess of every worker that answers in time is merged by the parent
+## Once the parent stops waiting it cancels the search, so a worker never runs more than one block past it and the next search does not queue behind it
+
+## Return True if this version of Python supports ScoringPool
+def parallel_supported():
+    return shared_memory is not None
+
+## Numpy array backed by a shared memory block
+class SharedArray:
+    def __init__(self, array):
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.array[...] = array
+
+    ## Picklable description used by workers to attach to the block
+    def descriptor(self):
+        return (self.shm.name, self.shape, self.dtype)
+
+    ## Free the shared memory block. Workers that are still attached keep their mapping until they detach
+    def release(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+## Attach to an existing shared memory block without registering it with the resource tracker
+## The parent owns and unlinks every block, a worker registration would make the tracker unlink it a second time when the worker exits
+def _attach(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+## Shared counter of the last search cancelled by the parent, set in every worker by _init_worker()
+_cancelledSearch = None
+
+## Initializer of every worker process
+def _init_worker(cancelledSearch):
+    global _cancelledSearch
+    _cancelledSearch = cancelledSearch
+
+    ## Reseed every worker, otherwise forked workers would all sample the same random guesses
+    seed()
+
+## Worker side of ScoringPool.best_guess()
+## The search stops before its next block once the parent has cancelled searchId
+## Return the result of search_guesses() over one shard
+def _search_shard(task):
+    searchId, kind, guessDescriptor, candidateDescriptor, n, withPositions, deadline, arguments, scorer, untilStale = task
+
+    guessShm = _attach(guessDescriptor[0])
+    candidateShm = _attach(candidateDescriptor[0])
+    guessPool = np.ndarray(guessDescriptor[1], dtype=guessDescriptor[2], buffer=guessShm.buf)
+    candidates = np.ndarray(candidateDescriptor[1], dtype=candidateDescriptor[2], buffer=candidateShm.buf)
+
+    result = search_guesses(kind, guessPool, candidates, n, withPositions, deadline, arguments, scorer, stop=lambda: _cancelledSearch.value >= searchId, untilStale=untilStale)
+
+    ## Views must be dropped before the blocks can be closed
+    del guessPool, candidates
+    guessShm.close()
+    candidateShm.close()
+
+    return result
+
+## Pool of worker processes that shards search_guesses() across cores
+class ScoringPool:
+    def __init__(self, numWorkers):
+        self.numWorkers = numWorkers
+
+        ## Searches are numbered, every worker stops a search once cancelledSearch reaches its number
+        self.numSearches = 0
+        self.cancelledSearch = multiprocessing.Value('q', 0)
+
+        self.pool = multiprocessing.Pool(numWorkers, initializer=_init_worker, initargs=(self.cancelledSearch,))
+
+    ## Same as search_guesses() but every worker searches its own shard of the guess space
+    ## 'range' searches are split into contiguous shards, random searches run independently on every worker
+    ## A 'rows' pool that fits in one block is scored once in order, so it is split into shards like a 'range' search
+    ## The search is cancelled in every worker when this returns, at deadline + mergeTimeout or as soon as stop() returns True
+    def best_guess(self, kind, guessPool, candidates, n, withPositions, deadline, arguments=None, scorer='minimax', stop=None, untilStale=False):
+        self.numSearches += 1
+        searchId = self.numSearches
+
+        sharedGuesses = SharedArray(guessPool)
+        sharedCandidates = SharedArray(candidates)
+
+        if kind == 'rows' and len(guessPool) <= scoring_chunk_size(len(candidates)):
+            kind, arguments = 'range', (0, len(guessPool))
+
+        if kind == 'range':
+            start, end = arguments
+            step = -(-(end - start) // self.numWorkers)
+            shards = [(shardStart, min(end, shardStart + step)) for shardStart in range(start, end, max(1, step))]
+        else:
+            shards = [arguments] * self.numWorkers
+
+        results = list()
+        for shard in shards:
+            task = (searchId, kind, sharedGuesses.descriptor(), sharedCandidates.descriptor(), n, withPositions, deadline, shard, scorer, untilStale)
+            results.append(self.pool.apply_async(_search_shard, (task,)))
+
+        ## Merge in shard order so ties resolve the same way as a serial 'range' search
+        bestGuess = None
+        bestScore = float('inf')
+        numScored = 0
+        for result in results:
+            while not result.ready() and time.time() < deadline + mergeTimeout and (stop is None or not stop()):
+                result.wait(min(stopInterval, max(0, deadline + mergeTimeout - time.time())))
+            if not result.ready():
+                continue
+
+            shardScore, shardGuess, shardScored = result.get()
+
+            numScored += shardScored
+            if shardGuess is not None and shardScore < bestScore:
+                bestGuess = shardGuess
+                bestScore = shardScore
+
+        ## Workers still searching stop before their next block instead of running into the next search
+        self.cancelledSearch.value = searchId
+
+        sharedGuesses.release()
+        sharedCandidates.release()
+
+        return bestScore, bestGuess, numScored
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+## ScoringPool shared by every Gladiator in this process, created on first use
+_scoringPool = None
+
+## Return the process-wide ScoringPool with numWorkers workers
+def get_scoring_pool(numWorkers):
+    global _scoringPool
+
+    if _scoringPool is None or _scoringPool.numWorkers != numWorkers:
+        if _scoringPool is not None:
+            _scoringPool.close()
+        _scoringPool = ScoringPool(numWorkers)
+
+    return _scoringPool
@@ -0,0 +1,90 @@
+import sys
+import time
+from Util import *
+from guessSearch import *
+
+## Test search_guesses() and ScoringPool.best_guess() for a range of (n, c)
+## Verify that a complete 'range' search finds the same minMax as scoring every permutation with worst_case_sizes()
+## Verify that the parallel search merges to the same minMax as the serial search and scores a small 'rows' pool once
+def test_search_guesses(numWorkers=4):
+    scoringPool = None
+    if parallel_supported():
+        scoringPool = ScoringPool(numWorkers)
+
+    for n in range(3, 9):
+        print("starting n = " + str(n))
+        for c in range(2, min(n, 5)):
+            candidates = flatten_permutations(generate_grouped_permutations(generate_combinations(n, c), c), c)
+            membership = encode_membership(candidates, n)
+            expected = int(worst_case_sizes(candidates, candidates, membership, membership).min())
+            deadline = time.time() + 60
+
+            minMax, bestGuess, numScored = search_guesses('range', candidates, candidates, n, True, deadline, (0, len(candidates)))
+            if minMax != expected or numScored != len(candidates):
+                print("search_guesses() failed " + str(n) + ' ' + str(c))
+                sys.exit()
+
+            if scoringPool is not None:
+                minMax, bestGuess, numScored = scoringPool.best_guess('range', candidates, candidates, n, True, deadline, (0, len(candidates)))
+                if minMax != expected or numScored != len(candidates):
+                    print("ScoringPool.best_guess() failed " + str(n) + ' ' + str(c))
+                    sys.exit()
+
+                ## A 'rows' pool that fits in one block is split between the workers instead of being scored by every one of them
+                if len(candidates) <= scoring_chunk_size(len(candidates)):
+                    minMax, bestGuess, numScored = scoringPool.best_guess('rows', candidates, candidates, n, True, deadline)
+                    if minMax != expected or numScored != len(candidates):
+                        print("ScoringPool.best_guess() did not shard 'rows' " + str(n) + ' ' + str(c) + ' ' + str(numScored))
+                        sys.exit()
+
+    if scoringPool is not None:
+        scoringPool.close()
+
+    print("test_search_guesses() passed")
+
+## A 'weapons' search whose every guess fits in one block has to score every guess once and stop, not rescore them until the deadline
+## and a 'weapons' search with untilStale has to stop at its first block without a better guess
+def test_weapons_search(n=10, c=4):
+    candidates = flatten_permutations(generate_grouped_permutations(generate_combinations(n, c), c), c)
+    guessPool = np.arange(6, dtype=np.uint8)
+
+    start = time.time()
+    minMax, bestGuess, numScored = search_guesses('weapons', guessPool, candidates, n, False, start + 10, (2, [6, 7]))
+    if numScored != calculate_number_combinations(6, 2) or time.time() - start > 5:
+        print("search_guesses() did not stop after every 'weapons' guess " + str(numScored))
+        sys.exit()
+
+    ## A random search that is stopped when stale ends long before its deadline
+    candidates = encode_codes([sample(range(40), c) for _ in range(2000)], c)
+    start = time.time()
+    minMax, bestGuess, numScored = search_guesses('weapons', np.arange(40, dtype=np.uint8), candidates, 40, False, start + 10, (c, []), untilStale=True)
+    if bestGuess is None or numScored >= calculate_number_combinations(40, c) or time.time() - start > 5:
+        print("search_guesses() did not stop at a stale block " + str(numScored))
+        sys.exit()
+
+    print("test_weapons_search() passed")
+
+
+## A parallel search that is stopped has to be cancelled in every worker, so the next search does not wait for it
+def test_cancel_search(numWorkers=2, n=12, c=5):
+    if not parallel_supported():
+        return
+
+    scoringPool = ScoringPool(numWorkers)
+    candidates = flatten_permutations(generate_grouped_permutations(generate_combinations(n, c), c), c)
+
+    start = time.time()
+    scoringPool.best_guess('rows', candidates, candidates, n, True, start + 60, stop=lambda: time.time() > start + 0.5)
+    if time.time() - start > 5:
+        print("ScoringPool.best_guess() did not stop")
+        sys.exit()
+
+    start = time.time()
+    minMax, bestGuess, numScored = scoringPool.best_guess('range', candidates, candidates, n, True, start + 60, (0, 1))
+    if numScored != 1 or time.time() - start > 5:
+        print("ScoringPool.best_guess() queued behind a cancelled search")
+        sys.exit()
+
+    scoringPool.close()
+
+    print("test_cancel_search() passed")
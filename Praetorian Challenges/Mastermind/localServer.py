@@ -0,0 +1,160 @@
+import sys
+import json
+import random
+import hashlib
+import threading
+from urllib.parse import parse_qs
+from socketserver import ThreadingMixIn
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from benchmark import SimulatedServer
+
+## Local stand-in for the Mastermind API
+##
+## Serves the same endpoints Mastermind.py uses on top of SimulatedServer so clients can be tested and benchmarked without the real server
+## Every email gets its own Auth-Token and its own progress through the levels
+
+## Levels as (numWeapons, numGladiators, numGuesses, numRounds)
+defaultLevels = [(6, 3, 10, 5), (8, 4, 10, 5), (10, 5, 10, 5), (12, 4, 12, 5), (20, 4, 20, 5)]
+
+## Progress of one account
+class Account:
+    def __init__(self, email):
+        self.email = email
+        self.token = hashlib.sha256(email.encode()).hexdigest()[:32]
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.levelsSolved = 0
+        self.levelNum = None
+        self.level = None
+
+class MastermindHandler(BaseHTTPRequestHandler):
+    ## Keep connections alive between requests like the real server
+    protocol_version = 'HTTP/1.1'
+
+    ## Headers and body are written separately, with Nagle's algorithm the body waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def _send(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _account(self):
+        account = self.server.accounts.get(self.headers.get('Auth-Token'))
+        if account is None:
+            self._send({'error': 'Invalid Auth-Token'}, 401)
+        return account
+
+    ## Return the level number of a /level/{num}/ path, None if the path is something else
+    def _level_num(self):
+        parts = [part for part in self.path.split('/') if part]
+        if len(parts) == 2 and parts[0] == 'level' and parts[1].isdigit():
+            return int(parts[1])
+        return None
+
+    def do_GET(self):
+        account = self._account()
+        if account is None:
+            return
+
+        levelNum = self._level_num()
+        with account.lock:
+            if self.path.rstrip('/') == '/hash':
+                if account.levelsSolved < len(self.server.levels):
+                    self._send({'error': 'Finish every level first'})
+                else:
+                    self._send({'hash': hashlib.sha256(('hash' + account.email).encode()).hexdigest()})
+            elif levelNum is not None:
+                if levelNum < 1 or levelNum > min(account.levelsSolved + 1, len(self.server.levels)):
+                    self._send({'error': 'Level locked'})
+                    return
+
+                numWeapons, numGladiators, numGuesses, numRounds = self.server.levels[levelNum - 1]
+                account.levelNum = levelNum
+                account.level = SimulatedServer(numWeapons, numGladiators, numGuesses, numRounds, random.Random(self.server.rng.random()))
+                self._send(account.level.level())
+            else:
+                self._send({'error': 'Not found'}, 404)
+
+    def do_POST(self):
+        body = self._body()
+
+        if self.path.rstrip('/') == '/api-auth-token':
+            email = parse_qs(body.decode()).get('email', [''])[0]
+            with self.server.lock:
+                account = self.server.accountsByEmail.get(email)
+                if account is None:
+                    account = Account(email)
+                    self.server.accountsByEmail[email] = account
+                    self.server.accounts[account.token] = account
+            self._send({'Auth-Token': account.token})
+            return
+
+        account = self._account()
+        if account is None:
+            return
+
+        levelNum = self._level_num()
+        with account.lock:
+            if self.path.rstrip('/') == '/reset':
+                account.reset()
+                self._send({'message': 'Reset'})
+            elif levelNum is not None:
+                if account.level is None or levelNum != account.levelNum:
+                    self._send({'error': 'Level not started'})
+                    return
+
+                r = account.level.guess(json.loads(body.decode())['guess'])
+                if 'message' in r:
+                    account.levelsSolved = max(account.levelsSolved, levelNum)
+                    account.level = None
+                    if account.levelsSolved == len(self.server.levels):
+                        r = {'hash': hashlib.sha256(('hash' + account.email).encode()).hexdigest()}
+                elif 'error' in r:
+                    account.level = None
+                self._send(r)
+            else:
+                self._send({'error': 'Not found'}, 404)
+
+class MastermindServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, levels=defaultLevels, seed=None, verbose=False):
+        HTTPServer.__init__(self, address, MastermindHandler)
+        self.levels = levels
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.accounts = dict()
+        self.accountsByEmail = dict()
+
+    ## URL clients connect to
+    def url(self):
+        return 'http://{0}:{1}'.format(self.server_address[0], self.server_address[1])
+
+## Start a MastermindServer in a background thread on a free port (port 0) or the given port
+## Return the server, stop it with server.shutdown()
+def start_local_server(levels=defaultLevels, port=0, seed=None, verbose=False):
+    server = MastermindServer(('127.0.0.1', port), levels, seed, verbose)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+## Usage: python localServer.py [port]
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = MastermindServer(('127.0.0.1', port), verbose=True)
+    print("Serving the Mastermind API on " + server.url())
+    server.serve_forever()
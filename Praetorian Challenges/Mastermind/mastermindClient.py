@@ -0,0 +1,351 @@
+import sys
+import copy
+import json
+import time
+import queue
+import asyncio
+import http.client
+import numpy as np
+from random import sample
+from urllib.parse import urlsplit, urlencode
+from concurrent.futures import ThreadPoolExecutor
+from Util import *
+from Gladiator import Gladiator
+
+## Pipelined Mastermind client
+##
+## Requests go through a pool of keep-alive connections so every guess after the first skips the TCP and TLS handshakes
+## While a guess is in flight, copies of the Gladiator are updated with the most likely responses in background threads
+## If the server answers with one of them the next guess is already computed (or partly computed), otherwise the Gladiator is updated as usual
+## Requires Python 3.7+ for asyncio.run() and asyncio.get_running_loop()
+
+## Constants
+defaultUrl = 'https://mastermind.praetorian.com'
+
+## Number of responses to compute the next guess for while a guess is in flight
+numSpeculations = 1
+
+## Only speculate on responses at least this likely, a wrong speculation keeps a thread busy while the real update runs
+minSpeculationProbability = 0.2
+
+## Max number of possible answers sampled to estimate how likely every response is
+maxSpeculationCandidates = 20000
+
+## Errors of sending a request on a kept-alive connection the server already closed, the request never reached the server so it is safe to send it again
+## Errors while reading the response are never retried: the server may already have played the guess
+_unsentRequestErrors = (http.client.CannotSendRequest, BrokenPipeError)
+
+## ----------------------------------------------------------------------------------------------
+## Communication Code
+
+## Thread-safe pool of keep-alive HTTP(S) connections to one server
+class ConnectionPool:
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+
+        ## Idle connections, the most recently used one is reused first
+        self.idle = queue.LifoQueue()
+        self.numConnections = 0
+
+        ## Seconds every request took from sending it to reading the whole response
+        self.latencies = list()
+
+    def _connect(self):
+        self.numConnections += 1
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    ## Send a request and return the decoded JSON response
+    ## A request that could not be sent on a stale connection is sent again once on a new connection
+    def request(self, method, path, body=None, headers=None):
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+
+        start = time.perf_counter()
+        for attempt in range(2):
+            try:
+                connection.request(method, path, body, headers or dict())
+                break
+            except _unsentRequestErrors:
+                connection.close()
+                if attempt == 1:
+                    raise
+                connection = self._connect()
+            except Exception:
+                connection.close()
+                raise
+
+        try:
+            response = connection.getresponse()
+            data = response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        self.latencies.append(time.perf_counter() - start)
+
+        if response.will_close:
+            connection.close()
+        else:
+            self.idle.put(connection)
+
+        return json.loads(data.decode())
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+## asyncio client for the Mastermind API
+## Blocking requests run on a thread pool so the event loop is free while they are in flight
+class AsyncMastermindClient:
+    def __init__(self, email, url=defaultUrl, executor=None):
+        self.email = email
+        self.pool = ConnectionPool(url)
+        self.executor = ThreadPoolExecutor(4) if executor is None else executor
+        self.headers = {'Content-Type': 'application/json'}
+
+    def _request(self, method, path, body=None, headers=None):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, self.pool.request, method, path, body, self.headers if headers is None else headers)
+
+    async def authenticate(self):
+        r = await self._request('POST', '/api-auth-token/', urlencode({'email': self.email}), {'Content-Type': 'application/x-www-form-urlencoded'})
+        self.headers['Auth-Token'] = r['Auth-Token']
+        return r['Auth-Token']
+
+    ## Resets game back to level 1
+    async def reset_levels(self):
+        return await self._request('POST', '/reset/')
+
+    ## Start level 'num'
+    ## Return level parameters
+    async def start_level(self, num):
+        return await self._request('GET', '/level/{0}/'.format(num))
+
+    ## Send a guess
+    ## Return response
+    async def send_guess(self, num, guess):
+        return await self._request('POST', '/level/{0}/'.format(num), json.dumps({'guess': [int(weapon) for weapon in guess]}))
+
+    async def get_hash(self):
+        return await self._request('GET', '/hash/')
+
+    def close(self):
+        self.pool.close()
+
+## ----------------------------------------------------------------------------------------------
+## Speculation
+
+## Return a sample of at most numSamples possible answers of a Gladiator as an (N, c) uint8 array, None if it does not list them
+## Combinations are given a random order so their responses include positions
+def sample_possible_answers(gladiator, numSamples):
+    c = gladiator.numOpponents
+
+    if gladiator.guessState >= 4:
+        permutations = gladiator.possiblePermutations
+        if len(permutations) <= numSamples:
+            return permutations if isinstance(permutations, np.ndarray) else permutations.codes()
+
+        indices = np.sort(np.array(sample(range(len(permutations)), numSamples), dtype=np.int64))
+        return permutations[indices] if isinstance(permutations, np.ndarray) else permutations.decode(permutations.start + indices)
+
+    if gladiator.guessState in (1, 2):
+        combinations = gladiator.possibleCombinations
+        if len(combinations) > numSamples:
+            combinations = combinations[np.sort(sample(range(len(combinations)), numSamples))]
+
+        codes = unpack_combinations(combinations, c)
+        orders = np.argsort(np.random.random(codes.shape), axis=1)
+        return np.take_along_axis(codes, orders, axis=1)
+
+    return None
+
+## Return the responses the server can give to the Gladiator's next guess as a list of ((weaponsCorrect, positionsCorrect), probability), most likely first
+## Probabilities are estimated from a sample of the possible answers, the list is empty if the Gladiator does not list its possible answers
+## The winning response is never included
+def response_distribution(gladiator, numSamples=maxSpeculationCandidates):
+    answers = sample_possible_answers(gladiator, numSamples)
+    if answers is None or len(answers) == 0:
+        return list()
+
+    c = gladiator.numOpponents
+    guess = encode_codes([gladiator.get_next_guess()], c)
+    responses = response_table(guess, answers, encode_membership(guess, gladiator.numWeapons), encode_membership(answers, gladiator.numWeapons))
+    counts = np.bincount(responses[0], minlength=number_of_responses(c))
+
+    distribution = [(divmod(code, c + 1), count / len(answers)) for code, count in enumerate(counts.tolist()) if count]
+    distribution.sort(key=lambda item: -item[1])
+
+    return [(response, probability) for response, probability in distribution if response != (c, c)]
+
+## Return a copy of a Gladiator that shares its worker pool, opening book and partition memo
+## The CardinalitySolver of the weapon solver is shared too, it is never changed after it is solved (learn() replaces it) and its tables are large
+def fork(gladiator):
+    memo = {id(gladiator.scoringPool): gladiator.scoringPool, id(gladiator.openingBook): gladiator.openingBook, id(gladiator.partitionMemo): gladiator.partitionMemo}
+    modelSolver = gladiator.weaponSolver.modelSolver
+    if modelSolver is not None:
+        memo[id(modelSolver)] = modelSolver
+
+    return copy.deepcopy(gladiator, memo)
+
+## Updates copies of a Gladiator with the most likely responses while the real response is in flight
+class Speculator:
+    def __init__(self, numSpeculations=numSpeculations):
+        self.numSpeculations = numSpeculations
+        self.executor = ThreadPoolExecutor(max(1, numSpeculations))
+
+        ## Speculated response -> (updated copy, future of its update)
+        self.pending = dict()
+
+        self.hits = 0
+        self.misses = 0
+
+    ## Start updating copies of gladiator with its most likely responses
+    def start(self, gladiator):
+        self.cancel()
+        if self.numSpeculations == 0:
+            return
+
+        for response, probability in response_distribution(gladiator)[:self.numSpeculations]:
+            if probability < minSpeculationProbability:
+                break
+
+            child = fork(gladiator)
+            self.pending[response] = (child, self.executor.submit(child.update, response[0], response[1]))
+
+    ## Drop every speculation
+    ## An update that already started cannot be cancelled by its future, so its copy's scheduler is cancelled: every later phase gets no time
+    ## and the guess search stops at its next block, instead of holding the GIL and the executor until the guess timeout
+    def cancel(self):
+        for child, future in self.pending.values():
+            future.cancel()
+            child.scheduler.cancel()
+        self.pending = dict()
+
+    ## Return the Gladiator updated with the real response: the speculated copy if there is one, otherwise gladiator itself updated now
+    def resolve(self, gladiator, weaponsCorrect, positionsCorrect):
+        speculation = self.pending.pop((weaponsCorrect, positionsCorrect), None)
+        self.cancel()
+
+        if speculation is not None:
+            self.hits += 1
+            child, future = speculation
+            future.result()
+            return child
+
+        if self.numSpeculations > 0:
+            self.misses += 1
+        gladiator.update(weaponsCorrect, positionsCorrect)
+        return gladiator
+
+    def close(self):
+        self.cancel()
+        self.executor.shutdown(wait=False)
+
+## ----------------------------------------------------------------------------------------------
+## Play the game
+
+## Play level 'levelNum'
+## The next guess is sent as soon as it is known, and speculation starts once the request is in flight
+## Return (last response from the server, stats) where stats has the speculation hits/misses and the time spent between a response and the next guess
+async def play_level(client, levelNum, speculator, verbose=True):
+    loop = asyncio.get_running_loop()
+    stats = {'turns': 0, 'thinkTime': 0.0, 'hits': speculator.hits, 'misses': speculator.misses}
+
+    r = await client.start_level(levelNum)
+    if 'error' in r:
+        return r, stats
+
+    if verbose:
+        print("Starting Level " + str(levelNum))
+        print('Num Weapons: {0}\nNum Gladiators: {1}\nMax Guesses: {2}\nNum Rounds: {3}\n'.format(r['numWeapons'], r['numGladiators'], r['numGuesses'], r['numRounds']))
+
+    numGuesses, numRounds = r['numGuesses'], r['numRounds']
+    gladiator = await loop.run_in_executor(None, Gladiator, r['numWeapons'], r['numGladiators'])
+
+    for i in range(numRounds):
+        if verbose:
+            print('Round: ' + str(i + 1))
+
+        for _ in range(numGuesses):
+            request = asyncio.ensure_future(client.send_guess(levelNum, gladiator.get_next_guess()))
+
+            ## Let the request go out before using this thread for speculation
+            await asyncio.sleep(0)
+            speculator.start(gladiator)
+            r = await request
+
+            if 'response' not in r:
+                speculator.cancel()
+                break
+
+            start = time.time()
+            gladiator = await loop.run_in_executor(None, speculator.resolve, gladiator, r['response'][0], r['response'][1])
+            stats['thinkTime'] += time.time() - start
+            stats['turns'] += 1
+
+        if 'roundsLeft' in r:
+            gladiator.reset()
+        else:
+            break
+
+    stats['hits'] = speculator.hits - stats['hits']
+    stats['misses'] = speculator.misses - stats['misses']
+    return r, stats
+
+## Play every level from level 1 until the server gives a hash
+## Save the hash to '{email}_hash.txt' if saveHash is set
+## Return the hash, None if a level failed
+async def play(email, url=defaultUrl, numSpeculations=numSpeculations, verbose=True, saveHash=True):
+    client = AsyncMastermindClient(email, url)
+    speculator = Speculator(numSpeculations)
+
+    try:
+        authToken = await client.authenticate()
+        await client.reset_levels()
+
+        levelNum = 1
+        while True:
+            r, stats = await play_level(client, levelNum, speculator, verbose)
+
+            if verbose:
+                print("Level {0}: {1} turns, {2:.3f}s thinking, {3} speculation hits, {4} misses".format(levelNum, stats['turns'], stats['thinkTime'], stats['hits'], stats['misses']))
+
+            if 'error' in r:
+                print('Error Message: ' + r['error'])
+                return None
+            if 'hash' in r:
+                break
+
+            levelNum += 1
+
+        r = await client.get_hash()
+        if 'hash' not in r:
+            print('Error Message: ' + r.get('error', str(r)))
+            return None
+
+        if saveHash:
+            print("Saving hash to " + email + "_hash.txt")
+            with open(email + "_hash.txt", "w") as f:
+                f.write("Email: {0}\nAuth-Token: {1}\nHash: {2}".format(email, authToken, r['hash']))
+
+        return r['hash']
+    finally:
+        speculator.close()
+        client.close()
+
+## Usage: python mastermindClient.py email [url]
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python mastermindClient.py email [url]")
+        sys.exit()
+
+    url = sys.argv[2] if len(sys.argv) > 2 else defaultUrl
+    asyncio.run(play(sys.argv[1], url))
@@ -0,0 +1,121 @@
+import sys
+import asyncio
+from Util import *
+from Gladiator import Gladiator
+from localServer import start_local_server
+from mastermindClient import *
+
+## Test play() against a local server for every number of speculations
+## Verify that every level is solved over a single kept-alive connection
+## Verify that response_distribution() sums to the probability of not winning
+def test_client(levels=[(6, 3, 10, 3), (8, 4, 10, 3), (10, 5, 10, 3)]):
+    server = start_local_server(levels, seed=0)
+
+    for speculations in [0, 1, 2]:
+        client = AsyncMastermindClient('test' + str(speculations) + '@email.com', server.url())
+        speculator = Speculator(speculations)
+
+        async def run():
+            await client.authenticate()
+            await client.reset_levels()
+            results = list()
+            for levelNum in range(1, len(levels) + 1):
+                results.append(await play_level(client, levelNum, speculator, verbose=False))
+            return results
+
+        results = asyncio.run(run())
+        if 'hash' not in results[-1][0] or any('error' in r for r, _ in results):
+            print("play_level() failed with " + str(speculations) + " speculations " + str(results))
+            sys.exit()
+        if client.pool.numConnections != 1:
+            print("ConnectionPool opened " + str(client.pool.numConnections) + " connections")
+            sys.exit()
+        if speculations > 0 and speculator.hits == 0:
+            print("Speculator never hit")
+            sys.exit()
+
+        speculator.close()
+        client.close()
+
+    gladiator = Gladiator(8, 4, useOpeningBook=False)
+    gladiator.update(1, 0)
+    distribution = response_distribution(gladiator, 10 ** 6)
+    total = sum(probability for _, probability in distribution)
+    winning = sum(1 for answer in sample_possible_answers(gladiator, 10 ** 6).tolist() if tuple(answer) == gladiator.get_next_guess()) / len(gladiator.possiblePermutations)
+    if abs(total + winning - 1) > 1e-9:
+        print("response_distribution() failed " + str(total))
+        sys.exit()
+
+    server.shutdown()
+    print("test_client() passed")
+
+## Cancelling a Speculator has to cancel the scheduler of every speculated copy, so an update that already started stops early
+def test_cancel_speculation():
+    gladiator = Gladiator(8, 4, useOpeningBook=False)
+    gladiator.update(1, 0)
+
+    speculator = Speculator(2)
+    speculator.start(gladiator)
+    children = [child for child, _ in speculator.pending.values()]
+    speculator.cancel()
+
+    if not children or any(not child.scheduler.cancelled() for child in children) or gladiator.scheduler.cancelled():
+        print("Speculator.cancel() did not cancel the speculated updates")
+        sys.exit()
+
+    speculator.close()
+    print("test_cancel_speculation() passed")
+
+
+## A Gladiator whose combination filter is still reading a stream of combinations has to fork, and the copy has to filter to the same combinations
+def test_fork_streaming():
+    import Gladiator as gladiatorModule
+    from candidateFilter import CandidateFilter, StreamedPool
+
+    settings = (gladiatorModule.approximateCutoffSize, gladiatorModule.optimalCutoffSize, gladiatorModule.autotuneCutoffs, gladiatorModule.exactWeaponSolver, gladiatorModule.filterBlockSize, gladiatorModule.updateTimeout, gladiatorModule.guessTimeout)
+    gladiatorModule.approximateCutoffSize, gladiatorModule.optimalCutoffSize, gladiatorModule.autotuneCutoffs, gladiatorModule.exactWeaponSolver = 600, 10, False, False
+    gladiatorModule.updateTimeout, gladiatorModule.guessTimeout = 0.05, 0.1
+    run = CandidateFilter.run
+    CandidateFilter.run = lambda self, deadline: run(self, 0)
+    gladiatorModule.filterBlockSize = 4
+
+    try:
+        answer = [9, 10, 11, 12]
+        gladiator = Gladiator(16, 4, useOpeningBook=False)
+        while gladiator.guessState == 0:
+            guess = gladiator.get_next_guess()
+            gladiator.update(count_correct_weapons(answer, guess), count_correct_positions(answer, guess))
+
+        if not any(isinstance(rows, StreamedPool) for rows, _ in gladiator.combinationFilter.chunks):
+            print("test_fork_streaming() did not stop the filter mid-stream")
+            sys.exit()
+
+        child = fork(gladiator)
+        CandidateFilter.run = run
+        for copied in (gladiator, child):
+            copied.combinationFilter.run(float('inf'))
+        if not np.array_equal(gladiator.combinationFilter.candidates(), child.combinationFilter.candidates()):
+            print("fork() of a streaming Gladiator filtered to different combinations")
+            sys.exit()
+    finally:
+        CandidateFilter.run = run
+        gladiatorModule.approximateCutoffSize, gladiatorModule.optimalCutoffSize, gladiatorModule.autotuneCutoffs, gladiatorModule.exactWeaponSolver, gladiatorModule.filterBlockSize, gladiatorModule.updateTimeout, gladiatorModule.guessTimeout = settings
+
+    print("test_fork_streaming() passed")
+
+## Copies made by fork() share the CardinalitySolver of the weapon solver instead of copying its tables
+def test_fork_shares_model_solver():
+    gladiator = Gladiator(30, 8, useOpeningBook=False)
+    gladiator.update(2, 0)
+
+    modelSolver = gladiator.weaponSolver.modelSolver
+    if gladiator.guessState != 0 or modelSolver is None:
+        print("test_fork_shares_model_solver() did not count the combinations")
+        sys.exit()
+
+    child = fork(gladiator)
+    if child.weaponSolver.modelSolver is not modelSolver or child.weaponSolver is gladiator.weaponSolver:
+        print("fork() copied the CardinalitySolver")
+        sys.exit()
+
+    print("test_fork_shares_model_solver() passed")
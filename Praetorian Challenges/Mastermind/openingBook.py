@@ -0,0 +1,149 @@
+import os
+import sys
+import copy
+import json
+import time
+import numpy as np
+from Util import *
+
+## Opening book of precomputed guesses
+##
+## Every round of a level starts from the same state, so the guess Gladiator makes after a given sequence of responses
+## only has to be computed once. The book maps (numWeapons, numOpponents, responses so far) to that guess.
+##
+## File format (JSON): {"numWeapons,numOpponents": {"response1,response2,...": [guess]}}
+## Every response is encoded as the single integer weaponsCorrect * (numOpponents + 1) + positionsCorrect
+
+## Default location of the opening book
+openingBookFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'openingBook.json')
+
+class OpeningBook:
+    def __init__(self, path=openingBookFile):
+        self.path = path
+
+        ## self.books[(numWeapons, numOpponents)][responseKey] = guess tuple
+        self.books = dict()
+
+        if os.path.exists(path):
+            self.load()
+
+    ## Return the key of a sequence of (weaponsCorrect, positionsCorrect) responses
+    @staticmethod
+    def _response_key(responses, numOpponents):
+        return ','.join(str(w * (numOpponents + 1) + p) for w, p in responses)
+
+    ## Return the book guess for this history of responses
+    ## Return None if the book does not cover it
+    def lookup(self, numWeapons, numOpponents, responses):
+        book = self.books.get((numWeapons, numOpponents))
+        if book is None:
+            return None
+
+        return book.get(OpeningBook._response_key(responses, numOpponents))
+
+    ## Add a guess for this history of responses
+    def add(self, numWeapons, numOpponents, responses, guess):
+        book = self.books.setdefault((numWeapons, numOpponents), dict())
+        book[OpeningBook._response_key(responses, numOpponents)] = tuple(int(weapon) for weapon in guess)
+
+    ## Return the number of guesses stored for (numWeapons, numOpponents)
+    def size(self, numWeapons, numOpponents):
+        return len(self.books.get((numWeapons, numOpponents), ()))
+
+    def load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+
+        self.books = dict()
+        for parameters, book in data.items():
+            numWeapons, numOpponents = (int(value) for value in parameters.split(','))
+            self.books[(numWeapons, numOpponents)] = {key: tuple(guess) for key, guess in book.items()}
+
+    def save(self):
+        data = dict()
+        for (numWeapons, numOpponents), book in self.books.items():
+            data['{0},{1}'.format(numWeapons, numOpponents)] = {key: list(guess) for key, guess in book.items()}
+
+        with open(self.path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'), sort_keys=True)
+
+## OpeningBook shared by every Gladiator in this process, loaded on first use
+_openingBook = None
+
+## Return the process-wide OpeningBook
+def get_opening_book():
+    global _openingBook
+
+    if _openingBook is None:
+        _openingBook = OpeningBook()
+
+    return _openingBook
+
+## ----------------------------------------------------------------------------------------------
+## Building the book
+
+## Return the list of responses the server could give to the gladiator's next guess
+## Exact when the possible permutations are enumerated, otherwise every response with a possible number of correct weapons
+## The winning response (numOpponents, numOpponents) is never included
+def possible_responses(gladiator):
+    c = gladiator.numOpponents
+    guess = encode_codes([gladiator.get_next_guess()], c)
+
+    if gladiator.guessState >= 4:
+        gladiator.permutationFilter.run(float('inf'))
+        candidates = gladiator.permutationFilter.candidates()
+        codes = np.unique(response_table(guess, candidates, encode_membership(guess, gladiator.numWeapons), encode_membership(candidates, gladiator.numWeapons)))
+        responses = [divmod(int(code), c + 1) for code in codes]
+    else:
+        if gladiator.guessState >= 1:
+            weaponCounts = np.unique(count_correct_weapons_packed(gladiator.possibleCombinations, pack_combination(guess[0], gladiator.numWeapons))).tolist()
+        else:
+            weaponCounts = range(max(0, 2 * c - gladiator.numWeapons), c + 1)
+        responses = [(w, p) for w in weaponCounts for p in range(w + 1)]
+
+    return [response for response in responses if response != (c, c)]
+
+## Add the guess after every response prefix up to depth responses long to the book
+## Every node is computed by replaying the response on a copy of the parent Gladiator, so the book stores exactly what Gladiator would have guessed
+def build_opening_book(numWeapons, numOpponents, depth, book=None, verbose=True):
+    from Gladiator import Gladiator
+
+    if book is None:
+        book = OpeningBook()
+
+    root = Gladiator(numWeapons, numOpponents, useOpeningBook=False)
+
+    ## The worker pool is shared between copies instead of being copied, the partition memo shares itself (see PartitionMemo.__deepcopy__())
+    memo = {id(root.scoringPool): root.scoringPool}
+
+    stack = [(root, ())]
+    while stack:
+        gladiator, responses = stack.pop()
+        if len(responses) == depth:
+            continue
+
+        for response in possible_responses(gladiator):
+            child = copy.deepcopy(gladiator, dict(memo))
+            child.update(response[0], response[1])
+            history = responses + (response,)
+            book.add(numWeapons, numOpponents, history, child.get_next_guess())
+            stack.append((child, history))
+
+            if verbose:
+                print(str(history) + ' -> ' + str(child.get_next_guess()))
+
+    return book
+
+## Usage: python openingBook.py numWeapons numOpponents depth
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print("Usage: python openingBook.py numWeapons numOpponents depth")
+        sys.exit()
+
+    numWeapons, numOpponents, depth = (int(arg) for arg in sys.argv[1:])
+
+    startTime = time.time()
+    book = build_opening_book(numWeapons, numOpponents, depth)
+    book.save()
+
+    print("Saved {0} guesses to {1} in {2:.1f}s".format(book.size(numWeapons, numOpponents), book.path, time.time() - startTime))
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+from Util import *
+from Gladiator import Gladiator
+from openingBook import *
+
+## Test build_opening_book() on a small level
+## Verify that the book survives a save/load round trip
+## Verify that a Gladiator replaying a covered history makes the book guess without searching
+def test_opening_book(numWeapons=6, numOpponents=3, depth=2):
+    path = os.path.join(tempfile.mkdtemp(), 'openingBook.json')
+    book = build_opening_book(numWeapons, numOpponents, depth, OpeningBook(path), verbose=False)
+    book.save()
+
+    loaded = OpeningBook(path)
+    if loaded.books != book.books or loaded.size(numWeapons, numOpponents) == 0:
+        print("OpeningBook save/load failed")
+        sys.exit()
+
+    answer = tuple(range(numWeapons - numOpponents, numWeapons))
+    gladiator = Gladiator(numWeapons, numOpponents, useOpeningBook=False)
+    gladiator.openingBook = loaded
+    responses = list()
+
+    for _ in range(depth):
+        guess = gladiator.get_next_guess()
+        response = (count_correct_weapons(answer, guess), count_correct_positions(answer, guess))
+        if response == (numOpponents, numOpponents):
+            break
+
+        responses.append(response)
+        gladiator.update(response[0], response[1])
+        if gladiator.get_next_guess() != loaded.lookup(numWeapons, numOpponents, responses):
+            print("Gladiator did not use the opening book " + str(responses))
+            sys.exit()
+
+    print("test_opening_book() passed")
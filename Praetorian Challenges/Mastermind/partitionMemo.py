@@ -0,0 +1,116 @@
+import os
+import pickle
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from Util import *
+
+## Memo of partition histograms that outlives a round
+##
+## Every round of a level restarts from the same state, so the pools of possible answers early in a round repeat from round to round
+## and so do the guesses scored against them. The memo maps (pool fingerprint, guess) to the partition histogram of the guess
+## (see Util.partition_sizes()), so a guess scored against the same pool in an earlier round is not scored again
+##
+## Entries are evicted least recently used first once there are maxEntries of them
+## The memo can be saved to a file and loaded by the next run, see save()
+
+## Default max number of histograms kept
+partitionMemoSize = 2 ** 16
+
+## Pools with fewer candidates are scored directly, looking a guess up costs about as much as scoring it against this many candidates
+minMemoCandidates = 256
+
+## Return a fingerprint of a pool of candidates, pools with the same fingerprint give every guess the same partition histogram
+def pool_fingerprint(candidates, withPositions):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str((candidates.shape, candidates.dtype.str, withPositions)).encode())
+    digest.update(np.ascontiguousarray(candidates).tobytes())
+    return digest.digest()
+
+class PartitionMemo:
+    def __init__(self, maxEntries=partitionMemoSize, path=None):
+        self.maxEntries = maxEntries
+        self.path = path
+
+        ## (pool fingerprint, guess bytes) -> histogram as int32 bytes, least recently used first
+        self.entries = OrderedDict()
+
+        ## Speculating copies of a Gladiator share its memo from other threads
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        ## True if there are entries that are not saved to path
+        self.dirty = False
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    ## Copies of a Gladiator share its memo (see mastermindClient.fork() and openingBook.build_opening_book())
+    ## The memo holds a lock, which cannot be copied, so every deepcopy returns the memo itself
+    def __deepcopy__(self, memo):
+        return self
+
+    ## Return the partition histogram of every guess against candidates as a (len(guesses), numResponses) int64 array
+    ## Only guesses that are not in the memo are scored, in one response table
+    def partition_sizes(self, fingerprint, guesses, candidates, guessMembership, candidateMembership, withPositions=True):
+        numResponses = number_of_responses(guesses.shape[1])
+        keys = [(fingerprint, guess.tobytes()) for guess in guesses]
+
+        with self.lock:
+            rows = [self.entries.get(key) for key in keys]
+            for key, row in zip(keys, rows):
+                if row is not None:
+                    self.entries.move_to_end(key)
+
+            missing = [i for i, row in enumerate(rows) if row is None]
+            self.hits += len(rows) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            responses = response_table(guesses[missing], candidates, guessMembership[missing], candidateMembership, withPositions)
+            histogram = partition_sizes(responses, numResponses).astype(np.int32)
+
+            with self.lock:
+                for i, row in zip(missing, histogram):
+                    rows[i] = row.tobytes()
+                    self.entries[keys[i]] = rows[i]
+                while len(self.entries) > self.maxEntries:
+                    self.entries.popitem(last=False)
+                self.dirty = True
+
+        return np.frombuffer(b''.join(rows), dtype=np.int32).reshape(len(guesses), numResponses).astype(np.int64)
+
+    ## Return the score of every guess against candidates like Util.guess_scores(), through the memo
+    def guess_scores(self, fingerprint, guesses, candidates, guessMembership, candidateMembership, withPositions=True, scorer='minimax'):
+        return get_scorer(scorer)(self.partition_sizes(fingerprint, guesses, candidates, guessMembership, candidateMembership, withPositions))
+
+    ## Write the memo to path if it has unsaved entries
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+
+        with self.lock:
+            items = list(self.entries.items())
+            self.dirty = False
+
+        with open(self.path, 'wb') as f:
+            pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    ## Read the memo from path, the most recently used entries are kept if the file has more than maxEntries
+    def load(self):
+        with open(self.path, 'rb') as f:
+            items = pickle.load(f)
+
+        with self.lock:
+            self.entries = OrderedDict(items[-self.maxEntries:] if self.maxEntries else [])
+            self.dirty = False
+
+    ## Return the hit/miss counters as a dict
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
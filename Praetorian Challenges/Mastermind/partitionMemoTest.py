@@ -0,0 +1,53 @@
+import os
+import sys
+import copy
+import tempfile
+import numpy as np
+from random import sample
+from Util import *
+from partitionMemo import PartitionMemo, pool_fingerprint
+
+## Score random guesses through a PartitionMemo and directly
+## Verify the scores match, repeated guesses are looked up, the least recently used histograms are evicted and the memo survives a save/load round trip
+def test_partition_memo(numWeapons=9, numOpponents=4):
+    candidates = encode_codes([sample(range(numWeapons), numOpponents) for _ in range(500)], numOpponents)
+    guesses = encode_codes([sample(range(numWeapons), numOpponents) for _ in range(40)], numOpponents)
+    candidateMembership = encode_membership(candidates, numWeapons)
+    guessMembership = encode_membership(guesses, numWeapons)
+
+    path = os.path.join(tempfile.mkdtemp(), 'partitionMemo.pickle')
+    memo = PartitionMemo(30, path)
+
+    for withPositions in (False, True):
+        fingerprint = pool_fingerprint(candidates, withPositions)
+        for scorer in scorers:
+            expected = guess_scores(guesses, candidates, guessMembership, candidateMembership, withPositions, scorer)
+            for rows in (slice(0, 20), slice(0, 20), slice(10, 40)):
+                scores = memo.guess_scores(fingerprint, guesses[rows], candidates, guessMembership[rows], candidateMembership, withPositions, scorer)
+                if not np.allclose(scores, expected[rows]):
+                    print("PartitionMemo scores failed " + scorer + " " + str(withPositions))
+                    sys.exit()
+
+    if pool_fingerprint(candidates, False) == pool_fingerprint(candidates, True) or pool_fingerprint(candidates, False) == pool_fingerprint(candidates[1:], False):
+        print("pool_fingerprint() collided")
+        sys.exit()
+    if len(memo) != 30 or memo.hits == 0:
+        print("PartitionMemo did not look up or evict histograms " + str(memo.stats()))
+        sys.exit()
+
+    memo.save()
+    loaded = PartitionMemo(30, path)
+    fingerprint = pool_fingerprint(candidates, True)
+    loaded.partition_sizes(fingerprint, guesses[10:40], candidates, guessMembership[10:40], candidateMembership)
+    if loaded.misses != 0 or loaded.hits != 30:
+        print("PartitionMemo did not load the saved histograms " + str(loaded.stats()))
+        sys.exit()
+
+    os.remove(path)
+
+    ## Copies of a Gladiator share its memo, deepcopy must not try to copy the lock
+    if copy.deepcopy({'memo': loaded})['memo'] is not loaded:
+        print("deepcopy() copied the PartitionMemo")
+        sys.exit()
+
+    print("test_partition_memo() passed")
@@ -0,0 +1,52 @@
+import numpy as np
+from Util import *
+
+## Lazy list of every permutation of a list of combinations
+##
+## Permutation (combinationId, rank) places the sorted weapons of combination combinationId in the ordering of range(c) with Lehmer rank rank
+## Its index is combinationId * c! + rank, the same row permute_combinations() would put it in
+## Only the combinations are stored, permutations are decoded when they are read, so filtering it (see CandidateFilter) never holds more than one block of the raw space
+class PermutationSpace:
+    ## combinations is a packed array of combination bitmasks (see pack_combinations()) or an (N, c) array of sorted weapon codes
+    def __init__(self, combinations, c, start=0, end=None):
+        if combinations.dtype == np.uint64:
+            combinations = unpack_combinations(combinations, c)
+
+        self.combinations = combinations
+        self.c = c
+        self.numOrders = factorial(c)
+
+        ## This space is rows [start, end) of the permutations of every combination
+        self.start = start
+        self.end = len(combinations) * self.numOrders if end is None else end
+
+    def __len__(self):
+        return self.end - self.start
+
+    ## Return the lazy subspace space[start:end]
+    def __getitem__(self, key):
+        start, end, step = key.indices(len(self))
+        assert step == 1
+        return PermutationSpace(self.combinations, self.c, self.start + start, self.start + max(start, end))
+
+    ## Return the index of permutation (combinationId, rank) in the whole space
+    def index(self, combinationId, rank):
+        return combinationId * self.numOrders + rank
+
+    ## Return (combinationId, rank) of the permutation at an index in the whole space
+    def locate(self, index):
+        return divmod(index, self.numOrders)
+
+    ## Return permutation (combinationId, rank) as a tuple
+    def permutation(self, combinationId, rank):
+        return tuple(self.decode([self.index(combinationId, rank)])[0].tolist())
+
+    ## Return the permutations at indices in the whole space as an (M, c) uint8 array
+    def decode(self, indices):
+        combinationIds, ranks = np.divmod(np.asarray(indices, dtype=np.int64), self.numOrders)
+        orders = unrank_permutations(ranks, self.c)
+        return np.take_along_axis(self.combinations[combinationIds], orders, axis=1).astype(np.uint8)
+
+    ## Return every permutation of this space as an (M, c) uint8 array
+    def codes(self):
+        return self.decode(np.arange(self.start, self.end, dtype=np.int64))
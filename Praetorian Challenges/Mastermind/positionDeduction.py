@@ -0,0 +1,274 @@
+import time
+from random import shuffle, sample
+from Util import count_bits, combination_to_mask, mask_to_combination
+
+## Solves the positions of a known combination without enumerating its c! permutations
+##
+## Every position has a domain stored as a python int bitmask (bit w is set if weapon w can still be at that position)
+## Every guess is a constraint: the number of positions i with answer[i] == guess[i] is positionsCorrect
+## Constraints are propagated over the domains until nothing changes, then answers consistent with every guess are found by a randomized backtracking search
+
+## Number of search nodes between deadline checks
+deadlineCheckInterval = 256
+
+## Number of nodes the backtracking search visits before random_solution() gives up and local_solution() takes over
+maxSearchNodes = 20000
+
+## Number of swaps local_solution() tries without improving before it restarts from a new random answer
+maxStaleSwaps = 2000
+
+class positionDeduction:
+    def __init__(self, numWeapons, numOpponents, combination):
+        ## The number of weapons
+        self.numWeapons     = numWeapons
+
+        ## The number of positions
+        self.numOpponents   = numOpponents
+
+        ## Bitmask of the correct weapons
+        self.correctWeapons = combination_to_mask(combination)
+
+        ## Bitmask of the weapons that can be at every position
+        self.domains        = [self.correctWeapons] * numOpponents
+
+        ## Stores previous guesses as (guess tuple, positionsCorrect)
+        self.guesses        = list()
+
+    ## Updates the domains with the number of positions a guess got right
+    ## Return True if the position of every weapon is known
+    def learn(self, guess, positionsCorrect):
+        self.guesses.append((tuple(guess), positionsCorrect))
+        self.propagate()
+
+        return self.done_check()
+
+    ## Apply every constraint until the domains stop changing
+    def propagate(self):
+        learnedSomething = True
+
+        while learnedSomething:
+            learnedSomething = False
+
+            for guess, positionsCorrect in self.guesses:
+                if self.apply_guess(guess, positionsCorrect):
+                    learnedSomething = True
+
+            if self.apply_all_different():
+                learnedSomething = True
+
+    ## Apply the constraint of one guess
+    ## Positions whose domain does not contain the guessed weapon can not match
+    ## If the positions that must match already account for positionsCorrect, no other position matches
+    ## If every position that can match is needed to reach positionsCorrect, they all match
+    ## Return True if a domain changed
+    def apply_guess(self, guess, positionsCorrect):
+        possible = list()
+        numForced = 0
+
+        for position, weapon in enumerate(guess):
+            bit = 1 << weapon
+            if self.domains[position] & bit:
+                possible.append((position, bit))
+                if self.domains[position] == bit:
+                    numForced += 1
+
+        changed = False
+        if numForced == positionsCorrect:
+            for position, bit in possible:
+                if self.domains[position] != bit:
+                    self.domains[position] &= ~bit
+                    changed = True
+        elif len(possible) == positionsCorrect:
+            for position, bit in possible:
+                if self.domains[position] != bit:
+                    self.domains[position] = bit
+                    changed = True
+
+        return changed
+
+    ## Every weapon is at exactly one position
+    ## A weapon that is the only option of a position is removed from every other position
+    ## A weapon that only one position can hold is the only option of that position
+    ## Return True if a domain changed
+    def apply_all_different(self):
+        changed = False
+
+        for position, domain in enumerate(self.domains):
+            if count_bits(domain) == 1:
+                for other in range(self.numOpponents):
+                    if other != position and self.domains[other] & domain:
+                        self.domains[other] &= ~domain
+                        changed = True
+
+        for weapon in mask_to_combination(self.correctWeapons):
+            bit = 1 << weapon
+            positions = [position for position, domain in enumerate(self.domains) if domain & bit]
+            if len(positions) == 1 and self.domains[positions[0]] != bit:
+                self.domains[positions[0]] = bit
+                changed = True
+
+        return changed
+
+    ## Return True if the position of every weapon is known
+    def done_check(self):
+        return all(count_bits(domain) == 1 for domain in self.domains)
+
+    ## Return the answer if it is known, None otherwise
+    def answer(self):
+        if not self.done_check():
+            return None
+
+        return tuple(mask_to_combination(domain)[0] for domain in self.domains)
+
+    ## Return up to numSolutions different answers that are consistent with every guess
+    ## Every solution is found by a new randomized search so they are spread over the possible answers
+    ## If the backtracking search is too slow, return the answer closest to consistent that local_solution() found before the deadline
+    def solutions(self, numSolutions, deadline):
+        found = set()
+
+        for _ in range(numSolutions):
+            if time.time() > deadline:
+                break
+
+            solution = self.random_solution(deadline, maxSearchNodes)
+            if solution is None:
+                break
+            found.add(solution)
+
+        if not found:
+            found.add(self.local_solution(deadline))
+
+        return list(found)
+
+    ## Return a random answer consistent with every guess, or None if none is found before the deadline
+    ## Positions are filled from the smallest domain up, a partial answer is dropped as soon as a guess can no longer get exactly positionsCorrect
+    ## A position of a guess stops counting as a possible match when it is filled or when its guessed weapon is placed anywhere else
+    def random_solution(self, deadline, maxNodes=None):
+        order = sorted(range(self.numOpponents), key=lambda position: count_bits(self.domains[position]))
+        options = list()
+        for position in order:
+            weapons = list(mask_to_combination(self.domains[position]))
+            shuffle(weapons)
+            options.append(weapons)
+
+        ## live[k]: bitmask of the positions of guess k that can still match
+        ## guessedAt[k][weapon]: the position guess k put weapon at
+        live = list()
+        guessedAt = list()
+        for guess, _ in self.guesses:
+            live.append(sum(1 << position for position, weapon in enumerate(guess) if self.domains[position] >> weapon & 1))
+            guessedAt.append({weapon: position for position, weapon in enumerate(guess)})
+
+        matches = [0] * len(self.guesses)
+        targets = [positionsCorrect for _, positionsCorrect in self.guesses]
+        assignment = [0] * self.numOpponents
+        state = {'used': 0, 'nodes': 0, 'timedOut': False}
+
+        def search(depth):
+            if depth == self.numOpponents:
+                return True
+
+            state['nodes'] += 1
+            if state['nodes'] % deadlineCheckInterval == 0 and time.time() > deadline:
+                state['timedOut'] = True
+            if maxNodes is not None and state['nodes'] > maxNodes:
+                state['timedOut'] = True
+            if state['timedOut']:
+                return False
+
+            position = order[depth]
+            for weapon in options[depth]:
+                if state['used'] >> weapon & 1:
+                    continue
+
+                ## Remember every live mask this assignment changes so it can be undone
+                changes = list()
+                valid = True
+                for k, (guess, _) in enumerate(self.guesses):
+                    removed = live[k] & (1 << position)
+                    otherPosition = guessedAt[k].get(weapon)
+                    if otherPosition is not None and otherPosition != position:
+                        removed |= live[k] & (1 << otherPosition)
+                    if not removed:
+                        continue
+
+                    changes.append((k, live[k], matches[k]))
+                    live[k] &= ~removed
+                    if guess[position] == weapon:
+                        matches[k] += 1
+                    if matches[k] > targets[k] or matches[k] + count_bits(live[k]) < targets[k]:
+                        valid = False
+
+                if valid:
+                    state['used'] |= 1 << weapon
+                    assignment[position] = weapon
+                    if search(depth + 1):
+                        return True
+                    state['used'] &= ~(1 << weapon)
+
+                for k, previousLive, previousMatches in changes:
+                    live[k] = previousLive
+                    matches[k] = previousMatches
+
+            return False
+
+        if search(0):
+            return tuple(assignment)
+
+        return None
+
+    ## Return an answer that breaks as few guesses as possible, found by swapping positions until the deadline
+    ## The cost of an answer is the sum over guesses of |positions matched - positionsCorrect|, swaps that do not increase it are kept
+    ## Restart from a new random answer when no swap has improved the cost for a while, stop as soon as the cost is 0
+    def local_solution(self, deadline):
+        numGuesses = len(self.guesses)
+        targets = [positionsCorrect for _, positionsCorrect in self.guesses]
+        bestAnswer = None
+        bestCost = None
+
+        while bestCost != 0 and (bestAnswer is None or time.time() < deadline):
+            answer = self._random_domain_answer(deadline)
+            if answer is None:
+                break
+            answer = list(answer)
+
+            matches = [sum(1 for position, weapon in enumerate(guess) if answer[position] == weapon) for guess, _ in self.guesses]
+            cost = sum(abs(matches[k] - targets[k]) for k in range(numGuesses))
+            staleSwaps = 0
+
+            while cost != 0 and staleSwaps < maxStaleSwaps:
+                staleSwaps += 1
+                if staleSwaps % deadlineCheckInterval == 0 and time.time() > deadline:
+                    break
+
+                i, j = sample(range(self.numOpponents), 2)
+                weaponI, weaponJ = answer[i], answer[j]
+                if not (self.domains[i] >> weaponJ & 1 and self.domains[j] >> weaponI & 1):
+                    continue
+
+                newMatches = list(matches)
+                for k, (guess, _) in enumerate(self.guesses):
+                    newMatches[k] += (guess[i] == weaponJ) + (guess[j] == weaponI) - (guess[i] == weaponI) - (guess[j] == weaponJ)
+                newCost = sum(abs(newMatches[k] - targets[k]) for k in range(numGuesses))
+
+                if newCost <= cost:
+                    if newCost < cost:
+                        staleSwaps = 0
+                    answer[i], answer[j] = weaponJ, weaponI
+                    matches = newMatches
+                    cost = newCost
+
+            if bestCost is None or cost < bestCost:
+                bestAnswer = tuple(answer)
+                bestCost = cost
+
+        return bestAnswer
+
+    ## Return a random answer that only has to fit the domains
+    def _random_domain_answer(self, deadline):
+        guesses = self.guesses
+        self.guesses = list()
+        try:
+            return self.random_solution(deadline)
+        finally:
+            self.guesses = guesses
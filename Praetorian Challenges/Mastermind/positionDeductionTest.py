@@ -0,0 +1,49 @@
+from positionDeduction import positionDeduction
+from Util import *
+from random import sample
+import time
+import sys
+
+debugger_positionSolver = None
+
+## Play rounds where the combination is already known, always guessing a solution of the PositionSolver
+## Verify that the answer never leaves the domains, that every backtracking solution fits every guess and that the answer is found
+def test(numWeapons, numOpponents, answer=None, maxGuesses=None, timeout=5):
+    global debugger_positionSolver
+
+    if answer is None:
+        answer = tuple(sample(range(numWeapons), numOpponents))
+    if maxGuesses is None:
+        maxGuesses = 3 * numOpponents
+
+    positionSolver = positionDeduction(numWeapons, numOpponents, answer)
+    debugger_positionSolver = positionSolver
+
+    for _ in range(maxGuesses):
+        if any(not domain >> weapon & 1 for domain, weapon in zip(positionSolver.domains, answer)):
+            print("Error: answer removed from domains " + str(answer))
+            sys.exit()
+
+        guess = positionSolver.solutions(1, time.time() + timeout)[0]
+        if guess == answer:
+            return True
+
+        positionsCorrect = count_correct_positions(answer, guess)
+        positionSolver.learn(guess, positionsCorrect)
+
+        solution = positionSolver.random_solution(time.time() + timeout)
+        if solution is not None and any(count_correct_positions(solution, previous) != correct for previous, correct in positionSolver.guesses):
+            print("Error: random_solution() does not fit every guess " + str(solution))
+            sys.exit()
+
+    return False
+
+## Run tests over a range of sizes, including sizes with more permutations than approximateCutoffSize
+def test_all():
+    for numWeapons, numOpponents in [(4, 3), (6, 6), (9, 8), (12, 11), (14, 12)]:
+        for _ in range(3):
+            if not test(numWeapons, numOpponents):
+                print("Too many guesses " + str(numWeapons) + " " + str(numOpponents))
+                sys.exit()
+
+    print("test_all() passed")
@@ -0,0 +1,116 @@
+import time
+
+## Anytime scheduler for the turns of a Gladiator
+##
+## A turn (updating knowledge with a response, then choosing the next guess) has a fixed time budget
+## Every phase of the turn gets a time slice: a deadline that is a share of the time left until the end of the update or of the whole turn
+## Phases offer guesses as they find them and the scheduler keeps the best one so far, so a search that runs out of time
+## falls back to the best guess known at that point (at worst a cheap guess offered before the search) instead of a random one
+## Every slice is timed when it finishes, stats() reports how often and by how much every phase ran past its deadline
+## cancel() ends the turn early from another thread: every later slice has already expired and searches that check cancelled() stop at their next block
+
+class TimeSlice:
+    def __init__(self, phase, deadline, checkInterval=1):
+        self.phase = phase
+        self.deadline = deadline
+        self.start = time.time()
+
+        ## The clock is read every checkInterval calls of expired()
+        self.checkInterval = checkInterval
+        self.numChecks = 0
+
+    ## Return True if the deadline has passed
+    ## Calls between clock reads return False, so a loop can check every iteration at the cost of a counter
+    def expired(self):
+        self.numChecks += 1
+        if self.numChecks % self.checkInterval:
+            return False
+
+        return time.time() > self.deadline
+
+class TurnScheduler:
+    ## updateTime: seconds of every turn for updating knowledge
+    ## turnTime:   seconds of every turn before the guess is forced
+    def __init__(self, updateTime, turnTime):
+        self.updateTime = updateTime
+        self.turnTime = turnTime
+        self.startTime = time.time()
+
+        ## Best guess offered this turn and its score (lower is better, unscored guesses are float('inf'))
+        self.bestGuess = None
+        self.bestScore = float('inf')
+
+        ## Phase -> {'slices', 'time', 'overruns', 'overrunTime', 'maxOverrun'}
+        self.phases = dict()
+        self.numTurns = 0
+        self.numFallbacks = 0
+
+        ## Set by cancel(), a cancelled scheduler stays cancelled
+        self.isCancelled = False
+
+    ## Start the time budget of a new turn
+    def start_turn(self):
+        self.startTime = time.time()
+        self.bestGuess = None
+        self.bestScore = float('inf')
+        self.numTurns += 1
+
+    ## Return the time the turn's update ('update') or the turn itself ('turn') ends
+    def end_time(self, end='turn'):
+        return self.startTime + (self.updateTime if end == 'update' else self.turnTime)
+
+    ## Return a TimeSlice for a phase that ends after 'share' of the time left until end_time(end)
+    ## A slice that starts after end_time(end) has already expired
+    def slice(self, phase, share=1.0, end='turn', checkInterval=1):
+        now = time.time()
+        if self.isCancelled:
+            return TimeSlice(phase, now, checkInterval)
+
+        return TimeSlice(phase, now + max(0.0, self.end_time(end) - now) * share, checkInterval)
+
+    ## End the current turn and every later one as soon as possible, safe to call from another thread
+    ## Used to stop the update of a Gladiator whose result is no longer wanted (see mastermindClient.Speculator)
+    def cancel(self):
+        self.isCancelled = True
+
+    def cancelled(self):
+        return self.isCancelled
+
+    ## Record how long a slice took and how far past its deadline it finished
+    def finish(self, timeSlice):
+        now = time.time()
+        entry = self.phases.setdefault(timeSlice.phase, {'slices': 0, 'time': 0.0, 'overruns': 0, 'overrunTime': 0.0, 'maxOverrun': 0.0})
+        entry['slices'] += 1
+        entry['time'] += now - timeSlice.start
+
+        overrun = now - timeSlice.deadline
+        if overrun > 0:
+            entry['overruns'] += 1
+            entry['overrunTime'] += overrun
+            entry['maxOverrun'] = max(entry['maxOverrun'], overrun)
+
+    ## Keep guess if it beats the best guess of the turn so far
+    ## The first guess offered is always kept
+    def offer(self, guess, score=float('inf')):
+        if guess is None:
+            return
+
+        if self.bestGuess is None or score < self.bestScore:
+            self.bestGuess = list(guess)
+            self.bestScore = score
+
+    ## Return the best guess of the turn, None if nothing was offered
+    ## A guess that was never scored counts as a fallback
+    def best_guess(self):
+        if self.bestGuess is not None and self.bestScore == float('inf'):
+            self.numFallbacks += 1
+
+        return self.bestGuess
+
+    ## Return the overrun statistics as a dict
+    def stats(self):
+        return {
+            'turns': self.numTurns,
+            'fallbacks': self.numFallbacks,
+            'phases': {phase: dict(entry) for phase, entry in self.phases.items()},
+        }
@@ -0,0 +1,110 @@
+import sys
+import time
+import threading
+import Gladiator as gladiatorModule
+from Util import *
+from scheduler import TurnScheduler
+from guessSearch import search_guesses
+from benchmark import SimulatedServer
+from Gladiator import Gladiator
+
+## Test time slices, overrun statistics and the best guess so far of TurnScheduler
+def test_scheduler():
+    scheduler = TurnScheduler(0.2, 0.4)
+    scheduler.start_turn()
+
+    timeSlice = scheduler.slice('count', 0.5, 'update')
+    if not scheduler.startTime + 0.05 < timeSlice.deadline <= scheduler.startTime + 0.11:
+        print("slice() did not take a share of the update time")
+        sys.exit()
+
+    timeSlice = scheduler.slice('search', checkInterval=4)
+    time.sleep(0.45)
+    if [timeSlice.expired() for _ in range(8)] != [False, False, False, True] * 2:
+        print("expired() did not check the clock every checkInterval calls")
+        sys.exit()
+    scheduler.finish(timeSlice)
+
+    if scheduler.slice('late').deadline > time.time():
+        print("slice() after the end of the turn has not expired")
+        sys.exit()
+
+    phase = scheduler.stats()['phases']['search']
+    if phase['slices'] != 1 or phase['overruns'] != 1 or not 0 < phase['maxOverrun'] < 0.5:
+        print("finish() did not record the overrun")
+        sys.exit()
+
+    scheduler.offer([0, 1, 2])
+    scheduler.offer([3, 4, 5])
+    if scheduler.best_guess() != [0, 1, 2] or scheduler.stats()['fallbacks'] != 1:
+        print("best_guess() did not keep the first unscored guess")
+        sys.exit()
+
+    scheduler.offer([3, 4, 5], 7)
+    scheduler.offer([6, 7, 8], 9)
+    scheduler.offer(None, 0)
+    if scheduler.best_guess() != [3, 4, 5] or scheduler.stats()['fallbacks'] != 1:
+        print("best_guess() did not keep the best scored guess")
+        sys.exit()
+
+    scheduler.start_turn()
+    if scheduler.best_guess() is not None or scheduler.stats()['turns'] != 2:
+        print("start_turn() kept the last turn's guess")
+        sys.exit()
+
+    print("test_scheduler() passed")
+
+## Cancel a turn from another thread while a guess search runs
+## The search has to stop at its next block instead of running to its deadline, and every later slice has already expired
+def test_cancel(n=10, c=4):
+    candidates = flatten_permutations(generate_grouped_permutations(generate_combinations(n, c), c), c)
+    scheduler = TurnScheduler(30, 60)
+    scheduler.start_turn()
+
+    results = list()
+    search = threading.Thread(target=lambda: results.append(search_guesses('rows', candidates, candidates, n, True, scheduler.slice('search').deadline, stop=scheduler.cancelled)))
+    search.start()
+    time.sleep(0.1)
+
+    start = time.time()
+    scheduler.cancel()
+    search.join()
+    if time.time() - start > 1 or results[0][2] == 0:
+        print("search_guesses() did not stop when the scheduler was cancelled")
+        sys.exit()
+
+    if scheduler.slice('filter', end='update').deadline > time.time():
+        print("slice() of a cancelled scheduler has not expired")
+        sys.exit()
+
+    print("test_cancel() passed")
+
+## Play rounds with no time to search for guesses
+## Every guess has to come from the best guess so far instead of a random guess, so every round is still solved
+def test_out_of_time(numWeapons=8, numOpponents=4, numRounds=3):
+    guessTimeout, updateTimeout = gladiatorModule.guessTimeout, gladiatorModule.updateTimeout
+    gladiatorModule.guessTimeout, gladiatorModule.updateTimeout = 0, 0
+
+    try:
+        server = SimulatedServer(numWeapons, numOpponents, 30, numRounds)
+        gladiator = Gladiator(numWeapons, numOpponents, useOpeningBook=False)
+
+        r = dict()
+        while 'message' not in r:
+            r = server.guess(gladiator.get_next_guess())
+            if 'error' in r:
+                print("Out of time guess failed: " + r['error'])
+                sys.exit()
+            if 'roundsLeft' in r:
+                gladiator.reset()
+            elif 'response' in r:
+                gladiator.update(r['response'][0], r['response'][1])
+    finally:
+        gladiatorModule.guessTimeout, gladiatorModule.updateTimeout = guessTimeout, updateTimeout
+
+    stats = gladiator.scheduler.stats()
+    if stats['fallbacks'] == 0 or stats['fallbacks'] > stats['turns']:
+        print("Out of time guesses did not fall back to the best guess so far")
+        sys.exit()
+
+    print("test_out_of_time() passed")
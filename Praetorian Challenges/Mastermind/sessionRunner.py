@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import multiprocessing
+from random import seed
+from benchmark import percentile
+from localServer import start_local_server, defaultLevels
+from mastermindClient import AsyncMastermindClient, Speculator, play_level, defaultUrl
+
+## Runs many independent Mastermind sessions at once
+##
+## Every session is one account (email) playing its levels in order with its own client, Auth-Token headers and Gladiators
+## Sessions are scheduled over a pool of worker processes, since choosing guesses is CPU bound, and every worker plays one session at a time
+## The runner reports the aggregate throughput in levels per hour and the latency of levels and requests
+
+## Default number of worker processes
+numWorkers = os.cpu_count() or 1
+
+## Return the email of session 'index' for a template like 'runner{0}@email.com'
+def session_email(template, index):
+    return template.format(index)
+
+## Play levels 1 to maxLevels (or until the server gives a hash) as one account
+## Return the results of the session as a dict: every level's time, turns and outcome plus every request's latency
+def run_session(email, url, maxLevels=None, numSpeculations=0):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    client = AsyncMastermindClient(email, url)
+    speculator = Speculator(numSpeculations)
+    levels = list()
+    error = None
+
+    async def play():
+        nonlocal error
+        await client.authenticate()
+        await client.reset_levels()
+
+        levelNum = 1
+        while maxLevels is None or levelNum <= maxLevels:
+            start = time.perf_counter()
+            r, stats = await play_level(client, levelNum, speculator, verbose=False)
+            levels.append({'level': levelNum, 'time': time.perf_counter() - start, 'turns': stats['turns'], 'solved': 'error' not in r})
+
+            if 'error' in r:
+                error = r['error']
+                break
+            if 'hash' in r:
+                break
+
+            levelNum += 1
+
+    start = time.perf_counter()
+    try:
+        loop.run_until_complete(play())
+    except Exception as exception:
+        error = repr(exception)
+    finally:
+        speculator.close()
+        client.close()
+        loop.close()
+
+    return {
+        'email': email,
+        'time': time.perf_counter() - start,
+        'levels': levels,
+        'error': error,
+        'requestLatencies': client.pool.latencies,
+        'numConnections': client.pool.numConnections,
+    }
+
+## Pool.imap_unordered() takes one argument
+def _run_session(arguments):
+    return run_session(*arguments)
+
+## Run one session per email on numWorkers processes
+## Return the results of every session and the aggregate throughput and latency as a dict
+def run_sessions(emails, url, numWorkers=numWorkers, maxLevels=None, numSpeculations=0, verbose=True):
+    tasks = [(email, url, maxLevels, numSpeculations) for email in emails]
+    sessions = list()
+
+    start = time.perf_counter()
+    ## Reseed every worker, otherwise forked workers would all play the same random guesses
+    pool = multiprocessing.Pool(min(numWorkers, len(tasks)), initializer=seed)
+    try:
+        for session in pool.imap_unordered(_run_session, tasks):
+            sessions.append(session)
+            if verbose:
+                solved = sum(1 for level in session['levels'] if level['solved'])
+                print('{0}: {1} levels in {2:.1f}s{3}'.format(session['email'], solved, session['time'], '  error: ' + session['error'] if session['error'] else ''))
+    finally:
+        pool.close()
+        pool.join()
+    wallTime = time.perf_counter() - start
+
+    levelTimes = [level['time'] for session in sessions for level in session['levels'] if level['solved']]
+    latencies = [latency for session in sessions for latency in session['requestLatencies']]
+
+    return {
+        'numSessions': len(sessions),
+        'numWorkers': min(numWorkers, len(tasks)),
+        'wallTime': wallTime,
+        'levelsSolved': len(levelTimes),
+        'levelsFailed': sum(1 for session in sessions for level in session['levels'] if not level['solved']),
+        'sessionErrors': sum(1 for session in sessions if session['error']),
+        'levelsPerHour': len(levelTimes) / wallTime * 3600 if wallTime > 0 else 0.0,
+        'levelTime': {'p50': percentile(levelTimes, 50), 'p90': percentile(levelTimes, 90), 'max': max(levelTimes) if levelTimes else None},
+        'requestLatency': {'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90), 'p99': percentile(latencies, 99)},
+        'sessions': sessions,
+    }
+
+## Usage: python sessionRunner.py [--sessions 8] [--workers 4] [--email runner{0}@email.com] [--url url | --local] [--levels 5] [--speculations 0]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play many Mastermind sessions at once')
+    parser.add_argument('--sessions', type=int, default=numWorkers, help='number of accounts to play')
+    parser.add_argument('--workers', type=int, default=numWorkers, help='number of worker processes')
+    parser.add_argument('--email', default='runner{0}@email.com', help='email template, {0} is replaced by the session number')
+    parser.add_argument('--url', default=defaultUrl)
+    parser.add_argument('--local', action='store_true', help='play against a local stand-in server (see localServer.py) instead of --url')
+    parser.add_argument('--levels', type=int, help='stop every session after this many levels')
+    parser.add_argument('--speculations', type=int, default=0, help='responses every session speculates on (see mastermindClient.py)')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.local:
+        server = start_local_server(defaultLevels)
+        url = server.url()
+
+    emails = [session_email(args.email, index) for index in range(args.sessions)]
+    results = run_sessions(emails, url, args.workers, args.levels, args.speculations)
+
+    print('\n{0} sessions on {1} workers: {2} levels solved, {3} failed in {4:.1f}s ({5:.1f} levels/hour)'.format(
+        results['numSessions'], results['numWorkers'], results['levelsSolved'], results['levelsFailed'], results['wallTime'], results['levelsPerHour']))
+    print('Level time p50 {0:.2f}s p90 {1:.2f}s  Request latency p50 {2:.4f}s p99 {3:.4f}s'.format(
+        results['levelTime']['p50'] or 0.0, results['levelTime']['p90'] or 0.0, results['requestLatency']['p50'] or 0.0, results['requestLatency']['p99'] or 0.0))
+
+    if server is not None:
+        server.shutdown()
+    if results['sessionErrors']:
+        sys.exit(1)
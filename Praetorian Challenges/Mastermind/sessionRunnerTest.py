@@ -0,0 +1,26 @@
+import sys
+from localServer import start_local_server
+from sessionRunner import *
+
+## Run several sessions against one local server
+## Verify that every session solves every level with its own account and that the throughput is reported
+def test_session_runner(levels=[(6, 3, 10, 2), (8, 4, 10, 2)], numSessions=4, numWorkers=2):
+    server = start_local_server(levels, seed=0)
+    emails = [session_email('runner{0}@email.com', index) for index in range(numSessions)]
+    results = run_sessions(emails, server.url(), numWorkers, verbose=False)
+    server.shutdown()
+
+    if sorted(session['email'] for session in results['sessions']) != sorted(emails):
+        print("run_sessions() lost a session")
+        sys.exit()
+    if results['sessionErrors'] or results['levelsSolved'] != numSessions * len(levels):
+        print("run_sessions() failed " + str([session['error'] for session in results['sessions']]))
+        sys.exit()
+    if len(server.accounts) != numSessions:
+        print("Sessions shared an Auth-Token")
+        sys.exit()
+    if results['levelsPerHour'] <= 0 or results['requestLatency']['p50'] is None:
+        print("run_sessions() did not measure throughput")
+        sys.exit()
+
+    print("test_session_runner() passed")
@@ -1,3 +1,19 @@
+from Util import count_bits, combination_to_mask
+from cardinalitySolver import CardinalitySolver, maxCountingStates
+
+## Weapon sets are stored as python int bitmasks (bit w is set if weapon w is in the set)
+## Removing known weapons is an AND with unknownWeapons and counting correct weapons is a popcount of an AND with correctWeapons
+##
+## Every piece of information is a constraint (weaponSet1, weaponSet2, correctnessDelta):
+## the number of correct weapons in weaponSet2 minus the number of correct weapons in weaponSet1 is correctnessDelta
+## A guess is the constraint (0, guess, numCorrect) and the relation between two guesses is (previous - current, current - previous, delta)
+##
+## Constraints are propagated from a worklist. Every weapon indexes the constraints that mention it,
+## so when a weapon is determined only the constraints that mention it are visited again
+##
+## Propagation only fires when a constraint leaves a single assignment. count_models() is the exact mode: it counts every combination
+## that fits the guesses (see cardinalitySolver.py), which determines every forced weapon and gives the exact number of possible combinations
+
 class weaponDeduction:
     def __init__(self, numWeapons, numOpponents):
         ## The number of weapons
@@ -5,191 +21,195 @@ class weaponDeduction:
 
         ## The number of correct weapons
         self.numOpponents   = numOpponents
-        
-        ## Sets of correct weapons
-        self.correctWeapons = set()
 
-        ## Sets of undetermined weapons
-        self.unknownWeapons = set(range(numWeapons))
+        ## Bitmask of correct weapons
+        self.correctWeapons = 0
+
+        ## Bitmask of undetermined weapons
+        self.unknownWeapons = (1 << numWeapons) - 1
+
+        ## Constraints that still have undetermined weapons as id -> [weaponSet1, weaponSet2, correctnessDelta]
+        ## Known weapons are only removed from a constraint when it is visited
+        self.constraints    = dict()
 
-        ## Quickly lookup the status of a specific weapon: -1 if incorrect, 0 if unknown, 1 if correct
-        self.weaponLookup   = [0] * numWeapons
+        ## Ids of the constraints that mention each undetermined weapon
+        ## Ids of resolved constraints are left in place and skipped, every list is dropped once its weapon is determined
+        self.constraintIndex = [list() for _ in range(numWeapons)]
 
-        ## Stores previous guesses
+        ## Ids of the constraints of previous guesses, in the order they were guessed
         self.guesses        = list()
 
-        ## Holds relations between every pair of guesses.
-        self.information    = list()
+        ## Ids of the constraints to visit again
+        self.worklist       = set()
+
+        ## Id of the next constraint
+        self.nextId         = 0
+
+        ## CardinalitySolver of the last count_models() since the last learn(), None if the count did not finish
+        self.modelSolver    = None
 
-        ## Set if we learn something
-        self.learnedSomething = False
-        
     ## Updates knowledge and learns correct weapons
     ## Return True if all correct weapons found
     ## Return False otherwise
     def learn(self, _guess, numCorrect):
-        guess = set(_guess)
+        self.modelSolver = None
 
         ## Remove known information from guess
-        numCorrect -= self.remove_known_information(guess)
-        
-        ## Check if undetermined weapons are all incorrect
-        if numCorrect == 0:
-            self.found_incorrect_weapons(guess)
-            self.learnedSomething = True
-            if self.done_check():
-                return True
-        ## Check if undetermined weapons are all correct
-        elif len(guess) == numCorrect:
-            self.found_correct_weapons(guess)
-            self.learnedSomething = True
-            if self.done_check():
-                return True
-
-        ## Update information then add guess to guesses list
-        self.update_information(guess, numCorrect)
-        self.guesses.append((guess, numCorrect))
-
-        ## Remove the known information from guesses and try to learn if something new has been learned
-        while self.learnedSomething:
-            ## If something else new is learned, go again
-            self.learnedSomething = False
-            self.deduce_information()
-            
+        guess, numKnownCorrect = self.remove_known_information(combination_to_mask(_guess))
+        numCorrect -= numKnownCorrect
+
+        ## Relate the guess to the unknown weapons of every previous guess
+        liveGuesses = list()
+        for guessId in self.guesses:
+            previous = self.constraints.get(guessId)
+            if previous is None:
+                continue
+
+            liveGuesses.append(guessId)
+            previousGuess, previousCorrect = self.reduce(guessId)[1:]
+            self.add_constraint(previousGuess & ~guess, guess & ~previousGuess, numCorrect - previousCorrect)
+
+            ## Weapons determined by the new relation are removed from the rest of the relations
+            guess, numKnownCorrect = self.remove_known_information(guess)
+            numCorrect -= numKnownCorrect
+
+        ## Guesses whose constraint was resolved have no unknown weapons left to relate to
+        self.guesses = liveGuesses
+        guessId = self.add_constraint(0, guess, numCorrect)
+        if guessId is not None:
+            self.guesses.append(guessId)
+
+        self.propagate()
         return self.done_check()
 
-    ## Remove known weapons from self.information and self.guesses and tries to find correct/incorrect weapons
-    def deduce_information(self):
-        updatedInformation = list()
-        
-        for (weaponSet1, weaponSet2, correctnessDelta) in self.information:
-            newInfo = self.apply_knowldge(weaponSet1, weaponSet2, correctnessDelta)
-            if newInfo:
-                    updatedInformation.append(newInfo)
-
-        self.knowledge = updatedInformation
-        self.update_guesses()
-
-    ## Add relation between new guess and the unknown elements of previous guesses
-    def update_information(self, currentGuess, numCorrect):
-        ## Remove the known information from guesses if something new has been learned
-        if self.learnedSomething:
-            ## If something else new is learned while updating, update again
-            while self.learnedSomething:
-                self.learnedSomething = False
-                self.update_guesses()
-            self.learnedSomething = True
-
-        ## Iterate through all previous guesses
-        for previousGuess in self.guesses:
-            self.add_information(previousGuess, currentGuess, numCorrect)
-
-    ## Add relation between two guesses to self.information
-    def add_information(self, previousGuess, currentGuess, numCorrect):
-        weaponSet1 = previousGuess[0].difference(currentGuess)
-        weaponSet2 = currentGuess.difference(previousGuess[0])
-        correctnessDelta = numCorrect - previousGuess[1]
-
-        information = self.apply_knowldge(weaponSet1, weaponSet2, correctnessDelta)
-        
-        ## Add to list if unknown weapons remain
-        if information:
-                self.information.append(information)
-
-    ## Remove known weapons and find correct/incorrect weapons
-    def apply_knowldge(self, weaponSet1, weaponSet2, correctnessDelta):
-        correctnessDelta += self.remove_known_information(weaponSet1)
-        correctnessDelta -= self.remove_known_information(weaponSet2)
-        afterLength1 = len(weaponSet1)
-        afterLength2 = len(weaponSet2)
+    ## Add a constraint made of undetermined weapons, or apply it right away if it determines its weapons
+    ## Return its id, None if it was applied or has no unknown weapons
+    def add_constraint(self, weaponSet1, weaponSet2, correctnessDelta):
+        if self.apply_constraint(weaponSet1, weaponSet2, correctnessDelta):
+            return None
+
+        constraintId = self.nextId
+        self.nextId += 1
+        self.constraints[constraintId] = [weaponSet1, weaponSet2, correctnessDelta]
+
+        constraintIndex = self.constraintIndex
+        mask = weaponSet1 | weaponSet2
+        while mask:
+            lowest = mask & -mask
+            constraintIndex[lowest.bit_length() - 1].append(constraintId)
+            mask ^= lowest
 
+        return constraintId
+
+    ## Determine the weapons of a reduced constraint if it allows a single assignment
+    ## Return True if the constraint has no unknown weapons left
+    def apply_constraint(self, weaponSet1, weaponSet2, correctnessDelta):
         ## If both lists empty
-        if not afterLength1 and not afterLength2:
-            return ()
+        if not weaponSet1 and not weaponSet2:
+            return True
 
         ## If every element in weaponSet1 is correct
-        if afterLength1 == -correctnessDelta:
+        if count_bits(weaponSet1) == -correctnessDelta:
             self.found_correct_weapons(weaponSet1)
             self.found_incorrect_weapons(weaponSet2)
-            return ()
+            return True
         ## If every element in weaponSet2 is correct
-        if afterLength2 == correctnessDelta:
+        if count_bits(weaponSet2) == correctnessDelta:
             self.found_correct_weapons(weaponSet2)
             self.found_incorrect_weapons(weaponSet1)
-            return ()
-        
-        return (weaponSet1, weaponSet2, correctnessDelta)
-            
+            return True
+
+        return False
+
+    ## Remove known weapons from a stored constraint
+    ## Return the reduced constraint
+    def reduce(self, constraintId):
+        constraint = self.constraints[constraintId]
+        weaponSet1, numKnownCorrect1 = self.remove_known_information(constraint[0])
+        weaponSet2, numKnownCorrect2 = self.remove_known_information(constraint[1])
+        constraint[0], constraint[1] = weaponSet1, weaponSet2
+        constraint[2] += numKnownCorrect1 - numKnownCorrect2
+
+        return constraint
+
+    ## Visit queued constraints until none of them determines a weapon
+    ## Determining a weapon queues every constraint that mentions it
+    def propagate(self):
+        while self.worklist:
+            constraintId = self.worklist.pop()
+            if constraintId not in self.constraints:
+                continue
+
+            weaponSet1, weaponSet2, correctnessDelta = self.reduce(constraintId)
+            if self.apply_constraint(weaponSet1, weaponSet2, correctnessDelta):
+                del self.constraints[constraintId]
+
     ## Remove known weapons from a set of weapons
-    ## Returns number of correct weapons removed
+    ## Returns the remaining unknown weapons and the number of correct weapons removed
     def remove_known_information(self, weaponSet):
-        count = 0
-        discardSet = set()
-        
-        for weapon in weaponSet:
-            ## Correct = 1
-            if self.weaponLookup[weapon] == 1:
-                count += 1
-                discardSet.add(weapon)
-            ## Incorrect = -1
-            elif self.weaponLookup[weapon] == -1:
-                discardSet.add(weapon)
-        
-        weaponSet.difference_update(discardSet)
-        return count
-
-    ## Remove known information from all guesses
-    def update_guesses(self):
-        newGuesses = list()
-        
-        for guessTuple in self.guesses:
-            guess = guessTuple[0]
-            numCorrect = guessTuple[1] - self.remove_known_information(guess)
-            
-            ## If every element in guess is correct
-            if len(guess) == numCorrect:
-                self.found_correct_weapons(guess)
-                self.learnedSomething = True
-            ## If every element in guess is incorrect
-            elif numCorrect == 0:
-                self.found_incorrect_weapons(guess)
-                self.learnedSomething = True
-            else:
-                newGuesses.append((guess, numCorrect))
-
-        self.guesses = newGuesses
-
-    ## Moves correct weapon set from unknownWeapons to correctWeapons and updates weaponLookup
+        return weaponSet & self.unknownWeapons, count_bits(weaponSet & self.correctWeapons)
+
+    ## Queue every constraint that mentions a newly determined weapon and clear the weapons' index entries
+    def determined(self, weaponSet):
+        constraintIndex = self.constraintIndex
+        while weaponSet:
+            lowest = weaponSet & -weaponSet
+            weapon = lowest.bit_length() - 1
+            self.worklist.update(constraintIndex[weapon])
+            constraintIndex[weapon] = list()
+            weaponSet ^= lowest
+
+    ## Moves correct weapon set from unknownWeapons to correctWeapons
+    ## Weapons that were already known are left alone
     def found_correct_weapons(self, weaponSet):
-        self.correctWeapons.update(weaponSet)
-        self.unknownWeapons.difference_update(weaponSet)
-        for weapon in weaponSet:
-            self.weaponLookup[weapon] = 1
+        weaponSet &= self.unknownWeapons
+        self.correctWeapons |= weaponSet
+        self.unknownWeapons &= ~weaponSet
+        self.determined(weaponSet)
 
-    ## Removes incorrect weapon set from unknownWeapons and updates weaponLookup
+    ## Removes incorrect weapon set from unknownWeapons
     def found_incorrect_weapons(self, weaponSet):
-        self.unknownWeapons.difference_update(weaponSet)
-        for weapon in weaponSet:
-            self.weaponLookup[weapon] = -1
+        weaponSet &= self.unknownWeapons
+        self.unknownWeapons &= ~weaponSet
+        self.determined(weaponSet)
+
+    ## Exact mode: count every combination that fits every guess, stopping at the deadline or after maxStates search nodes
+    ## Weapons that are correct in every combination or in none of them are determined
+    ## Return the number of possible combinations, None if the count did not finish
+    def count_models(self, deadline=float('inf'), maxStates=maxCountingStates):
+        constraints = [tuple(self.reduce(guessId)[1:]) for guessId in self.guesses if guessId in self.constraints]
+        solver = CardinalitySolver(self.correctWeapons, self.unknownWeapons, constraints, self.numOpponents)
+
+        if not solver.solve(deadline, maxStates):
+            return None
+
+        self.found_correct_weapons(solver.forcedCorrect)
+        self.found_incorrect_weapons(solver.forcedIncorrect)
+        self.propagate()
+        self.modelSolver = solver
+
+        return solver.numModels
 
     ## Checks if all correct weapons have been found
     def done_check(self):
         ## Check if all correct weapons found
-        if len(self.correctWeapons) == self.numOpponents:
+        if count_bits(self.correctWeapons) == self.numOpponents:
             return True
         ## Check if remaining undetermined weapons must be correct
-        if (len(self.correctWeapons) + len(self.unknownWeapons)) == self.numOpponents:
-            self.found_correct_weapons(set(self.unknownWeapons)) ## NOTE 1
+        if (count_bits(self.correctWeapons) + count_bits(self.unknownWeapons)) == self.numOpponents:
+            self.found_correct_weapons(self.unknownWeapons)
             return True
-        
+
         return False
     ## Reset state for new round or level
     def reset(self):
-        self.correctWeapons = set()
-        self.unknownWeapons = set(range(self.numWeapons))
-        self.weaponLookup   = [0] * self.numWeapons
+        self.correctWeapons = 0
+        self.unknownWeapons = (1 << self.numWeapons) - 1
+        self.constraints    = dict()
+        self.constraintIndex = [list() for _ in range(self.numWeapons)]
         self.guesses        = list()
-        self.information    = list()
+        self.worklist       = set()
+        self.modelSolver    = None
 
 
 ## REPLACED: remove_known_information
@@ -202,25 +222,13 @@ class weaponDeduction:
 ## ## Add number of correct weapons in weaponSet1 to correctnessDelta
 ## correctnessDelta += temp
 
-## POSSIBLE OPTIMIZATION:
-## ASSESMENT: Some benefit, largely unnecessary
-## 
+## REPLACED: deduce_information, update_guesses
+## REASON: Rescanned every guess and every relation until nothing new was learned
+##
 ## while self.learnedSomething:
 ##     self.learnedSomething = False
 ##     self.deduce_information()
-## 
-## while self.learnedSomething:
-##     self.learnedSomething = False
-##     self.update_guesses()
 ##
-## Both deduce_information() and update_guesses() work the same way.
-## They iterate through a list and attempt to learn something from each element
-## If something is learned during the iteration, that information will also be applied to any remaining elements in the list
-## However, any element that has already been inspected will not see this new information that could determine the correctness
-## of additional weapons. For this reason, we update again until nothing new has been learned but we also waste time
-## reinspecting all the elements in the list after the point of discovery.
-
-## NOTE 1
-## Need to create set copy passing unknownWeapons to found_correct_weapons, otherwise weaponSet = unknownWeapons
-## when unknownWeapons.difference_update(weaponSet) runs, weaponSet will also become an empty set
-## and weaponLookup will not be properly updated
+## Both deduce_information() and update_guesses() iterated through a whole list and attempted to learn something from each element.
+## Any element inspected before a discovery did not see it, so the lists were inspected again until nothing new was learned.
+## propagate() only revisits the constraints that mention a newly determined weapon (see constraintIndex)
@@ -10,6 +10,13 @@ debugger_weaponSolver = None
 def random_guess(weaponSolver):
     return set(sample(range(weaponSolver.numWeapons), weaponSolver.numOpponents))
 
+## Verify that every weapon the solver determined agrees with the answer
+def check_knowledge(weaponSolver, answer):
+    answerMask = combination_to_mask(answer)
+    if weaponSolver.correctWeapons & ~answerMask or answerMask & ~(weaponSolver.correctWeapons | weaponSolver.unknownWeapons):
+        print("Error: determined weapons do not match answer " + str(answer))
+        sys.exit()
+
 ## Versatile test function
 ## 'next_guess' field was intended to be used to test and compare guessing algorithms but was never implemented
 def test(numWeapons, numOpponents, answer=None, guesses=None, maxGuesses=None, next_guess=random_guess):
@@ -59,6 +66,7 @@ def test(numWeapons, numOpponents, answer=None, guesses=None, maxGuesses=None, n
 
         ## While we have not learned the correct answer, keep trying
         while weaponSolver.learn(guess, response) == False:
+            check_knowledge(weaponSolver, answer)
             numGuesses += 1
             
             ## Make sure next guess has not been guessed before
@@ -82,11 +90,14 @@ def test(numWeapons, numOpponents, answer=None, guesses=None, maxGuesses=None, n
             response = count_correct_weapons(answer, guess)
             if weaponSolver.learn(guess, response) == True:
                 break
+            check_knowledge(weaponSolver, answer)
             
             numGuesses += 1
 
+        check_knowledge(weaponSolver, answer)
+
         ## Check if correct combination has been found after all guesses
-        if len(weaponSolver.correctWeapons) != numOpponents:
+        if count_bits(weaponSolver.correctWeapons) != numOpponents:
             print("Ran out of guesses")
 
     print("Test Finished\n")
@@ -95,9 +106,8 @@ def test(numWeapons, numOpponents, answer=None, guesses=None, maxGuesses=None, n
 ## Print state after initialization]
 ##weaponSolver = weaponDeduction(10, 5)
 ##print("numWeapons: " + str(weaponSolver.numWeapons))
-##print("Correct Weapons: " + str(weaponSolver.correctWeapons))
-##print("Unknown Weapons: " + str(weaponSolver.unknownWeapons))
-##print("Weapon Lookup: " + str(weaponSolver.weaponLookup))
+##print("Correct Weapons: " + str(mask_to_combination(weaponSolver.correctWeapons)))
+##print("Unknown Weapons: " + str(mask_to_combination(weaponSolver.unknownWeapons)))
 ##print("Guesses: " + str(weaponSolver.guesses))
 ##print("Information: " + str(weaponSolver.information))
 
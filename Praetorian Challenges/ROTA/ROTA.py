@@ -1,119 +1,170 @@
 import requests
 import json
 import sys
-from gameState import GameState
 import time
+import argparse
+from random import choice
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from rotaPolicy import get_policy
 
 email = 'johnsmith@email.com'
-baseURL = 'http://rota.praetorian.com/rota/service/play.php?request='
-cookie = None
+baseURL = 'http://rota.praetorian.com/rota/service/play.php'
+
+## The challenge requires 50 games of 30 moves without losing
+numGames = 50
+movesPerGame = 30
+
+## Retries of a request that could not connect or was refused with 503, waiting backoffFactor * 2^n seconds between them
+numRetries = 3
+backoffFactor = 0.1
+requestTimeout = 10
 
 ## ----------------------------------------------------------------------
 ## Communication code
 
-def new_game():
-    global cookie
-    url = '{url}new&email={email}'
-    requestURL = url.format(url=baseURL, email=email)
-    r = requests.get(requestURL)
-    response = r.json()
-    cookie = r.cookies
-
-    if response['status'] == 'success':
-        return response['data']['board']
-
-    print("Error: \'new_game\'\n" + str(response))
-    sys.exit()
-
-def place(x):
-    global cookie
-    url = '{url}place&location={location}'
-    requestURL = url.format(url=baseURL, location=x)
-    r = requests.get(requestURL, cookies=cookie)
-    response = r.json()
-
-    if response['status'] == 'success':
-        return response['data']['board']
-
-    print("Error: \'place\'\n" + str(response))
-    sys.exit()
-
-def move(x, y):
-    global cookie
-    url = '{url}move&from={oldLocation}&to={newLocation}'
-    requestURL = url.format(url=baseURL, oldLocation=x, newLocation=y)
-    r = requests.get(requestURL, cookies=cookie)
-    response = r.json()
-
-    if response['status'] == 'success':
-        return response['data']['moves'], response['data']['board']
-
-    print("Error \'move\':\n" + str(response))
-    sys.exit()
-
-def status():
-    global cookie
-    url = '{url}status&email={email}'
-    requestURL = url.format(url=baseURL, email=email)
-    r = requests.get(requestURL, cookies=cookie)
-    response = r.json()
-
-    if response['status'] == 'success':
-        return response['data']
-
-    print("Error \'status\'\n" + str(response))
-    sys.exit()
-
-def next_game():
-    global cookie
-    url = '{url}next'
-    requestURL = url.format(url=baseURL)
-    r = requests.get(requestURL, cookies=cookie)
-    response = r.json()
-
-    if response['status'] == 'success':
-        if 'hash' in response['data']:
-            get_hash(response['data']['hash'])
-        else:
-            return response['data']['games_won'], response['data']['board']
-
-    print("Error \'next\'\n" + str(response))
-    sys.exit()
+## Client for the ROTA API
+## Every request goes through one requests.Session: the connection is kept alive between requests and the session keeps the game's cookie
+class RotaClient:
+    def __init__(self, email=email, url=baseURL, numRetries=numRetries, timeout=requestTimeout):
+        self.email = email
+        self.url = url
+        self.timeout = timeout
+
+        ## place and move are GETs that play a move, so only requests the server did not act on are retried: connection failures and 503 (unavailable)
+        ## A read error, 502 or 504 means the response was lost on the way back and the move may already have been played
+        retry = Retry(total=numRetries, connect=numRetries, read=0, status=numRetries, backoff_factor=backoffFactor, status_forcelist=(503, ))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        ## Seconds every request took from sending it to decoding the response
+        self.latencies = list()
+
+    ## Send a request and return the data of the response
+    def _get(self, request, params=None):
+        query = {'request': request}
+        query.update(params or dict())
+
+        start = time.perf_counter()
+        response = self.session.get(self.url, params=query, timeout=self.timeout).json()
+        self.latencies.append(time.perf_counter() - start)
+
+        if response['status'] == 'success':
+            return response['data']
+
+        print("Error \'{0}\'\n{1}".format(request, response))
+        sys.exit()
+
+    def new_game(self):
+        return self._get('new', {'email': self.email})['board']
+
+    def place(self, x):
+        return self._get('place', {'location': x})['board']
+
+    def move(self, x, y):
+        data = self._get('move', {'from': x, 'to': y})
+        return data['moves'], data['board']
+
+    def status(self):
+        return self._get('status', {'email': self.email})
+
+    ## Return the number of games won and the board of the next game, or the hash once every game is won
+    def next_game(self):
+        data = self._get('next')
+        if 'hash' in data:
+            return data['hash']
+
+        return data['games_won'], data['board']
+
+    def close(self):
+        self.session.close()
 
 def get_hash(hashString):
     print("Saving hash to " + email + "_hash.txt")
-    f = open(email + "_hash.txt","w")
-    f.write("Email: " + email +  "\nHash: " + hashString)
-    sys.exit()
+    with open(email + "_hash.txt", "w") as f:
+        f.write("Email: " + email + "\nHash: " + hashString)
 
 ##------------------------------------------------------------------------------------------
 ## Play the game
-    
-if __name__ == '__main__':
-    player = GameState()
-    state = new_game()
+
+## Return a best move for the board, from the move cache or else from the policy
+## Raise ValueError if neither has a move for the board, such as a finished game or a board the server should never send
+def next_move(state, moveCache, policy=None):
+    moves = moveCache.get(state)
+    if moves is None and policy is not None:
+        try:
+            moves = [policy.get_next_move(state)]
+        except (IndexError, KeyError):
+            moves = None
+
+    if not moves:
+        raise ValueError("No move for board " + repr(state))
+
+    return choice(moves)
+
+## Play games until the hash is received and return it
+## Every move is looked up in a move cache of every board the player can be asked to move on (see PolicyTable.move_cache()),
+## so a turn costs no more than its request. Each move depends on the computer's reply to the last one, so moves cannot be sent ahead
+## A board missing from the cache is looked up in policy, if there is one
+def play(client, moveCache, policy=None, verbose=True):
+    state = client.new_game()
     numMoves = 0
-    numGames = 0
+    gamesWon = 0
     startTime = time.time()
 
-    ## Play games until hash recieved (challenge requires 50 games)
     while True:
-        print('Game Number: {0}'.format(numGames))
-        print('Time Elapsed: {0:3f}'.format(time.time() - startTime))
+        if verbose:
+            print('Game Number: {0}'.format(gamesWon))
+            print('Time Elapsed: {0:3f}'.format(time.time() - startTime))
 
         ## Make moves until game is over (games requires you make 30 moves without losing.)
-        while numMoves < 30:
-    ##        print(str(state[0]) + str(state[1]) + str(state[2]))
-    ##        print(str(state[3]) + str(state[4]) + str(state[5]))
-    ##        print(str(state[6]) + str(state[7]) + str(state[8]))
-    ##        print('\n')
-            
-            moveInfo = player.get_next_move(state)
+        while numMoves < movesPerGame:
+            moveInfo = next_move(state, moveCache, policy)
 
             if len(moveInfo) == 1:
-                state = place(moveInfo[0])
+                state = client.place(moveInfo[0])
             else:
-                numMoves, state = move(moveInfo[0], moveInfo[1])
-        
-        numGames, state = next_game()
+                numMoves, state = client.move(moveInfo[0], moveInfo[1])
+
+        result = client.next_game()
+        if not isinstance(result, tuple):
+            return result
+
+        gamesWon, state = result
         numMoves = 0
+
+## Usage: python ROTA.py [--email johnsmith@email.com] [--url http://...] [--local]
+## --local plays against localServer.py in this process and prints the request latencies
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play the ROTA challenge')
+    parser.add_argument('--email', default=email)
+    parser.add_argument('--url', default=baseURL)
+    parser.add_argument('--local', action='store_true', help='play against a local mock server')
+    args = parser.parse_args()
+    email = args.email
+
+    policy = get_policy()
+    moveCache = policy.move_cache()
+
+    server = None
+    if args.local:
+        from localServer import start_local_server
+        server = start_local_server(numGames, movesPerGame)
+        args.url = server.url()
+
+    client = RotaClient(args.email, args.url)
+    startTime = time.time()
+    hashString = play(client, moveCache, policy, verbose=not args.local)
+    elapsed = time.time() - startTime
+    client.close()
+
+    if server is None:
+        get_hash(hashString)
+    else:
+        latencies = sorted(client.latencies)
+        print("Received hash {0} after {1} requests in {2:.3f}s over {3} connection(s)".format(hashString, len(latencies), elapsed, server.numConnections))
+        print("Request latency: mean {0:.3f}ms, median {1:.3f}ms, max {2:.3f}ms".format(
+            1000 * sum(latencies) / len(latencies), 1000 * latencies[len(latencies) // 2], 1000 * latencies[-1]))
+        server.shutdown()
@@ -0,0 +1,210 @@
+import sys
+import json
+import random
+import hashlib
+import threading
+from urllib.parse import urlsplit, parse_qs
+from socketserver import ThreadingMixIn
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from rotaSolver import RotaSolver, moveKinds, moveLocations, board_code, code_digits
+from rotaPolicy import PolicyTable, build_policy
+
+## Local stand-in for the ROTA API
+##
+## Serves play.php with the requests ROTA.py uses (new, place, move, status and next) so the client can be tested and benchmarked without the real server
+## Every email gets its own session cookie. The computer ('c') plays the solved policy with random best moves, so it never loses and never lets a game end early
+## A game is won once the player has made movesPerGame moves, the hash is sent after numGames games
+
+## Path of the API, the same as the real server
+apiPath = '/rota/service/play.php'
+
+cookieName = 'PHPSESSID'
+
+## One player's progress
+class RotaSession:
+    def __init__(self, email, rng):
+        self.email = email
+        self.token = hashlib.sha256((email + str(rng.random())).encode()).hexdigest()[:26]
+        self.lock = threading.Lock()
+        self.gamesWon = 0
+        self.board = None
+        self.moves = 0
+
+class RotaHandler(BaseHTTPRequestHandler):
+    ## Keep connections alive between requests like the real server
+    protocol_version = 'HTTP/1.1'
+
+    ## Headers and body are written separately, with Nagle's algorithm the body waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.numConnections += 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def _send(self, data, session=None, status='success'):
+        body = json.dumps({'status': status, 'data': data}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if session is not None:
+            self.send_header('Set-Cookie', '{0}={1}; path=/'.format(cookieName, session.token))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fail(self, message):
+        self._send({'message': message}, status='fail')
+
+    ## Return the session of the request's cookie, None if it has none
+    def _session(self):
+        for cookie in self.headers.get('Cookie', '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == cookieName:
+                return self.server.sessions.get(value)
+        return None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path != apiPath:
+            self._fail('Not found')
+            return
+
+        query = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        request = query.get('request')
+
+        if request == 'new':
+            session = self.server.new_session(query.get('email', ''))
+            with session.lock:
+                self.server.new_game(session)
+                self._send(self.server.game_data(session), session)
+            return
+
+        session = self._session()
+        if session is None:
+            self._fail('No game in progress')
+            return
+
+        with session.lock:
+            if request == 'place':
+                self._play(session, (query.get('location'), ))
+            elif request == 'move':
+                self._play(session, (query.get('from'), query.get('to')))
+            elif request == 'status':
+                self._send(self.server.game_data(session))
+            elif request == 'next':
+                if session.board is None or session.moves < self.server.movesPerGame:
+                    self._fail('Game is not over')
+                    return
+
+                session.gamesWon += 1
+                if session.gamesWon >= self.server.numGames:
+                    session.board = None
+                    self._send({'hash': hashlib.sha256(('hash' + session.email).encode()).hexdigest()})
+                else:
+                    self.server.new_game(session)
+                    self._send(self.server.game_data(session))
+            else:
+                self._fail('Unknown request')
+
+    ## Make the player's move and the computer's reply
+    def _play(self, session, locations):
+        if session.board is None or session.moves >= self.server.movesPerGame:
+            self._fail('Game is over')
+            return
+
+        try:
+            move = tuple(int(location) for location in locations)
+        except (TypeError, ValueError):
+            self._fail('Invalid location')
+            return
+
+        if move not in self.server.legal_moves(session.board, 1):
+            self._fail('Illegal move')
+            return
+
+        session.board = self.server.apply_move(session.board, move, 'p')
+        session.moves += 1
+
+        ## A computer that has lost ends the game as won at once
+        if self.server.lost(session.board, -1):
+            session.moves = self.server.movesPerGame
+        else:
+            session.board = self.server.apply_move(session.board, self.server.computer.get_next_move(session.board, -1), 'c')
+            if self.server.lost(session.board, 1):
+                session.board = None
+                self._fail('You lost')
+                return
+
+        self._send(self.server.game_data(session))
+
+class RotaServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, numGames=50, movesPerGame=30, mode='random', seed=None, verbose=False):
+        HTTPServer.__init__(self, address, RotaHandler)
+        self.numGames = numGames
+        self.movesPerGame = movesPerGame
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.sessions = dict()
+        self.numConnections = 0
+
+        self.solver = RotaSolver()
+        self.computer = PolicyTable(build_policy(self.solver, mode))
+
+    ## URL clients connect to
+    def url(self):
+        return 'http://{0}:{1}{2}'.format(self.server_address[0], self.server_address[1], apiPath)
+
+    def new_session(self, email):
+        with self.lock:
+            session = RotaSession(email, self.rng)
+            self.sessions[session.token] = session
+        return session
+
+    ## Start a game, the computer moves first in a random half of the games
+    def new_game(self, session):
+        session.board = '-' * 9
+        session.moves = 0
+        if self.rng.random() < 0.5:
+            session.board = self.apply_move(session.board, self.computer.get_next_move(session.board, -1), 'c')
+
+    def game_data(self, session):
+        return {'board': session.board, 'moves': session.moves, 'games_won': session.gamesWon}
+
+    ## Return the set of server moves of 'player' (1 is 'p', -1 is 'c') on a board string
+    def legal_moves(self, board, player):
+        digits = code_digits([board_code(board, player)])[0]
+        return {moveLocations[moveKinds.index((fromCell, toCell))] for fromCell, toCell, _ in self.solver.moves(digits)}
+
+    ## Return True if 'player' to move on a board string has lost: the other player has three-in-a-row or 'player' cannot move
+    def lost(self, board, player):
+        digits = code_digits([board_code(board, player)])[0]
+        return bool(self.solver.lost[self.solver.state(digits)]) or not self.solver.moves(digits)
+
+    def apply_move(self, board, move, char):
+        board = list(board)
+        if len(move) == 2:
+            board[move[0] - 1] = '-'
+        board[move[-1] - 1] = char
+        return ''.join(board)
+
+## Start a RotaServer in a background thread on a free port (port 0) or the given port
+## Return the server, stop it with server.shutdown()
+def start_local_server(numGames=50, movesPerGame=30, port=0, seed=None, verbose=False):
+    server = RotaServer(('127.0.0.1', port), numGames, movesPerGame, seed=seed, verbose=verbose)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+## Usage: python localServer.py [port]
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = RotaServer(('127.0.0.1', port), verbose=True)
+    print("Serving the ROTA API on " + server.url())
+    server.serve_forever()
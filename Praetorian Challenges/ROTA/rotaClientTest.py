@@ -0,0 +1,61 @@
+import sys
+import hashlib
+from rotaPolicy import get_policy
+from localServer import start_local_server
+from ROTA import RotaClient, play, next_move
+
+## Check the move cache of both players against PolicyTable.get_next_move() on every board in it
+def test_move_cache():
+    table = get_policy()
+    for player in (1, -1):
+        for charState, moves in table.move_cache(player).items():
+            if not moves or any(table.get_next_move(charState, player) not in moves for _ in range(4)):
+                print("move_cache() does not match get_next_move(): " + charState)
+                sys.exit()
+
+    print("test_move_cache() passed")
+
+## A board missing from the move cache falls back to the policy, a board with no move at all raises ValueError
+def test_next_move():
+    table = get_policy()
+    moveCache = table.move_cache()
+    charState = next(iter(moveCache))
+    move = next_move(charState, dict(), table)
+    if move not in moveCache[charState]:
+        print("next_move() did not fall back to the policy: " + charState)
+        sys.exit()
+
+    for board in ('ppp------', 'xxxxxxxxx'):
+        try:
+            next_move(board, moveCache, table)
+        except ValueError:
+            continue
+        print("next_move() did not raise ValueError: " + board)
+        sys.exit()
+
+    print("test_next_move() passed")
+
+## Play every game against a local server over one kept-alive connection, the session cookie has to carry the game between requests
+def test_client(numGames=5, movesPerGame=30):
+    server = start_local_server(numGames, movesPerGame, seed=0)
+    client = RotaClient('test@email.com', server.url())
+
+    hashString = play(client, get_policy().move_cache(), verbose=False)
+    if hashString != hashlib.sha256(b'hashtest@email.com').hexdigest():
+        print("play() did not receive the hash: " + str(hashString))
+        sys.exit()
+    if server.numConnections != 1:
+        print("RotaClient opened " + str(server.numConnections) + " connections")
+        sys.exit()
+    if len(client.latencies) != 1 + numGames * (movesPerGame + 1):
+        print("play() sent " + str(len(client.latencies)) + " requests")
+        sys.exit()
+
+    client.close()
+    server.shutdown()
+    print("test_client() passed")
+
+if __name__ == '__main__':
+    test_move_cache()
+    test_next_move()
+    test_client()
@@ -0,0 +1,175 @@
+import os
+import argparse
+import mmap
+import time
+import numpy as np
+from random import choice
+from rotaSolver import RotaSolver, symmetries, moveKinds, moveModes, defaultMoveMode, numCodes, numCells, powers, locationCells, moveLocations, board_code, code_digits, inverse_moves
+
+## Solved ROTA policy in a flat binary file
+##
+## Building the RotaSolver is a separate step (python rotaPolicy.py) that writes the best moves of every canonical state for one move mode and the tables needed to
+## find the canonical state of any board. Players memory-map the file, so startup reads no more than a header
+## and every process that maps the same file shares one copy of it in the page cache
+##
+## File format: a 32 byte header (magic, section sizes, index of the move mode in moveModes) followed by every section in the order of 'sections', each one aligned to 8 bytes
+## stateIndex[code]     state of every position code seen by the player to move (-1 for impossible positions)
+## symmetryIndex[code]  symmetry that maps the position to its canonical position (see RotaSolver)
+## symmetries           the 16 symmetries as cell permutations
+## moveKinds            every kind of move as (fromCell, toCell), fromCell is -1 for a placement
+## values               WIN, DRAW or LOSS for the player to move of every state
+## distances            number of moves left in every state with best play, 0 for a draw
+## policyOffsets        the best moves of state s are policyMoves[policyOffsets[s]:policyOffsets[s + 1]]
+## policyMoves          best moves as indices into moveKinds, in the cells of the canonical position
+
+## Default location of the policy file
+policyFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rotaPolicy.bin')
+
+magic = b'ROTAPOL2'
+headerSize = 32
+
+## Return the (name, dtype, length) of every section of a file with numStates states and numMoves best moves
+def sections(numStates, numMoves):
+    return [
+        ('stateIndex', np.int16, numCodes),
+        ('symmetryIndex', np.int8, numCodes),
+        ('symmetries', np.int8, len(symmetries) * numCells),
+        ('moveKinds', np.int8, len(moveKinds) * 2),
+        ('values', np.int8, numStates),
+        ('distances', np.int16, numStates),
+        ('policyOffsets', np.int32, numStates + 1),
+        ('policyMoves', np.uint8, numMoves),
+    ]
+
+## Return the byte offset of every section
+def section_offsets(numStates, numMoves):
+    offsets = list()
+    offset = headerSize
+    for name, dtype, length in sections(numStates, numMoves):
+        offsets.append(offset)
+        offset += -(-length * np.dtype(dtype).itemsize // 8) * 8
+
+    return offsets
+
+## Return the arrays of a policy file for a solved RotaSolver, with the best moves of the move mode
+def build_policy(solver, mode=defaultMoveMode):
+    moveIndex = {move: index for index, move in enumerate(moveKinds)}
+    policy = solver.policy(mode)
+
+    arrays = {
+        'stateIndex': solver.stateIndex,
+        'symmetryIndex': solver.symmetryIndex,
+        'symmetries': symmetries.ravel(),
+        'moveKinds': np.array(moveKinds, dtype=np.int8).ravel(),
+        'values': solver.values,
+        'distances': solver.distances,
+        'policyOffsets': np.cumsum([0] + [len(moves) for moves in policy]),
+        'policyMoves': np.array([moveIndex[move] for moves in policy for move in moves], dtype=np.uint8),
+        'mode': mode,
+    }
+
+    return arrays
+
+## Write the arrays of build_policy() to path
+def save_policy(arrays, path=policyFile):
+    numStates, numMoves = len(arrays['values']), len(arrays['policyMoves'])
+
+    with open(path, 'wb') as f:
+        f.write(magic + np.array([numStates, numMoves, numCodes, moveModes.index(arrays['mode'])], dtype='<i4').tobytes())
+        for (name, dtype, length), offset in zip(sections(numStates, numMoves), section_offsets(numStates, numMoves)):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(np.ascontiguousarray(arrays[name], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+
+## Best moves of every position, read from a memory-mapped policy file or from arrays in memory
+class PolicyTable:
+    def __init__(self, arrays):
+        self.stateIndex = arrays['stateIndex']
+        self.symmetryIndex = arrays['symmetryIndex']
+        self.symmetries = arrays['symmetries'].reshape(-1, numCells)
+        self.moveKinds = arrays['moveKinds'].reshape(-1, 2)
+        self.values = arrays['values']
+        self.distances = arrays['distances']
+        self.mode = arrays['mode']
+        self.policyOffsets = arrays['policyOffsets']
+        self.policyMoves = arrays['policyMoves']
+
+        ## Move kind on the board of every canonical move kind, for every symmetry, as an array for batches of codes (see selfPlay.py) and as lists
+        self.inverseMoveTable = inverse_moves(self.symmetries, self.moveKinds)
+        self.inverseMoves = self.inverseMoveTable.tolist()
+
+        ## Indexing a memoryview gives python ints, which is much faster than indexing a numpy array one element at a time
+        ## The file is little-endian, like every machine this runs on, so the views are cast to the native formats
+        self._stateIndex = memoryview(self.stateIndex).cast('B').cast('h')
+        self._symmetryIndex = memoryview(self.symmetryIndex).cast('B').cast('b')
+        self._policyOffsets = memoryview(np.ascontiguousarray(self.policyOffsets, dtype=np.int32)).cast('B').cast('i')
+        self._policyMoves = memoryview(self.policyMoves).cast('B')
+
+    ## Map a policy file, the arrays are read-only views of the mapping
+    @staticmethod
+    def load(path=policyFile):
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if mapping[:len(magic)] != magic:
+            raise ValueError("Not a ROTA policy file: " + path)
+
+        numStates, numMoves, fileCodes, modeIndex = np.frombuffer(mapping, dtype='<i4', count=4, offset=len(magic)).tolist()
+        if fileCodes != numCodes:
+            raise ValueError("ROTA policy file has the wrong number of codes: " + path)
+
+        arrays = {'mode': moveModes[modeIndex]}
+        for (name, dtype, length), offset in zip(sections(numStates, numMoves), section_offsets(numStates, numMoves)):
+            arrays[name] = np.frombuffer(mapping, dtype=np.dtype(dtype).newbyteorder('<'), count=length, offset=offset)
+
+        table = PolicyTable(arrays)
+        table.mapping = mapping
+        return table
+
+    ## Return the best moves of the position with this code (seen by the player to move) as move kinds on the board
+    ## A few table lookups: the state and symmetry of the code, the canonical moves of the state and the inverse move table of the symmetry
+    def best_move_kinds(self, code):
+        state = self._stateIndex[code]
+        inverseMoves = self.inverseMoves[self._symmetryIndex[code]]
+        return [inverseMoves[kind] for kind in self._policyMoves[self._policyOffsets[state]:self._policyOffsets[state + 1]]]
+
+    ## Return the best moves of a position given as an (9,) digit array from the point of view of the player to move, as (fromCell, toCell) pairs
+    def best_moves(self, digits):
+        return [tuple(self.moveKinds[kind].tolist()) for kind in self.best_move_kinds(int(digits.astype(np.int32) @ powers))]
+
+    ## Same interface as GameState.get_next_move()
+    def get_next_move(self, charState, player=1):
+        return moveLocations[choice(self.best_move_kinds(board_code(charState, player)))]
+
+    ## Return the best server moves of every board string the player can be asked to move on ('p' is player 1, 'c' is player -1)
+    ## A turn is then one dict lookup and a random choice, see ROTA.py
+    def move_cache(self, player=1):
+        chars = {1: ('-', 'p', 'c'), -1: ('-', 'c', 'p')}[player]
+        codes = np.flatnonzero(np.asarray(self.stateIndex) >= 0)
+        states = np.asarray(self.stateIndex)[codes]
+        codes = codes[np.diff(np.asarray(self.policyOffsets))[states] > 0]
+
+        cache = dict()
+        for code, digits in zip(codes.tolist(), code_digits(codes).tolist()):
+            charState = ''.join(chars[digits[cell]] for cell in locationCells)
+            cache[charState] = [moveLocations[kind] for kind in self.best_move_kinds(code)]
+
+        return cache
+
+## Return the PolicyTable in path if the file exists, otherwise solve the game in this process with the default move mode
+def get_policy(path=policyFile):
+    if os.path.exists(path):
+        return PolicyTable.load(path)
+
+    return PolicyTable(build_policy(RotaSolver()))
+
+## Usage: python rotaPolicy.py [--mode fastest] [--output rotaPolicy.bin]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve ROTA and save the policy')
+    parser.add_argument('--mode', choices=moveModes, default=defaultMoveMode, help='how moves with the same value are chosen (see rotaSolver.py)')
+    parser.add_argument('--output', default=policyFile)
+    args = parser.parse_args()
+
+    startTime = time.time()
+    arrays = build_policy(RotaSolver(), args.mode)
+    save_policy(arrays, args.output)
+    print("Saved the {0} policy of {1} states ({2} bytes) to {3} in {4:.3f}s".format(args.mode, len(arrays['values']), os.path.getsize(args.output), args.output, time.time() - startTime))
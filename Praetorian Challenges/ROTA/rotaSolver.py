@@ -0,0 +1,268 @@
+import numpy as np
+from random import choice
+
+## Retrograde analysis of ROTA over a dense table of positions
+##
+## Cells 0-7 are the ring, in the same order as BoardState.state, and cell 8 is the center
+##
+## 0 1 2
+## 7 8 3
+## 6 5 4
+##
+## A position is stored from the point of view of the player to move: digit 1 is a piece of the player to move, 2 a piece of the opponent, 0 is empty
+## and the position is the base-3 number code = sum(digit[cell] * 3**cell). Every code is below 3**9, so tables indexed by code are a few kilobytes
+## Swapping digits 1 and 2 gives the same position from the opponent's point of view, which is how the turn passes to the other player
+##
+## The ring can be rotated by any number of cells and reflected without changing the game (the 16 symmetries of the ring),
+## so every position is represented by its canonical code: the smallest code of its 16 images
+## Canonical positions are numbered in code order (their state id) and the moves between them are stored as CSR successor arrays
+##
+## Every state is solved by retrograde analysis: a state whose opponent has three-in-a-row is lost, a state with a move to a lost state is won,
+## a state whose moves all lead to won states is lost and every state that is never decided is a draw
+## States are decided in order of their distance to the end of the game, so the layer a state is decided in is its distance:
+## the number of moves left if the winner wins as fast as possible and the loser delays the loss as long as possible
+
+## Values of a state for the player to move
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+numCells = 9
+centerCell = 8
+numCodes = 3 ** numCells
+
+## Place value of every cell
+powers = 3 ** np.arange(numCells, dtype=np.int32)
+
+## Three-in-a-row: three neighbouring cells of the ring or two opposite cells of the ring through the center
+lines = [(i, (i + 1) % 8, (i + 2) % 8) for i in range(8)] + [(i, centerCell, i + 4) for i in range(4)]
+
+## Every kind of move as (fromCell, toCell), fromCell is -1 for placing a new piece
+## Ring pieces move to a neighbouring ring cell or to the center, the center piece moves to any ring cell
+placements = [(-1, cell) for cell in range(numCells)]
+movements = [(i, (i + step) % 8) for i in range(8) for step in (1, -1)] + [(i, centerCell) for i in range(8)] + [(centerCell, i) for i in range(8)]
+moveKinds = placements + movements
+
+## Number of pieces every player places before pieces move
+numPieces = 3
+
+## How best_moves() chooses between moves with the same value
+## 'fastest': win in the fewest moves, delay a loss as long as possible, any draw
+## 'trap':    same as 'fastest', but prefer the draws that leave the opponent the largest share of losing replies
+## 'random':  any move with the best value (what GameState did)
+## Against an opponent that can make mistakes 'trap' ends games soonest, against a perfect opponent every mode draws
+moveModes = ('fastest', 'trap', 'random')
+defaultMoveMode = 'trap'
+
+## Cell of every server location (1-9, row by row) and the server location of every cell
+locationCells = [0, 1, 2, 7, 8, 3, 6, 5, 4]
+cellLocations = [locationCells.index(cell) + 1 for cell in range(numCells)]
+
+## Server move of every kind of move: (location, ) for a placement, (fromLocation, toLocation) for a movement
+moveLocations = [(cellLocations[toCell], ) if fromCell < 0 else (cellLocations[fromCell], cellLocations[toCell]) for fromCell, toCell in moveKinds]
+
+## codeValues[player][location][char]: what the character at a server location adds to the code of the board seen by 'player' (1 is 'p', -1 is 'c')
+codeValues = {player: [{mine: 3 ** cell, theirs: 2 * 3 ** cell, '-': 0} for cell in locationCells] for player, mine, theirs in ((1, 'p', 'c'), (-1, 'c', 'p'))}
+
+## The 16 symmetries of the ring as cell permutations: image[cell] = position[symmetry[cell]]
+## Rotations by 0-7 cells and the same rotations after a reflection, the center never moves
+symmetries = np.array([[(cell - r) % 8 for cell in range(8)] + [centerCell] for r in range(8)] +
+                      [[(r - cell) % 8 for cell in range(8)] + [centerCell] for r in range(8)], dtype=np.int8)
+
+## Return an (N, 9) int8 array with the digit of every cell of every code
+def code_digits(codes):
+    return (np.asarray(codes, dtype=np.int32)[:, None] // powers % 3).astype(np.int8)
+
+## Return the code of every row of an (N, 9) digit array
+def digits_code(digits):
+    return digits.astype(np.int32) @ powers
+
+## Return the code of a server board (9 characters row by row, 'p' for player 1, 'c' for player -1 and '-' for empty) seen by 'player'
+## Nine lookups and additions of python ints
+def board_code(charState, player=1):
+    values = codeValues[player]
+    return sum(values[location][char] for location, char in enumerate(charState))
+
+## Return the (len(symmetries), len(kinds)) table of the move kind on the board of every move kind on the canonical position
+## Cell c of the canonical position is cell symmetry[c] of the board, so inverseMoves[symmetryIndex[code]][kind] translates a canonical move in one lookup
+def inverse_moves(symmetries, kinds):
+    kindIndex = {(int(fromCell), int(toCell)): index for index, (fromCell, toCell) in enumerate(kinds)}
+    return np.array([[kindIndex[(-1 if fromCell < 0 else int(symmetry[fromCell]), int(symmetry[toCell]))] for fromCell, toCell in kinds] for symmetry in symmetries], dtype=np.uint8)
+
+## Return the code of every position from the opponent's point of view (digits 1 and 2 swapped), indexed by code
+def swap_table():
+    return digits_code((3 - code_digits(np.arange(numCodes))) % 3).astype(np.int16)
+
+## Return a boolean array, True for every row of an (N, 9) digit array in which 'digit' has three-in-a-row
+def has_line(digits, digit):
+    found = np.zeros(len(digits), dtype=bool)
+    for line in lines:
+        found |= (digits[:, line] == digit).all(axis=1)
+    return found
+
+class RotaSolver:
+    def __init__(self):
+        digits = code_digits(np.arange(numCodes))
+
+        ## The same position from the opponent's point of view
+        self.swapCode = swap_table()
+
+        ## Positions that can happen with this player to move: both players placed the same number of pieces or the opponent placed one more,
+        ## and the player to move does not have three-in-a-row (the game would already be over)
+        mover, opponent = (digits == 1).sum(axis=1), (digits == 2).sum(axis=1)
+        valid = ((opponent == mover) | (opponent == mover + 1)) & (opponent <= numPieces) & ~has_line(digits, 1)
+
+        ## Smallest code of the 16 images of every code and the symmetry that gives it
+        ## Cell c of the canonical image is cell symmetries[symmetryIndex[code]][c] of the position
+        images = np.array([digits_code(digits[:, symmetry]) for symmetry in symmetries])
+        self.symmetryIndex = np.argmin(images, axis=0).astype(np.int8)
+        canonical = images[self.symmetryIndex, np.arange(numCodes)]
+
+        ## codes[state] is the canonical code of a state, stateIndex[code] is the state of any code (-1 for impossible positions)
+        self.codes = np.unique(canonical[valid]).astype(np.int16)
+        self.stateIndex = np.full(numCodes, -1, dtype=np.int16)
+        self.stateIndex[valid] = np.searchsorted(self.codes, canonical[valid])
+        self.numStates = len(self.codes)
+
+        self._connect_states()
+        self._solve()
+
+    ## Build the CSR successor arrays: the successors of state s are successors[offsets[s]:offsets[s + 1]]
+    ## A lost state (the opponent has three-in-a-row) has no successors
+    def _connect_states(self):
+        codes = self.codes.astype(np.int32)
+        digits = code_digits(codes)
+        self.lost = has_line(digits, 2)
+        placing = (digits == 1).sum(axis=1) < numPieces
+
+        sources = list()
+        targets = list()
+        for fromCell, toCell in moveKinds:
+            legal = (digits[:, toCell] == 0) & ~self.lost
+            nextCodes = codes + powers[toCell]
+            if fromCell < 0:
+                legal &= placing
+            else:
+                legal &= ~placing & (digits[:, fromCell] == 1)
+                nextCodes = nextCodes - powers[fromCell]
+
+            states = np.flatnonzero(legal)
+            sources.append(states)
+            targets.append(self.stateIndex[self.swapCode[nextCodes[states]]])
+
+        ## Moves that lead to the same state once canonicalized are one edge
+        edges = np.unique(np.concatenate(sources).astype(np.int32) * self.numStates + np.concatenate(targets))
+        sources, targets = edges // self.numStates, edges % self.numStates
+
+        self.offsets = np.zeros(self.numStates + 1, dtype=np.int32)
+        self.offsets[1:] = np.cumsum(np.bincount(sources, minlength=self.numStates))
+        self.successors = targets.astype(np.int16)
+
+        ## Predecessors in the same layout, used by the retrograde analysis
+        order = np.argsort(targets, kind='stable')
+        self.predecessorOffsets = np.zeros(self.numStates + 1, dtype=np.int32)
+        self.predecessorOffsets[1:] = np.cumsum(np.bincount(targets, minlength=self.numStates))
+        self.predecessors = sources[order].astype(np.int16)
+
+    ## Return the predecessors of every state in 'states' as one array
+    def _predecessors_of(self, states):
+        if len(states) == 0:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate([self.predecessors[self.predecessorOffsets[state]:self.predecessorOffsets[state + 1]] for state in states.tolist()])
+
+    ## Retrograde analysis, one layer of newly decided states at a time
+    ## A state with no moves left (every piece blocked) is lost like a state whose opponent has three-in-a-row
+    ## Lost states of layer k are 2k moves from the end and the states won by moving to them are 2k + 1 moves from the end
+    ## A state is lost when its last undecided move is decided, which is its longest way to lose
+    def _solve(self):
+        self.values = np.zeros(self.numStates, dtype=np.int8)
+        self.distances = np.zeros(self.numStates, dtype=np.int16)
+        undecidedMoves = np.diff(self.offsets)
+
+        lost = np.flatnonzero(self.lost | (undecidedMoves == 0))
+        self.values[lost] = LOSS
+        distance = 0
+        while len(lost):
+            ## Every state with a move to a lost state is won
+            won = self._predecessors_of(lost)
+            won = np.unique(won[self.values[won] == DRAW])
+            self.values[won] = WIN
+            self.distances[won] = distance + 1
+
+            ## A state is lost once every one of its moves leads to a won state
+            previous = self._predecessors_of(won)
+            previous = previous[self.values[previous] == DRAW]
+            np.subtract.at(undecidedMoves, previous, 1)
+            lost = np.unique(previous[undecidedMoves[previous] == 0])
+            self.values[lost] = LOSS
+            self.distances[lost] = distance + 2
+            distance += 2
+
+        ## Share of the moves of every state that lead to a state its opponent wins, the chance a random reply loses a drawn game
+        ## Moves that lead to the same canonical state count once
+        moveSources = np.repeat(np.arange(self.numStates), np.diff(self.offsets))
+        losingReplies = np.bincount(moveSources, weights=self.values[self.successors] == WIN, minlength=self.numStates)
+        self.trapScores = losingReplies / np.maximum(np.diff(self.offsets), 1)
+
+    ## Return the state of a position given as an (9,) digit array from the point of view of the player to move
+    def state(self, digits):
+        return int(self.stateIndex[int(digits_code(digits[None])[0])])
+
+    ## Return every legal move of a position as (fromCell, toCell, code of the position after the move from the opponent's point of view)
+    def moves(self, digits):
+        placing = (digits == 1).sum() < numPieces
+        code = int(digits_code(digits[None])[0])
+
+        moves = list()
+        for fromCell, toCell in moveKinds:
+            if digits[toCell] != 0 or (fromCell < 0) != placing or (fromCell >= 0 and digits[fromCell] != 1):
+                continue
+
+            nextCode = code + int(powers[toCell]) - (int(powers[fromCell]) if fromCell >= 0 else 0)
+            moves.append((fromCell, toCell, int(self.swapCode[nextCode])))
+
+        return moves
+
+    ## Return how good a move to 'state' (seen by the opponent) is for the player making it, the higher the better
+    def _move_rank(self, state, mode):
+        value, distance = -int(self.values[state]), int(self.distances[state])
+        if mode == 'random':
+            return (value, 0)
+        if value == WIN:
+            return (value, -distance)
+        if value == LOSS:
+            return (value, distance)
+        if mode == 'trap':
+            return (value, float(self.trapScores[state]))
+
+        return (value, 0)
+
+    ## Return the best moves of a position: moves to states the opponent loses, otherwise moves to draws, otherwise every move
+    ## Moves with the same value are ranked by mode (see moveModes)
+    def best_moves(self, digits, mode=defaultMoveMode):
+        moves = self.moves(digits)
+        if not moves:
+            return moves
+
+        ranks = [self._move_rank(self.stateIndex[nextCode], mode) for _, _, nextCode in moves]
+        best = max(ranks)
+        return [move for move, rank in zip(moves, ranks) if rank == best]
+
+    ## Return the best moves of every state as (fromCell, toCell) pairs of its canonical position
+    def policy(self, mode=defaultMoveMode):
+        return [[(fromCell, toCell) for fromCell, toCell, _ in self.best_moves(digits, mode)] for digits in code_digits(self.codes)]
+
+    ## Return the number of moves left in a position for the player to move if both players play best, 0 for a draw
+    def distance(self, digits):
+        return int(self.distances[self.state(digits)])
+
+    ## Return the value of a position for the player to move (WIN, DRAW or LOSS)
+    def value(self, digits):
+        return int(self.values[self.state(digits)])
+
+    ## Same interface as GameState.get_next_move()
+    ## charState is the server board (9 characters row by row, 'p' for player 1, 'c' for player -1 and '-' for empty)
+    ## Return (location, ) to place a piece or (fromLocation, toLocation) to move a piece, as server locations
+    def get_next_move(self, charState, player=1, mode=defaultMoveMode):
+        fromCell, toCell, _ = choice(self.best_moves(code_digits([board_code(charState, player)])[0], mode))
+        return moveLocations[moveKinds.index((fromCell, toCell))]
@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from random import choice
+from rotaSolver import *
+from rotaPolicy import PolicyTable, build_policy, save_policy
+from selfPlay import self_play, random_moves, policy_moves
+
+## Check the retrograde analysis: every value and distance has to follow from the values and distances of the state's successors
+## A won state has a move to a lost state, a lost state has no moves or only moves to won states and every other state is a draw
+## A won state is one move further from the end than its closest lost successor and a lost state one move further than its furthest successor
+def test_values(solver):
+    for state in range(solver.numStates):
+        successors = solver.successors[solver.offsets[state]:solver.offsets[state + 1]]
+        successorValues = solver.values[successors]
+
+        if solver.lost[state] or len(successorValues) == 0:
+            expected = (LOSS, 0)
+        elif (successorValues == LOSS).any():
+            expected = (WIN, 1 + solver.distances[successors[successorValues == LOSS]].min())
+        elif (successorValues == WIN).all():
+            expected = (LOSS, 1 + solver.distances[successors].max())
+        else:
+            expected = (DRAW, 0)
+
+        if (solver.values[state], solver.distances[state]) != expected:
+            print("Wrong value for state " + str(state) + " (code " + str(solver.codes[state]) + ")")
+            sys.exit()
+
+    if solver.value(np.zeros(numCells, dtype=np.int8)) != DRAW:
+        print("The empty board is not a draw")
+        sys.exit()
+
+    print("test_values() passed")
+
+## Return the server board after a move by the player with character 'char'
+def apply_move(charState, move, char):
+    charState = list(charState)
+    if len(move) == 2:
+        charState[move[0] - 1] = '-'
+    charState[move[-1] - 1] = char
+    return charState
+
+## Return the digits of a server board from the point of view of 'char'
+def board_digits(charState, char):
+    digits = np.zeros(numCells, dtype=np.int8)
+    for location, other in enumerate(charState):
+        if other != '-':
+            digits[locationCells[location]] = 1 if other == char else 2
+    return digits
+
+## Play the solver ('p') against an opponent ('c') that moves at random
+## The solver must never lose and must never let a drawn or won position slip
+def test_random_opponent(solver, numGames=200, numMoves=60):
+    for _ in range(numGames):
+        charState = list('---------')
+        player = choice(('p', 'c'))
+
+        for _ in range(numMoves):
+            digits = board_digits(charState, player)
+            if solver.lost[solver.state(digits)]:
+                if player == 'p':
+                    print("Solver lost: " + ''.join(charState))
+                    sys.exit()
+                break
+
+            if player == 'p':
+                before = solver.value(digits)
+                move = solver.get_next_move(charState, 1)
+                charState = apply_move(charState, move, 'p')
+                if -solver.value(board_digits(charState, 'c')) < before:
+                    print("Solver made a worse move: " + ''.join(charState))
+                    sys.exit()
+            else:
+                fromCell, toCell, _ = choice(solver.moves(digits))
+                charState = apply_move(charState, (cellLocations[toCell], ) if fromCell < 0 else (cellLocations[fromCell], cellLocations[toCell]), 'c')
+
+            player = 'c' if player == 'p' else 'p'
+
+    print("test_random_opponent() passed")
+
+## Save the policy of a solver, map it back and check that it gives the same best moves as the solver for every position
+def test_policy(solver):
+    path = os.path.join(tempfile.mkdtemp(), 'rotaPolicy.bin')
+    for mode in moveModes:
+        save_policy(build_policy(solver, mode), path)
+
+        start = time.perf_counter()
+        table = PolicyTable.load(path)
+        loadTime = time.perf_counter() - start
+
+        if table.mode != mode:
+            print("Policy file lost its move mode")
+            sys.exit()
+
+        check_policy(solver, table)
+
+        if not np.array_equal(table.values, solver.values) or not np.array_equal(table.distances, solver.distances):
+            print("Policy values differ from the solver")
+            sys.exit()
+
+        del table
+
+    os.remove(path)
+    print("test_policy() passed (mapped in {0:.4f}s)".format(loadTime))
+
+## Check that a PolicyTable gives the same best moves as the solver for every position, as digits and as server boards
+def check_policy(solver, table):
+    for code in np.flatnonzero(solver.stateIndex >= 0).tolist():
+        digits = code_digits([code])[0]
+        expected = set((fromCell, toCell) for fromCell, toCell, _ in solver.best_moves(digits, table.mode))
+        if set(table.best_moves(digits)) != expected:
+            print("Policy moves differ from the solver for code " + str(code))
+            sys.exit()
+
+        ## The same position as a server board seen by either player
+        for player, mine, theirs in ((1, 'p', 'c'), (-1, 'c', 'p')):
+            charState = [{0: '-', 1: mine, 2: theirs}[int(digits[locationCells[location]])] for location in range(numCells)]
+            if board_code(charState, player) != code or table.get_next_move(charState, player) not in [moveLocations[moveKinds.index(move)] for move in expected]:
+                print("Policy move on the server board differs from the solver for code " + str(code))
+                sys.exit()
+
+## Play batches of games between every policy and a random player and between every pair of policies, no policy may lose a game
+## The batched moves of both kinds of players are checked against RotaSolver.moves() on every reachable position
+def test_self_play(solver, numGames=2000, numMoves=100):
+    tables = {mode: PolicyTable(build_policy(solver, mode)) for mode in moveModes}
+    rng = np.random.RandomState(0)
+
+    codes = np.array([code for code in range(numCodes) if solver.stateIndex[code] >= 0 and not solver.lost[solver.stateIndex[code]]])
+    for mode, table in tables.items():
+        for kinds in (random_moves(table, codes, rng), policy_moves(table, codes, rng)):
+            for code, kind in zip(codes.tolist(), kinds.tolist()):
+                fromCell, toCell = moveKinds[kind]
+                if (fromCell, toCell) not in [move[:2] for move in solver.moves(code_digits(np.array([code]))[0])]:
+                    print("Batched move is not legal: " + str((code, fromCell, toCell)))
+                    sys.exit()
+
+    for mode, table in tables.items():
+        for opponent in [None] + list(tables.values()):
+            results = self_play([table, opponent], numGames, numMoves, seed=0)
+            if results['losses'][0] or (opponent is not None and results['losses'][1]):
+                print("Policy lost a self-play game: " + mode)
+                sys.exit()
+            if opponent is None and results['unfinished']:
+                print("Policy did not beat a random player: " + mode)
+                sys.exit()
+
+    print("test_self_play() passed")
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    solver = RotaSolver()
+    print("Solved {0} states in {1:.3f}s".format(solver.numStates, time.perf_counter() - start))
+
+    test_values(solver)
+    test_random_opponent(solver)
+    test_policy(solver)
+    test_self_play(solver)
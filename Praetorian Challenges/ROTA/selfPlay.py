@@ -0,0 +1,120 @@
+import time
+import argparse
+import numpy as np
+from rotaSolver import RotaSolver, moveModes, defaultMoveMode, numPieces, powers, code_digits, swap_table, LOSS
+from rotaPolicy import PolicyTable, build_policy, get_policy
+
+## Batched ROTA self-play
+##
+## Thousands of games are played in lockstep: every game is the code of its board seen by the player to move (see rotaSolver.py),
+## so a turn of every game is a handful of NumPy gathers: the state and symmetry of every code, a random best move of every state,
+## the move on the board through the inverse move table and the new code through the swap table
+## A player is a PolicyTable or None for a player that makes random legal moves
+## A policy table also gives the rules: a state that is lost with 0 moves left is over (three-in-a-row or every piece blocked)
+
+## Return a random legal move kind for every code (every code must have a legal move)
+def random_moves(table, codes, rng):
+    digits = code_digits(codes)
+    placing = (digits == 1).sum(axis=1) < numPieces
+
+    fromCells, toCells = table.moveKinds[:, 0], table.moveKinds[:, 1]
+    legal = (digits[:, toCells] == 0) & ((fromCells < 0)[None, :] == placing[:, None])
+    legal &= (fromCells < 0)[None, :] | (digits[:, np.maximum(fromCells, 0)] == 1)
+
+    return np.argmax(legal * rng.random_sample(legal.shape), axis=1)
+
+## Return a random best move kind of 'table' for every code
+def policy_moves(table, codes, rng):
+    states = table.stateIndex[codes]
+    starts = table.policyOffsets[states]
+    counts = table.policyOffsets[states + 1] - starts
+    kinds = table.policyMoves[starts + (rng.random_sample(len(codes)) * counts).astype(np.int64)]
+
+    return table.inverseMoveTable[table.symmetryIndex[codes], kinds]
+
+## Play numGames games of at most numMoves moves between players[0] and players[1], each game starts with a random player
+## The rules come from the first player that is a PolicyTable, or from get_policy() if both players are random
+## Return the results as a dict: losses of every player, unfinished games, mean game length and moves per second
+def self_play(players, numGames=10000, numMoves=100, seed=None):
+    rng = np.random.RandomState(seed)
+    table = next((player for player in players if player is not None), None) or get_policy()
+    swapCodes = swap_table()
+    fromCells, toCells = table.moveKinds[:, 0].astype(np.int64), table.moveKinds[:, 1].astype(np.int64)
+    fromPowers = np.where(fromCells < 0, 0, powers[np.maximum(fromCells, 0)])
+
+    codes = np.zeros(numGames, dtype=np.int64)
+    movers = rng.randint(0, 2, numGames)
+    active = np.ones(numGames, dtype=bool)
+    losers = np.full(numGames, -1)
+    lengths = np.full(numGames, numMoves)
+
+    numPlayed = 0
+    start = time.perf_counter()
+    for move in range(numMoves):
+        ## Games whose player to move has lost are over
+        states = table.stateIndex[codes]
+        over = active & (table.values[states] == LOSS) & (table.distances[states] == 0)
+        losers[over] = movers[over]
+        lengths[over] = move
+        active &= ~over
+
+        games = np.flatnonzero(active)
+        if len(games) == 0:
+            break
+
+        kinds = np.zeros(len(games), dtype=np.int64)
+        for index, player in enumerate(players):
+            turn = movers[games] == index
+            if player is None:
+                kinds[turn] = random_moves(table, codes[games[turn]], rng)
+            else:
+                kinds[turn] = policy_moves(player, codes[games[turn]], rng)
+
+        codes[games] = swapCodes[codes[games] + powers[toCells[kinds]] - fromPowers[kinds]]
+        movers[games] ^= 1
+        numPlayed += len(games)
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        'numGames': numGames,
+        'numMoves': numMoves,
+        'losses': [int((losers == index).sum()) for index in range(2)],
+        'unfinished': int((losers < 0).sum()),
+        'meanLength': float(lengths.mean()),
+        'movesPlayed': numPlayed,
+        'time': elapsed,
+        'movesPerSecond': numPlayed / elapsed if elapsed > 0 else float('inf'),
+    }
+
+## Return the player for a name: 'random' for random legal moves, a move mode for the solved policy of that mode, or the path of a policy file
+def get_player(name, solver=None):
+    if name == 'random':
+        return None
+    if name in moveModes:
+        return PolicyTable(build_policy(solver if solver is not None else RotaSolver(), name))
+
+    return PolicyTable.load(name)
+
+## Usage: python selfPlay.py [--games 10000] [--moves 100] [--players trap random] [--seed 0]
+## Exit code 1 if a player that is not 'random' lost a game
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play batches of ROTA games between two players')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--moves', type=int, default=100, help='max moves per game (both players)')
+    parser.add_argument('--players', nargs=2, default=[defaultMoveMode, 'random'], help="'random', a move mode or a policy file for each player")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    solver = RotaSolver()
+    players = [get_player(name, solver) for name in args.players]
+    results = self_play(players, args.games, args.moves, args.seed)
+
+    print('{0} games, {1} moves in {2:.3f}s ({3:,.0f} moves/s), mean length {4:.1f}'.format(
+        results['numGames'], results['movesPlayed'], results['time'], results['movesPerSecond'], results['meanLength']))
+    for name, losses in zip(args.players, results['losses']):
+        print('{0}: {1} losses'.format(name, losses))
+    print('unfinished: {0}'.format(results['unfinished']))
+
+    if any(losses and name != 'random' for name, losses in zip(args.players, results['losses'])):
+        raise SystemExit(1)